@@ -0,0 +1,86 @@
+"""Throughput of gdpr_obfuscator_batch against a serial loop, using moto for S3.
+
+moto answers in-process, so a fixed delay is added before each request to stand
+in for the round trip to S3.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_batch [files] [latency_ms]
+"""
+
+from os import environ
+import sys
+import time
+
+from boto3 import client
+from moto import mock_aws
+from unittest.mock import patch
+
+from benchmark.data import make_csv, pii_fields
+from gdpr_obfuscator import gdpr_obfuscator, gdpr_obfuscator_batch
+
+WORKER_COUNTS = [4, 16, 32]
+ROWS_PER_FILE = 2000
+
+
+def latency_client(latency_ms: float):
+    def make_client(*args, **kwargs):
+        s3 = client(*args, region_name="eu-west-2", **kwargs)
+        s3.meta.events.register(
+            "before-sign.s3.*", lambda **_: time.sleep(latency_ms / 1000)
+        )
+        return s3
+
+    return make_client
+
+
+def run(files: int, latency_ms: float) -> None:
+    environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+    environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+    environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+    make_client = latency_client(latency_ms)
+    content = make_csv(ROWS_PER_FILE)
+    with mock_aws():
+        s3 = make_client("s3")
+        s3.create_bucket(
+            Bucket="bench",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        events = []
+        for i in range(files):
+            s3.put_object(Bucket="bench", Key=f"in/{i}.csv", Body=content)
+            events.append(
+                {
+                    "file_to_obfuscate": f"s3://bench/in/{i}.csv",
+                    "pii_fields": pii_fields(),
+                    "destination": f"s3://bench/out/{i}.csv",
+                }
+            )
+        megabytes = files * len(content) / 1024 / 1024
+        print(f"{files} files, {megabytes:.1f} MB, {latency_ms} ms per request")
+
+        with patch("gdpr_obfuscator.storage.s3_client", s3):
+            t1 = time.perf_counter()
+            for event in events:
+                gdpr_obfuscator(event)
+            serial = time.perf_counter() - t1
+        print(
+            f"  serial       {files / serial:8.1f} files/s {megabytes / serial:8.1f} MB/s"
+        )
+
+        with patch("boto3.client", make_client):
+            for workers in WORKER_COUNTS:
+                t1 = time.perf_counter()
+                results = gdpr_obfuscator_batch(events, max_workers=workers)
+                elapsed = time.perf_counter() - t1
+                errors = sum(result["error"] is not None for result in results)
+                print(
+                    f"  {workers:2} workers   {files / elapsed:8.1f} files/s"
+                    f" {megabytes / elapsed:8.1f} MB/s  x{serial / elapsed:.2f}"
+                    f"  {errors} errors"
+                )
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20,
+    )
@@ -0,0 +1,94 @@
+"""Throughput of obfuscating compressed input and compressing the output.
+
+The input table runs obfuscate_csv and obfuscate_jsonl on the same file stored
+uncompressed and compressed with each codec, reading through open_decompressed.
+MB/s is measured against the uncompressed size, so the columns show what each
+codec costs on the read side.
+
+The output table runs obfuscate_csv on uncompressed input and writes through each
+compressing writer: gzip as a single zlib stream on the calling thread, and
+ParallelGzipWriter with 1, 2 and 4 threads, then zstd and bz2. Parallel gzip only
+helps when there are spare CPUs; the CPU count is printed first.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_compression [size_mb]
+"""
+
+from io import BytesIO
+import bz2
+import gzip
+import os
+import sys
+import time
+import zlib
+
+from benchmark.data import iter_dataset, pii_fields
+from benchmark.suite import MB, NullWriter
+from gdpr_obfuscator import obfuscate_csv, obfuscate_jsonl
+from gdpr_obfuscator.compression import (
+    CompressingWriter,
+    ParallelGzipWriter,
+    open_compressed_writer,
+    open_decompressed,
+)
+
+import zstandard
+
+COMPRESS = {
+    "gzip": gzip.compress,
+    "zstd": zstandard.ZstdCompressor().compress,
+    "bz2": bz2.compress,
+}
+FIELDS = pii_fields(2)
+
+
+def make_output_writers():
+    return {
+        "gzip stream": lambda out: CompressingWriter(
+            out, zlib.compressobj(6, zlib.DEFLATED, 31)
+        ),
+        "gzip x1": lambda out: ParallelGzipWriter(out, 1),
+        "gzip x2": lambda out: ParallelGzipWriter(out, 2),
+        "gzip x4": lambda out: ParallelGzipWriter(out, 4),
+        "zstd": lambda out: open_compressed_writer(out, "zstd"),
+        "bz2": lambda out: open_compressed_writer(out, "bz2"),
+    }
+
+
+def read_rate(func, data: bytes, codec, size: int) -> float:
+    t1 = time.perf_counter()
+    func(open_decompressed(BytesIO(data), codec), FIELDS, NullWriter())
+    return size / MB / (time.perf_counter() - t1)
+
+
+def write_rate(data: bytes, make_writer) -> tuple:
+    sink = NullWriter()
+    t1 = time.perf_counter()
+    writer = make_writer(sink)
+    obfuscate_csv(BytesIO(data), FIELDS, writer)
+    writer.finish()
+    return len(data) / MB / (time.perf_counter() - t1), sink.written / len(data)
+
+
+def run(size_mb: float) -> None:
+    print(f"CPUs: {os.cpu_count()}\n")
+    datasets = {
+        fmt: b"".join(chunk for chunk, _ in iter_dataset(fmt, int(size_mb * MB)))
+        for fmt in ("csv", "jsonl")
+    }
+
+    print(f"{'input':6} {'plain':>11}" + "".join(f" {c:>11}" for c in COMPRESS))
+    for fmt, func in (("csv", obfuscate_csv), ("jsonl", obfuscate_jsonl)):
+        data = datasets[fmt]
+        rates = [read_rate(func, data, None, len(data))]
+        for codec, compress in COMPRESS.items():
+            rates.append(read_rate(func, compress(data), codec, len(data)))
+        print(f"{fmt:6}" + "".join(f" {rate:6.1f} MB/s" for rate in rates))
+
+    print(f"\n{'output':12} {'csv':>11} {'ratio':>6}")
+    for label, make_writer in make_output_writers().items():
+        rate, ratio = write_rate(datasets["csv"], make_writer)
+        print(f"{label:12} {rate:6.1f} MB/s {ratio:6.1%}")
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 64)
@@ -0,0 +1,35 @@
+"""Throughput of the obfuscate_csv engines on in-memory CSV data.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_csv_engines [rows]
+"""
+
+from io import BytesIO
+import sys
+import time
+
+from benchmark.data import make_csv, pii_fields
+from gdpr_obfuscator import CSV_ENGINES, obfuscate_csv
+
+SHAPES = [(4, 2), (16, 2), (64, 4), (256, 4)]
+
+
+def run(rows: int) -> None:
+    for columns, pii_columns in SHAPES:
+        content = make_csv(rows, columns, pii_columns)
+        megabytes = len(content) / 1024 / 1024
+        print(f"{columns} columns, {pii_columns} PII, {megabytes:.1f} MB")
+        reference = None
+        for engine in reversed(CSV_ENGINES):
+            t1 = time.perf_counter()
+            output = obfuscate_csv(
+                BytesIO(content), pii_fields(pii_columns), engine=engine
+            ).read()
+            elapsed = time.perf_counter() - t1
+            if reference is None:
+                reference = output
+            identical = "identical" if output == reference else "DIFFERENT"
+            print(f"  {engine:6} {megabytes / elapsed:8.1f} MB/s  {identical}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
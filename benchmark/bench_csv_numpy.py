@@ -0,0 +1,45 @@
+"""Throughput of the NumPy CSV engine against the bytes engine on wide files.
+
+Sweeps the column and row count with the PII columns at the end of each row, where
+the bytes engine has to scan every column to reach them.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_csv_numpy
+"""
+
+from io import BytesIO
+import time
+
+from benchmark.data import make_csv, pii_fields
+from gdpr_obfuscator import obfuscate_csv
+
+COLUMNS = [16, 64, 256, 1024]
+ROWS = [1000, 10000, 50000]
+PII_COLUMNS = 2
+
+
+def run() -> None:
+    # Warm up so the NumPy import is not counted in the first measurement.
+    obfuscate_csv(BytesIO(make_csv(10)), pii_fields(), engine="numpy")
+    for columns in COLUMNS:
+        for rows in ROWS:
+            content = make_csv(rows, columns, PII_COLUMNS, pii_last=True)
+            megabytes = len(content) / 1024 / 1024
+            results = {}
+            for engine in ("text", "bytes", "numpy"):
+                t1 = time.perf_counter()
+                output = obfuscate_csv(
+                    BytesIO(content), pii_fields(PII_COLUMNS), engine=engine
+                ).read()
+                results[engine] = (megabytes / (time.perf_counter() - t1), output)
+            identical = len({output for _, output in results.values()}) == 1
+            speeds = "  ".join(
+                f"{engine} {speed:7.1f} MB/s" for engine, (speed, _) in results.items()
+            )
+            print(
+                f"{columns:5} columns {rows:6} rows {megabytes:7.1f} MB  {speeds}  "
+                + ("identical" if identical else "DIFFERENT")
+            )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,67 @@
+"""Cold-start cost of importing gdpr_obfuscator and creating its S3 client.
+
+Each measurement runs in a fresh interpreter. Import times come from the
+cumulative column of `python -X importtime`; the first-call time is how long
+get_s3_client takes to import boto3 and build the client the first time.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_import_time [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+FIRST_CALL = (
+    "import time\n"
+    "from gdpr_obfuscator import get_s3_client\n"
+    "t1 = time.perf_counter()\n"
+    "get_s3_client()\n"
+    "print((time.perf_counter() - t1) * 1e6)\n"
+)
+
+
+def import_time_us(module: str) -> int:
+    """The cumulative -X importtime of `module` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+
+def first_call_us() -> float:
+    env = dict(os.environ, AWS_DEFAULT_REGION="eu-west-2")
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_CALL],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    return float(result.stdout)
+
+
+def report(name: str, samples: list) -> None:
+    print(
+        f"  {name:28} median {statistics.median(samples) / 1000:7.1f} ms"
+        f"  min {min(samples) / 1000:7.1f} ms"
+    )
+
+
+def run(runs: int) -> None:
+    print(f"{runs} fresh interpreters each")
+    module = [import_time_us("gdpr_obfuscator") for _ in range(runs)]
+    report("import gdpr_obfuscator", module)
+    report("import boto3", [import_time_us("boto3") for _ in range(runs)])
+    report("first get_s3_client() call", [first_call_us() for _ in range(runs)])
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,53 @@
+"""Throughput of obfuscate_jsonl with the stdlib json and orjson codecs.
+
+A JSONL file of the requested size (1 GiB by default) is written to a temporary
+file and streamed through obfuscate_jsonl into a sink that discards the output, so
+memory use stays small whatever the size.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_json_codecs [megabytes]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmark.data import make_jsonl, pii_fields
+from benchmark.suite import NullWriter
+from gdpr_obfuscator import JSON_CODECS, get_json_codec, obfuscate_jsonl
+
+CHUNK_ROWS = 50000
+
+
+def write_jsonl(path: str, size: int) -> int:
+    chunk = make_jsonl(CHUNK_ROWS)
+    written = 0
+    with open(path, "wb") as f:
+        while written < size:
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def run(megabytes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.jsonl")
+        size = write_jsonl(path, megabytes * 1024 * 1024)
+        print(f"JSONL, {size / 1024 / 1024:.0f} MB")
+        for codec in JSON_CODECS:
+            if get_json_codec(codec).name != codec:
+                print(f"  {codec:6} not installed")
+                continue
+            sink = NullWriter()
+            with open(path, "rb") as body:
+                t1 = time.perf_counter()
+                obfuscate_jsonl(body, pii_fields(), sink, codec=codec)
+                elapsed = time.perf_counter() - t1
+            print(
+                f"  {codec:6} {size / 1024 / 1024 / elapsed:7.1f} MB/s"
+                f"  {elapsed:6.1f} s  {sink.written / size:.0%} of input size written"
+            )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1024)
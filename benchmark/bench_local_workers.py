@@ -0,0 +1,59 @@
+"""Sharded obfuscation of a local file with workers that read their own shards.
+
+The benchmark CSV data is written to a temporary file and obfuscated with
+obfuscate_sharded on 1, 2 and 4 worker processes. "shared" is LocalStorage,
+whose workers map the file and read their own byte range; "pickled" is the
+same storage with the parent reading every shard and sending its bytes to a
+worker, which is how S3 shards are processed. MB/s is measured against the
+file size; the CPU count is printed first.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_local_workers [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmark.data import make_csv, pii_fields
+from benchmark.suite import MB, NullWriter
+from gdpr_obfuscator import LocalStorage, obfuscate_sharded
+
+FIELDS = pii_fields(2)
+SHARD_SIZE = 4 * MB
+
+
+class PickledLocalStorage(LocalStorage):
+    shared = False
+
+
+def run(rows: int) -> None:
+    print(f"CPUs: {os.cpu_count()}\n")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.csv")
+        with open(path, "wb") as file:
+            file.write(make_csv(rows))
+        size = os.path.getsize(path)
+        print(f"{rows} rows, {size / MB:.1f} MB of CSV\n")
+
+        print(f"{'target':16} {'MB/s':>8}")
+        for workers in (1, 2, 4):
+            for label, storage in (
+                ("shared", LocalStorage()),
+                ("pickled", PickledLocalStorage()),
+            ):
+                t1 = time.perf_counter()
+                obfuscate_sharded(
+                    storage,
+                    path,
+                    FIELDS,
+                    NullWriter(),
+                    max_workers=workers,
+                    shard_size=SHARD_SIZE,
+                )
+                elapsed = time.perf_counter() - t1
+                print(f"{label + f' x{workers}':16} {size / MB / elapsed:8.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
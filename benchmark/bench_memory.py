@@ -0,0 +1,176 @@
+"""Peak memory of the obfuscate functions and gdpr_obfuscator as input size grows.
+
+Every case runs in a fresh spawned process so the RSS high-water mark is not
+carried over from an earlier, larger case. Two numbers are recorded while the
+target runs:
+
+    peak    the tracemalloc peak, i.e. Python allocations made by the target.
+    rss     the process RSS high-water mark after the run, including the
+            interpreter and imports; this is what the Lambda memory setting
+            has to cover and it also catches native allocations.
+
+Both are reported in MB and in bytes per input byte. The growth column is the
+extra peak memory per extra input byte between the smallest and the largest
+size: close to zero means memory is flat in file size, close to one or more
+means something holds the whole file.
+
+The e2e targets stream to a destination object in moto, which keeps uploaded
+parts in memory, so their numbers include moto's copy of the output.
+
+The spool targets write the output of an obfuscate function to a
+SpoolingBuffer with a SPOOL_THRESHOLD of 4 MB, and the bytesio targets to a
+BytesIO, which is what the obfuscate functions returned before spooling. Above
+the threshold the spool targets' RSS stays flat while the bytesio targets grow
+with the output.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_memory [--sizes 1,16,64]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Tuple
+
+from benchmark.data import (
+    FORMATS,
+    pii_column_count,
+    pii_fields,
+    write_dataset,
+)
+from benchmark.suite import MB, OBFUSCATE_FUNCS, TARGETS, NullWriter
+from gdpr_obfuscator import SpoolingBuffer
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+SPOOL_THRESHOLD = 4 * MB
+OUTPUT_TARGETS = tuple(
+    f"{output}-{fmt}" for output in ("spool", "bytesio") for fmt in FORMATS
+)
+
+
+def max_rss() -> int:
+    """The RSS high-water mark of this process in bytes, or 0 if unavailable."""
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def measure(func, *args, **kwargs) -> Tuple[int, int]:
+    """Run func and return its tracemalloc peak and the RSS high-water mark.
+
+    The RSS high-water mark only ever rises, so the second value is only
+    meaningful in a process that has not already run something larger.
+    """
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak, max_rss()
+
+
+def measure_end_to_end(fmt: str, path: str, fields: list) -> Tuple[int, int]:
+    from boto3 import client
+    from moto import mock_aws
+
+    from gdpr_obfuscator import gdpr_obfuscator
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+    with mock_aws():
+        s3 = client("s3", region_name="eu-west-2")
+        s3.create_bucket(
+            Bucket="bench",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        with open(path, "rb") as body:
+            s3.put_object(Bucket="bench", Key=f"data.{fmt}", Body=body)
+        event = {
+            "file_to_obfuscate": f"s3://bench/data.{fmt}",
+            "pii_fields": fields,
+            "destination": f"s3://bench/output.{fmt}",
+        }
+        return measure(gdpr_obfuscator, event, s3)
+
+
+def run_case(target: str, path: str, fields: list) -> Tuple[int, int]:
+    if target.startswith("e2e-"):
+        return measure_end_to_end(target[4:], path, fields)
+    output, _, fmt = target.rpartition("-")
+    if output == "spool":
+        output_buffer = SpoolingBuffer(SPOOL_THRESHOLD)
+    elif output == "bytesio":
+        output_buffer = BytesIO()
+    else:
+        output_buffer = NullWriter()
+    with open(path, "rb") as body:
+        return measure(OBFUSCATE_FUNCS[fmt], body, fields, output_buffer)
+
+
+def run_isolated(target: str, path: str, fields: list) -> Tuple[int, int]:
+    """Run one case in a freshly spawned process."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_case, target, path, fields).result()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", default=",".join(TARGETS + OUTPUT_TARGETS))
+    parser.add_argument("--sizes", default="1,16,64", help="file sizes in MB")
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--pii-share", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    targets = args.targets.split(",")
+    known = TARGETS + OUTPUT_TARGETS
+    unknown = set(targets) - set(known)
+    if unknown:
+        parser.error(f"unknown targets {sorted(unknown)}, choose from {list(known)}")
+    sizes = sorted(float(size) for size in args.sizes.split(","))
+    fields = pii_fields(pii_column_count(args.columns, args.pii_share))
+
+    print(
+        f"{'target':10} {'size':>8} {'peak':>10} {'peak/B':>7}"
+        f" {'rss':>10} {'rss/B':>7} {'growth':>7}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in FORMATS:
+            fmt_targets = [t for t in targets if t.split("-")[-1] == fmt]
+            if not fmt_targets:
+                continue
+            paths = {}
+            for size_mb in sizes:
+                paths[size_mb] = os.path.join(tmp, f"data-{size_mb:g}.{fmt}")
+                write_dataset(
+                    paths[size_mb], fmt, int(size_mb * MB), args.columns, args.pii_share
+                )
+            for target in fmt_targets:
+                peaks = []
+                for size_mb in sizes:
+                    size = os.path.getsize(paths[size_mb])
+                    peak, rss = run_isolated(target, paths[size_mb], fields)
+                    peaks.append((size, peak))
+                    growth = ""
+                    if len(peaks) > 1:
+                        (first_size, first_peak) = peaks[0]
+                        growth = f"{(peak - first_peak) / (size - first_size):7.2f}"
+                    print(
+                        f"{target:10} {size_mb:5g} MB {peak / MB:7.1f} MB {peak / size:7.2f}"
+                        f" {rss / MB:7.1f} MB {rss / size:7.2f} {growth:>7}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
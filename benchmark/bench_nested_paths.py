@@ -0,0 +1,76 @@
+"""Throughput of nested pii_field paths compiled once per job.
+
+compile_field_paths merges the paths into a tree of closures before the first
+record, so each record only walks the branches that lead to PII. The baseline
+re-splits every path string and walks it from the top for every record, which
+is what masking nested fields costs without a compiled plan. Both mask records
+that are already parsed; the last columns run obfuscate_jsonl and obfuscate_json
+on the same records end to end.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_nested_paths [rows]
+"""
+
+from io import BytesIO
+import sys
+import time
+
+from benchmark.data import make_nested_jsonl, nested_pii_fields
+from benchmark.suite import NullWriter
+from gdpr_obfuscator import get_json_codec, obfuscate_json, obfuscate_jsonl
+from gdpr_obfuscator.json_obfuscator import compile_field_paths
+
+DEPTHS = [2, 4, 8]
+
+
+def mask_by_resolving(record: dict, fields: list) -> None:
+    """Mask nested paths by parsing and walking each path string per record."""
+    for field in fields:
+        values = [record]
+        keys = field.replace("[*]", ".[*]").split(".")
+        for key in keys[:-1]:
+            if key == "[*]":
+                values = [item for value in values for item in value]
+            else:
+                values = [value[key] for value in values]
+        for value in values:
+            value[keys[-1]] = "***"
+
+
+def masking_rate(records: list, mask) -> float:
+    t1 = time.perf_counter()
+    for record in records:
+        mask(record)
+    return len(records) / (time.perf_counter() - t1)
+
+
+def throughput(func, content: bytes, fields: list) -> float:
+    t1 = time.perf_counter()
+    func(BytesIO(content), fields, NullWriter())
+    return len(content) / 1024 / 1024 / (time.perf_counter() - t1)
+
+
+def run(rows: int) -> None:
+    loads = get_json_codec().loads
+    print(
+        f"{'depth':>5} {'compiled':>14} {'per-row paths':>16} {'speedup':>8}"
+        f" {'jsonl':>11} {'json':>11}"
+    )
+    for depth in DEPTHS:
+        fields = nested_pii_fields(depth)
+        jsonl = make_nested_jsonl(rows, depth)
+        lines = jsonl.splitlines()
+        compiled = masking_rate(list(map(loads, lines)), compile_field_paths(fields))
+        resolved = masking_rate(
+            list(map(loads, lines)), lambda record: mask_by_resolving(record, fields)
+        )
+        document = b"[" + b",".join(lines) + b"]"
+        print(
+            f"{depth:5} {compiled:9,.0f} rec/s {resolved:11,.0f} rec/s"
+            f" {compiled / resolved:7.1f}x"
+            f" {throughput(obfuscate_jsonl, jsonl, fields):6.1f} MB/s"
+            f" {throughput(obfuscate_json, document, fields):6.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
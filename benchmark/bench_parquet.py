@@ -0,0 +1,71 @@
+"""Throughput of obfuscate_parquet against converting Parquet to CSV.
+
+The input is the benchmark CSV data written as Parquet in row groups of 64k rows.
+obfuscate_parquet masks the PII columns of each row group and writes the others
+through as Arrow arrays, with 1, 2 and 4 threads. The conversion baselines are
+what obfuscating Parquet costs without it: writing the table out as CSV and
+running obfuscate_csv, and the full round trip that reads the obfuscated CSV back
+and writes it as Parquet again. MB/s is measured against the Parquet file size
+and rows/s against the table; the CPU count is printed first.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_parquet [rows]
+"""
+
+from io import BytesIO
+import os
+import sys
+import time
+
+from benchmark.data import make_csv, pii_fields
+from benchmark.suite import MB, NullWriter
+from gdpr_obfuscator import obfuscate_csv, obfuscate_parquet
+
+import pyarrow
+import pyarrow.csv
+import pyarrow.parquet
+
+FIELDS = pii_fields(2)
+ROW_GROUP_SIZE = 64 * 1024
+
+
+def via_csv(data: bytes, round_trip: bool) -> None:
+    table = pyarrow.parquet.read_table(pyarrow.BufferReader(data))
+    csv_body = BytesIO()
+    pyarrow.csv.write_csv(table, csv_body)
+    csv_body.seek(0)
+    output = obfuscate_csv(csv_body, FIELDS)
+    if round_trip:
+        masked = pyarrow.csv.read_csv(output)
+        pyarrow.parquet.write_table(masked, NullWriter(), row_group_size=ROW_GROUP_SIZE)
+
+
+def make_targets():
+    targets = {
+        f"parquet x{workers}": lambda data, workers=workers: obfuscate_parquet(
+            BytesIO(data), FIELDS, NullWriter(), max_workers=workers
+        )
+        for workers in (1, 2, 4)
+    }
+    targets["via csv"] = lambda data: via_csv(data, round_trip=False)
+    targets["via csv round trip"] = lambda data: via_csv(data, round_trip=True)
+    return targets
+
+
+def run(rows: int) -> None:
+    print(f"CPUs: {os.cpu_count()}\n")
+    table = pyarrow.csv.read_csv(BytesIO(make_csv(rows)))
+    body = BytesIO()
+    pyarrow.parquet.write_table(table, body, row_group_size=ROW_GROUP_SIZE)
+    data = body.getvalue()
+    print(f"{rows} rows, {len(data) / MB:.1f} MB of Parquet\n")
+
+    print(f"{'target':20} {'MB/s':>8} {'rows/s':>12}")
+    for label, target in make_targets().items():
+        t1 = time.perf_counter()
+        target(data)
+        elapsed = time.perf_counter() - t1
+        print(f"{label:20} {len(data) / MB / elapsed:8.1f} {rows / elapsed:12,.0f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
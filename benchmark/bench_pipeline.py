@@ -0,0 +1,133 @@
+"""Wall-clock time of gdpr_obfuscator with and without the read-ahead pipeline.
+
+moto answers in-process, so S3 is slowed down with botocore event hooks: a fixed
+delay before each request for the round trip, a GetObject body that sleeps as it
+is read to cap the download bandwidth, and a delay before each upload request
+in proportion to its size to cap the upload bandwidth. The sleeps release the
+GIL, like real network I/O.
+
+The stage times are downloading the file, uploading a copy of it and running
+obfuscate_csv on it in memory, each on its own. Without a pipeline a run takes
+about their sum; with 'pipeline_depth' the three overlap and it should come
+closer to the largest of them.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_pipeline [size_mb] [mb_per_s]
+"""
+
+from io import BytesIO
+from os import environ
+import sys
+import time
+
+from boto3 import client
+from moto import mock_aws
+
+from benchmark.data import iter_dataset, pii_fields
+from benchmark.suite import MB, NullWriter
+from gdpr_obfuscator import S3MultipartWriter, gdpr_obfuscator, obfuscate_csv
+
+LATENCY = 0.02
+DEPTHS = [2, 4, 8]
+
+
+class ThrottledBody:
+    """A GetObject body that sleeps as it is read, to cap its bandwidth."""
+
+    def __init__(self, body, bandwidth: float):
+        self.body = body
+        self.bandwidth = bandwidth
+
+    def read(self, size=None) -> bytes:
+        data = self.body.read(size)
+        time.sleep(len(data) / self.bandwidth)
+        return data
+
+
+def slow_client(bandwidth: float):
+    s3 = client("s3", region_name="eu-west-2")
+
+    def before_request(request, **_):
+        body = request.body
+        size = len(body) if isinstance(body, (bytes, bytearray)) else 0
+        time.sleep(LATENCY + size / bandwidth)
+
+    def after_get_object(parsed, **_):
+        if "Body" in parsed:
+            parsed["Body"] = ThrottledBody(parsed["Body"], bandwidth)
+
+    s3.meta.events.register("before-sign.s3.*", before_request)
+    s3.meta.events.register("after-call.s3.GetObject", after_get_object)
+    return s3
+
+
+def download_time(s3) -> float:
+    t1 = time.perf_counter()
+    body = s3.get_object(Bucket="bench", Key="in.csv")["Body"]
+    while body.read(1024 * 1024):
+        pass
+    return time.perf_counter() - t1
+
+
+def obfuscate_time(data: bytes, fields: list) -> float:
+    t1 = time.perf_counter()
+    obfuscate_csv(BytesIO(data), fields, NullWriter())
+    return time.perf_counter() - t1
+
+
+def upload_time(s3, data: bytes) -> float:
+    t1 = time.perf_counter()
+    writer = S3MultipartWriter(s3, "bench", "copy.csv")
+    for start in range(0, len(data), 1024 * 1024):
+        writer.write(data[start : start + 1024 * 1024])
+    writer.close()
+    return time.perf_counter() - t1
+
+
+def run(size_mb: float, mb_per_s: float) -> None:
+    environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+    environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+    environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+    data = b"".join(chunk for chunk, _ in iter_dataset("csv", int(size_mb * MB)))
+    with mock_aws():
+        s3 = slow_client(mb_per_s * MB)
+        s3.create_bucket(
+            Bucket="bench",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        s3.put_object(Bucket="bench", Key="in.csv", Body=data)
+        event = {
+            "file_to_obfuscate": "s3://bench/in.csv",
+            "pii_fields": pii_fields(2),
+            "destination": "s3://bench/out.csv",
+        }
+
+        stages = {
+            "download": download_time(s3),
+            "obfuscate": obfuscate_time(data, event["pii_fields"]),
+            "upload": upload_time(s3, data),
+        }
+        print(
+            f"{len(data) / MB:.0f} MB, {mb_per_s:g} MB/s each way,"
+            f" {LATENCY * 1000:g} ms per request"
+        )
+        for name, seconds in stages.items():
+            print(f"  {name:15} {seconds:6.2f} s")
+        print(f"  sum             {sum(stages.values()):6.2f} s")
+        print(f"  max             {max(stages.values()):6.2f} s\n")
+
+        t1 = time.perf_counter()
+        gdpr_obfuscator(event, s3)
+        serial = time.perf_counter() - t1
+        print(f"  no pipeline     {serial:6.2f} s")
+        for depth in DEPTHS:
+            t1 = time.perf_counter()
+            gdpr_obfuscator({**event, "pipeline_depth": depth}, s3)
+            elapsed = time.perf_counter() - t1
+            print(f"  depth {depth:<9} {elapsed:6.2f} s  x{serial / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    run(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 64,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    )
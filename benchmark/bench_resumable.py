@@ -0,0 +1,74 @@
+"""Cost of checkpointing a resumable job against a plain streamed run.
+
+The benchmark CSV data is put in moto, slowed down to a set bandwidth and
+round-trip time with the hooks from bench_pipeline, and obfuscated to a
+destination three ways: a plain run, a resumable job with 'job_id' that runs
+to the end in one call, and the same job cut into one call per part with
+'time_limit': 0, so every call saves a manifest and the next one resumes with
+a ranged GET. The difference to the plain run is the price of the manifests
+and resumes; the outputs are checked to be identical.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_resumable [size_mb] [mb_per_s]
+"""
+
+from os import environ
+import sys
+import time
+
+from moto import mock_aws
+
+from benchmark.bench_pipeline import slow_client
+from benchmark.data import iter_dataset, pii_fields
+from benchmark.suite import MB
+from gdpr_obfuscator import gdpr_obfuscator
+
+
+def timed_run(s3, event: dict) -> tuple:
+    calls = 0
+    t1 = time.perf_counter()
+    while True:
+        calls += 1
+        result = gdpr_obfuscator(event, s3)
+        if result.get("Complete", True):
+            break
+    return time.perf_counter() - t1, calls
+
+
+def run(size_mb: float, mb_per_s: float) -> None:
+    environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+    environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+    environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+    data = b"".join(chunk for chunk, _ in iter_dataset("csv", int(size_mb * MB)))
+    with mock_aws():
+        s3 = slow_client(mb_per_s * MB)
+        s3.create_bucket(
+            Bucket="bench",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        s3.put_object(Bucket="bench", Key="in.csv", Body=data)
+        event = {"file_to_obfuscate": "s3://bench/in.csv", "pii_fields": pii_fields(2)}
+        targets = {
+            "plain": {"destination": "s3://bench/plain.csv"},
+            "job, one call": {"destination": "s3://bench/job.csv", "job_id": "a"},
+            "job, per part": {
+                "destination": "s3://bench/parts.csv",
+                "job_id": "b",
+                "time_limit": 0,
+            },
+        }
+        print(f"{len(data) / MB:.0f} MB, {mb_per_s:g} MB/s each way\n")
+        print(f"{'target':15} {'seconds':>8} {'calls':>6}")
+        outputs = set()
+        for label, options in targets.items():
+            elapsed, calls = timed_run(s3, {**event, **options})
+            print(f"{label:15} {elapsed:8.2f} {calls:6}")
+            key = options["destination"][len("s3://bench/") :]
+            outputs.add(s3.get_object(Bucket="bench", Key=key)["Body"].read())
+        print(f"\noutputs identical: {len(outputs) == 1}")
+
+
+if __name__ == "__main__":
+    run(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 64,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    )
@@ -0,0 +1,66 @@
+"""Throughput of obfuscate_sharded against worker count, using moto for S3.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_sharded [size_mb]
+"""
+
+from io import BytesIO
+from os import environ
+import sys
+import time
+
+from boto3 import client
+from moto import mock_aws
+from unittest.mock import patch
+
+from benchmark.data import make_csv, make_jsonl, pii_fields
+from gdpr_obfuscator import obfuscate_csv, obfuscate_jsonl, obfuscate_sharded
+
+WORKER_COUNTS = [1, 2, 4, 6]
+ROW_BYTES = 110
+
+
+def run(size_mb: int) -> None:
+    environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+    environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+    environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+    rows = size_mb * 1024 * 1024 // ROW_BYTES
+    files = [
+        ("data.csv", make_csv(rows), obfuscate_csv),
+        ("data.jsonl", make_jsonl(rows), obfuscate_jsonl),
+    ]
+    with mock_aws():
+        s3 = client("s3", region_name="eu-west-2")
+        s3.create_bucket(
+            Bucket="bench",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        with patch("gdpr_obfuscator.storage.s3_client", s3):
+            for key, content, serial_func in files:
+                s3.put_object(Bucket="bench", Key=key, Body=content)
+                megabytes = len(content) / 1024 / 1024
+
+                t1 = time.perf_counter()
+                expected = serial_func(BytesIO(content), pii_fields()).read()
+                serial = time.perf_counter() - t1
+                print(f"{key} {megabytes:.1f} MB")
+                print(f"  serial      {megabytes / serial:8.1f} MB/s")
+
+                for workers in WORKER_COUNTS:
+                    t1 = time.perf_counter()
+                    output = obfuscate_sharded(
+                        "bench",
+                        key,
+                        pii_fields(),
+                        max_workers=workers,
+                        shard_size=max(len(content) // (4 * workers), 1),
+                    ).read()
+                    elapsed = time.perf_counter() - t1
+                    identical = "identical" if output == expected else "DIFFERENT"
+                    print(
+                        f"  {workers} workers   {megabytes / elapsed:8.1f} MB/s"
+                        f"  x{serial / elapsed:.2f}  {identical}"
+                    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 64)
@@ -0,0 +1,68 @@
+"""Reading local files through MappedReader against buffered file reads.
+
+The benchmark CSV data is written to a temporary file. The read targets read it
+in blocks of CSV_BLOCK_SIZE bytes, through open() and through MappedReader,
+which slices a read-only memory map instead of copying through a read buffer.
+The obfuscate targets run obfuscate_csv on each reader, and gdpr_obfuscator on
+the file's path, which uses MappedReader. The file is read once first, so all
+targets read from the page cache. MB/s is measured against the file size.
+
+Run with: PYTHONPATH=. python -m benchmark.bench_storage [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmark.data import make_csv, pii_fields
+from benchmark.suite import MB, NullWriter
+from gdpr_obfuscator import MappedReader, gdpr_obfuscator, obfuscate_csv
+from gdpr_obfuscator.csv_obfuscator import CSV_BLOCK_SIZE
+
+FIELDS = pii_fields(2)
+REPEATS = 5
+
+
+def read_blocks(body) -> None:
+    while body.read(CSV_BLOCK_SIZE):
+        pass
+
+
+def make_targets(path: str):
+    return {
+        "read open()": lambda: read_blocks(open(path, "rb")),
+        "read mmap": lambda: read_blocks(MappedReader(path)),
+        "obfuscate open()": lambda: obfuscate_csv(
+            open(path, "rb"), FIELDS, NullWriter()
+        ),
+        "obfuscate mmap": lambda: obfuscate_csv(
+            MappedReader(path), FIELDS, NullWriter()
+        ),
+        "gdpr_obfuscator file://": lambda: gdpr_obfuscator(
+            {"file_to_obfuscate": f"file://{path}", "pii_fields": FIELDS}
+        ),
+    }
+
+
+def run(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.csv")
+        with open(path, "wb") as file:
+            file.write(make_csv(rows))
+        size = os.path.getsize(path)
+        read_blocks(open(path, "rb"))
+        print(f"{rows} rows, {size / MB:.1f} MB of CSV, best of {REPEATS}\n")
+
+        print(f"{'target':22} {'MB/s':>9}")
+        for label, target in make_targets(path).items():
+            timings = []
+            for _ in range(REPEATS):
+                t1 = time.perf_counter()
+                target()
+                timings.append(time.perf_counter() - t1)
+            print(f"{label:22} {size / MB / min(timings):9.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
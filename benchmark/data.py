@@ -0,0 +1,181 @@
+"""Deterministic synthetic data for the benchmarks."""
+
+import json
+import random
+
+
+def make_csv(
+    rows: int,
+    columns: int = 8,
+    pii_columns: int = 2,
+    pii_last: bool = False,
+    quoted: bool = False,
+) -> bytes:
+    """Build a CSV file with `rows` data rows and `pii_columns` PII columns.
+
+    The PII columns come first, or last in every row if `pii_last` is set. If
+    `quoted` is set the PII values are quoted and contain a comma.
+    """
+    headers = [f"pii_{i}" for i in range(pii_columns)]
+    others = [f"col_{i}" for i in range(columns - pii_columns)]
+    headers = others + headers if pii_last else headers + others
+    lines = [",".join(headers) + "\n"]
+    for row in range(rows):
+        values = [f"person{row}.{i}@email.com" for i in range(pii_columns)]
+        if quoted:
+            values = [f'"Person, {value}"' for value in values]
+        others = [str(row * (i + 1) % 9973) for i in range(columns - pii_columns)]
+        values = others + values if pii_last else values + others
+        lines.append(",".join(values) + "\n")
+    return "".join(lines).encode("utf-8")
+
+
+def make_jsonl(rows: int, columns: int = 8, pii_columns: int = 2) -> bytes:
+    """Build a JSONL file with `rows` records and `pii_columns` PII keys."""
+    lines = []
+    for row in range(rows):
+        record = {f"pii_{i}": f"person{row}.{i}@email.com" for i in range(pii_columns)}
+        for i in range(columns - pii_columns):
+            record[f"col_{i}"] = row * (i + 1) % 9973
+        lines.append(json.dumps(record) + "\n")
+    return "".join(lines).encode("utf-8")
+
+
+def make_nested_record(row: int, depth: int = 4, orders: int = 3) -> dict:
+    """Build a record with PII `depth` objects deep and in an array of orders.
+
+    The PII is at the paths in NESTED_PII_FIELDS for the same depth; every level
+    also has a few keys that hold no PII.
+    """
+    contact = {"email": f"person{row}@email.com", "phone": f"0{row % 9973:010d}"}
+    for level in range(depth - 2):
+        contact = {"contact": contact, "level": level, "note": f"n{row % 97}"}
+    return {
+        "id": row,
+        "customer": {"name": f"Person {row}", "contact": contact, "tier": row % 3},
+        "orders": [
+            {"sku": f"SKU{row % 101}-{i}", "card_number": f"4111{row:012d}", "qty": i}
+            for i in range(orders)
+        ],
+    }
+
+
+def nested_pii_fields(depth: int = 4) -> list:
+    """The PII paths of records from make_nested_record with the same depth."""
+    contact = "customer" + ".contact" * (depth - 1)
+    return [
+        f"{contact}.email",
+        f"{contact}.phone",
+        "customer.name",
+        "orders[*].card_number",
+    ]
+
+
+def make_nested_jsonl(rows: int, depth: int = 4, orders: int = 3) -> bytes:
+    """Build a JSONL file of `rows` records from make_nested_record."""
+    lines = [json.dumps(make_nested_record(row, depth, orders)) for row in range(rows)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def pii_fields(pii_columns: int = 2) -> list:
+    """The field names make_csv and make_jsonl use for PII columns."""
+    return [f"pii_{i}" for i in range(pii_columns)]
+
+
+FORMATS = ("csv", "jsonl", "json")
+CHUNK_ROWS = 10000
+
+
+def pii_column_count(columns: int, pii_share: float) -> int:
+    """The number of PII columns for a share of `columns`, at least one."""
+    return max(1, min(columns, round(columns * pii_share)))
+
+
+def iter_rows(start: int, stop: int, columns: int, pii_columns: int):
+    """Yield deterministic rows as lists of (name, value) pairs."""
+    for row in range(start, stop):
+        values = [
+            (f"pii_{i}", f"person{row}.{i}@email.com") for i in range(pii_columns)
+        ]
+        values += [
+            (f"col_{i}", row * (i + 1) % 9973) for i in range(columns - pii_columns)
+        ]
+        yield values
+
+
+def iter_dataset(fmt: str, size: int, columns: int = 8, pii_share: float = 0.25):
+    """Yield a deterministic file of about `size` bytes as chunks of whole rows.
+
+    The same arguments always give the same bytes, so files of several GB can be
+    streamed to disk without holding them in memory.
+
+    Yields:
+        Tuple[bytes, int]: A chunk of the file and the number of rows in it.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {list(FORMATS)}")
+    pii_columns = pii_column_count(columns, pii_share)
+    names = [name for name, _ in next(iter_rows(0, 1, columns, pii_columns))]
+    if fmt == "csv":
+        opening = (",".join(names) + "\n").encode("utf-8")
+    elif fmt == "json":
+        opening = b"["
+    else:
+        opening = b""
+    yield opening, 0
+    written = len(opening)
+    start = 0
+    while written < size:
+        rows = list(iter_rows(start, start + CHUNK_ROWS, columns, pii_columns))
+        if fmt == "csv":
+            text = "".join(",".join(str(v) for _, v in row) + "\n" for row in rows)
+        elif fmt == "jsonl":
+            text = "".join(json.dumps(dict(row)) + "\n" for row in rows)
+        else:
+            text = ", ".join(json.dumps(dict(row)) for row in rows)
+            if start:
+                text = ", " + text
+        chunk = text.encode("utf-8")
+        written += len(chunk)
+        start += CHUNK_ROWS
+        yield chunk, len(rows)
+    if fmt == "json":
+        yield b"]", 0
+
+
+def write_dataset(
+    path: str, fmt: str, size: int, columns: int = 8, pii_share: float = 0.25
+) -> int:
+    """Write iter_dataset to `path` and return the number of rows written."""
+    rows = 0
+    with open(path, "wb") as f:
+        for chunk, chunk_rows in iter_dataset(fmt, size, columns, pii_share):
+            f.write(chunk)
+            rows += chunk_rows
+    return rows
+
+
+def make_skewed_csv(rows: int, customers: int = 2000, countries: int = 200) -> bytes:
+    """Build an orders CSV whose PII columns repeat like real data.
+
+    Customer emails and countries are drawn from Zipf-like distributions, so a
+    few customers place most orders and a few countries cover most customers.
+    The draw is seeded, so the file is the same on every run.
+    """
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) for rank in range(customers)]
+    emails = rng.choices(range(customers), weights, k=rows)
+    lines = ["order_id,email,country,amount\n"]
+    for row, customer in enumerate(emails):
+        country = customer * 7919 % countries
+        amount = row * 37 % 9973
+        lines.append(f"{row},customer{customer}@email.com,country{country},{amount}\n")
+    return "".join(lines).encode("utf-8")
+
+
+def make_skewed_jsonl(rows: int, customers: int = 2000, countries: int = 200) -> bytes:
+    """Build the records of make_skewed_csv as a JSONL file."""
+    lines = make_skewed_csv(rows, customers, countries).decode("utf-8").splitlines()
+    keys = lines[0].split(",")
+    records = (dict(zip(keys, line.split(","))) for line in lines[1:])
+    return "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
@@ -0,0 +1,234 @@
+"""Throughput benchmark suite for the obfuscate functions and gdpr_obfuscator.
+
+Deterministic CSV, JSONL and JSON files are generated on disk at each requested
+size, then every target is run `--repeat` times on each file. The suite reports
+MB/s and rows/s from the median run and percentiles of the run times, saves the
+results as JSON and compares them with the previous results file.
+
+Targets:
+    csv, jsonl, json    obfuscate_csv, obfuscate_jsonl and obfuscate_json reading
+                        from disk and writing to a sink that discards the output.
+    e2e-csv, e2e-jsonl, e2e-json
+                        gdpr_obfuscator against moto-backed S3, streaming to a
+                        destination object.
+
+Run with: PYTHONPATH=. python -m benchmark.suite [--sizes 1,16] [--targets csv,json]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmark.data import FORMATS, pii_column_count, pii_fields, write_dataset
+from gdpr_obfuscator import (
+    gdpr_obfuscator,
+    obfuscate_csv,
+    obfuscate_json,
+    obfuscate_jsonl,
+)
+
+TARGETS = ("csv", "jsonl", "json", "e2e-csv", "e2e-jsonl", "e2e-json")
+OBFUSCATE_FUNCS = {
+    "csv": obfuscate_csv,
+    "jsonl": obfuscate_jsonl,
+    "json": obfuscate_json,
+}
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, "latest.json")
+MB = 1024 * 1024
+
+
+class NullWriter(io.RawIOBase):
+    """A writable stream that counts and discards everything written to it."""
+
+    def __init__(self):
+        self.written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.written += len(data)
+        return len(data)
+
+
+def percentile(samples: list, q: float) -> float:
+    """The q-th percentile of `samples`, interpolating between closest ranks."""
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarise(case: dict, durations: list) -> dict:
+    """Add throughput and run-time statistics to a benchmark case."""
+    median = statistics.median(durations)
+    return dict(
+        case,
+        runs=durations,
+        mb_per_s=case["bytes"] / MB / median,
+        rows_per_s=case["rows"] / median,
+        p50_s=percentile(durations, 50),
+        p90_s=percentile(durations, 90),
+        p99_s=percentile(durations, 99),
+        min_s=min(durations),
+        max_s=max(durations),
+    )
+
+
+def time_local(target: str, path: str, fields: list, repeat: int) -> list:
+    durations = []
+    for _ in range(repeat):
+        with open(path, "rb") as body:
+            t1 = time.perf_counter()
+            OBFUSCATE_FUNCS[target](body, fields, NullWriter())
+            durations.append(time.perf_counter() - t1)
+    return durations
+
+
+def time_end_to_end(fmt: str, path: str, fields: list, repeat: int) -> list:
+    from boto3 import client
+    from moto import mock_aws
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+    durations = []
+    with mock_aws():
+        s3 = client("s3", region_name="eu-west-2")
+        s3.create_bucket(
+            Bucket="bench",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        with open(path, "rb") as body:
+            s3.put_object(Bucket="bench", Key=f"data.{fmt}", Body=body)
+        event = {
+            "file_to_obfuscate": f"s3://bench/data.{fmt}",
+            "pii_fields": fields,
+            "destination": f"s3://bench/output.{fmt}",
+        }
+        for _ in range(repeat):
+            t1 = time.perf_counter()
+            gdpr_obfuscator(event, s3)
+            durations.append(time.perf_counter() - t1)
+    return durations
+
+
+def run_suite(
+    targets: list, sizes: list, columns: int, pii_share: float, repeat: int
+) -> list:
+    results = []
+    pii_columns = pii_column_count(columns, pii_share)
+    fields = pii_fields(pii_columns)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in sizes:
+            for fmt in FORMATS:
+                fmt_targets = [t for t in targets if t.split("-")[-1] == fmt]
+                if not fmt_targets:
+                    continue
+                path = os.path.join(tmp, f"data.{fmt}")
+                rows = write_dataset(path, fmt, int(size_mb * MB), columns, pii_share)
+                for target in fmt_targets:
+                    case = {
+                        "target": target,
+                        "size_mb": size_mb,
+                        "bytes": os.path.getsize(path),
+                        "rows": rows,
+                        "columns": columns,
+                        "pii_columns": pii_columns,
+                    }
+                    if target.startswith("e2e-"):
+                        durations = time_end_to_end(fmt, path, fields, repeat)
+                    else:
+                        durations = time_local(target, path, fields, repeat)
+                    result = summarise(case, durations)
+                    results.append(result)
+                    print_result(result)
+                os.remove(path)
+    return results
+
+
+def case_key(result: dict) -> tuple:
+    return (
+        result["target"],
+        result["size_mb"],
+        result["columns"],
+        result["pii_columns"],
+    )
+
+
+def print_result(result: dict) -> None:
+    print(
+        f"{result['target']:10} {result['size_mb']:7g} MB"
+        f" {result['mb_per_s']:8.1f} MB/s {result['rows_per_s']:11,.0f} rows/s"
+        f"  p50 {result['p50_s']:.3f}s  p90 {result['p90_s']:.3f}s"
+        f"  p99 {result['p99_s']:.3f}s"
+    )
+
+
+def compare(results: list, baseline: dict) -> None:
+    previous = {case_key(result): result for result in baseline["results"]}
+    print(f"\nCompared with {baseline['meta']['timestamp']}:")
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None:
+            print(f"{result['target']:10} {result['size_mb']:7g} MB  no baseline")
+            continue
+        change = result["mb_per_s"] / old["mb_per_s"] - 1
+        print(
+            f"{result['target']:10} {result['size_mb']:7g} MB"
+            f" {old['mb_per_s']:8.1f} -> {result['mb_per_s']:8.1f} MB/s  {change:+.1%}"
+        )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--sizes", default="1,16", help="file sizes in MB")
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--pii-share", type=float, default=0.25)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument(
+        "--baseline",
+        help="results file to compare with; defaults to the existing --output file",
+    )
+    args = parser.parse_args(argv)
+
+    targets = args.targets.split(",")
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets {sorted(unknown)}, choose from {list(TARGETS)}")
+    sizes = [float(size) for size in args.sizes.split(",")]
+
+    results = run_suite(targets, sizes, args.columns, args.pii_share, args.repeat)
+
+    baseline_path = args.baseline or args.output
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            compare(results, json.load(f))
+    if os.path.exists(args.output) and not args.baseline:
+        shutil.copyfile(args.output, args.output.replace(".json", ".previous.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+    }
+    with open(args.output, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Obfuscate the PII in CSV, JSON, JSON Lines and Parquet files in S3 or elsewhere."""
+
+from .storage import (
+    DEFAULT_PART_SIZE,
+    MIN_PART_SIZE,
+    LocalStorage,
+    MappedReader,
+    MemoryStorage,
+    S3MultipartWriter,
+    S3Storage,
+    Storage,
+    get_s3_client,
+    memory_objects,
+    open_location,
+)
+from .metrics import InvocationMetrics, emit_emf_metrics
+from .buffers import SpoolingBuffer
+from .compression import COMPRESSION_CODECS
+from .strategies import MASKING_STRATEGIES, Pseudonymiser
+from .csv_obfuscator import CSV_ENGINES, iter_obfuscate_csv, obfuscate_csv
+from .json_obfuscator import (
+    JSON_CODECS,
+    get_json_codec,
+    iter_obfuscate_json,
+    iter_obfuscate_jsonl,
+    obfuscate_json,
+    obfuscate_jsonl,
+)
+from .parquet_obfuscator import iter_obfuscate_parquet, obfuscate_parquet
+from .sharding import iter_obfuscate_sharded, obfuscate_sharded
+from .events import validate_event
+from .profiling import summarise_profile
+from .resumable import obfuscate_resumable
+from .handler import gdpr_obfuscator, gdpr_obfuscator_batch, iter_obfuscate
+from .cli import main
+
+__all__ = [
+    "gdpr_obfuscator",
+    "gdpr_obfuscator_batch",
+    "iter_obfuscate",
+    "validate_event",
+    "obfuscate_csv",
+    "iter_obfuscate_csv",
+    "obfuscate_jsonl",
+    "iter_obfuscate_jsonl",
+    "obfuscate_json",
+    "iter_obfuscate_json",
+    "obfuscate_parquet",
+    "iter_obfuscate_parquet",
+    "obfuscate_sharded",
+    "iter_obfuscate_sharded",
+    "obfuscate_resumable",
+    "Pseudonymiser",
+    "MASKING_STRATEGIES",
+    "SpoolingBuffer",
+    "InvocationMetrics",
+    "emit_emf_metrics",
+    "summarise_profile",
+    "get_json_codec",
+    "JSON_CODECS",
+    "CSV_ENGINES",
+    "COMPRESSION_CODECS",
+    "memory_objects",
+    "open_location",
+    "get_s3_client",
+    "Storage",
+    "S3Storage",
+    "LocalStorage",
+    "MemoryStorage",
+    "MappedReader",
+    "S3MultipartWriter",
+    "MIN_PART_SIZE",
+    "DEFAULT_PART_SIZE",
+    "main",
+]
@@ -0,0 +1,7 @@
+"""Run the command line interface, `python -m gdpr_obfuscator`; see cli.main."""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,178 @@
+"""Output buffers that the obfuscators write their chunks to."""
+
+from io import BufferedIOBase, RawIOBase, BytesIO
+import os
+
+from typing import (
+    BinaryIO,
+    Iterable,
+    Iterator,
+    Optional,
+)
+
+
+DEFAULT_SPOOL_THRESHOLD = 32 * 1024 * 1024
+
+
+def join_chunks(chunks: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    """Join small chunks until they reach `chunk_size` bytes, skipping empty ones.
+
+
+    Args:
+        chunks (Iterable[bytes]): Chunks of any size.
+        chunk_size (int): The smallest chunk to yield, except the last.
+
+
+    Yields:
+        bytes: The same bytes in chunks of at least `chunk_size` bytes.
+    """
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= chunk_size:
+            yield pending[0] if len(pending) == 1 else b"".join(pending)
+            pending = []
+            pending_size = 0
+    if pending:
+        yield b"".join(pending)
+
+
+class ChunkCollector(RawIOBase):
+    """A writable stream that keeps what is written until it is drained.
+
+    It turns writers that push their output, such as pyarrow's ParquetWriter and
+    the compressing writers, into a source of chunks for a generator.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        """Get everything written since the last drain."""
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def write_chunks(chunks: Iterable[bytes], output_buffer=None) -> BinaryIO:
+    """Write the chunks of an iter_obfuscate_* generator to an output buffer.
+
+
+    Args:
+        chunks (Iterable[bytes]): The output chunks.
+        output_buffer: An optional writable file-like object to write them to.
+            Defaults to a new SpoolingBuffer.
+
+
+    Returns:
+        BinaryIO: `output_buffer`, at its start if it is seekable.
+    """
+    if output_buffer is None:
+        output_buffer = SpoolingBuffer()
+    for chunk in chunks:
+        output_buffer.write(chunk)
+    if output_buffer.seekable():
+        output_buffer.seek(0)
+    return output_buffer
+
+
+class SpoolingBuffer(BufferedIOBase):
+    """A seekable read/write buffer that spills to a temporary file when it grows.
+
+    Output is kept in a BytesIO until it holds more than `threshold` bytes, and is
+    then moved to an anonymous temporary file in `directory`, /tmp by default, so
+    a large output is limited by disk rather than memory. It can be read back,
+    iterated by line or passed to `put_object` like any other binary file.
+    """
+
+    def __init__(
+        self, threshold: int = DEFAULT_SPOOL_THRESHOLD, directory: Optional[str] = None
+    ):
+        """Create an empty buffer.
+
+
+        Args:
+            threshold (int): The most bytes to hold in memory.
+            directory (Optional[str]): Where to create the temporary file. Defaults
+                to tempfile's default directory, usually /tmp.
+        """
+        self.threshold = threshold
+        self.directory = directory
+        self._file = BytesIO()
+        self.spilled = False
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        if not self.spilled and self._file.tell() + len(data) > self.threshold:
+            self.spill()
+        return self._file.write(data)
+
+    def spill(self) -> None:
+        """Move the contents to the temporary file, keeping the position."""
+        if self.spilled:
+            return
+        import tempfile
+
+        spilled = tempfile.TemporaryFile(dir=self.directory)
+        spilled.write(self._file.getbuffer())
+        spilled.seek(self._file.tell())
+        self._file = spilled
+        self.spilled = True
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        return self._file.read(size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self._file.read1(size)
+
+    def readinto(self, buffer) -> int:
+        return self._file.readinto(buffer)
+
+    def readline(self, size: Optional[int] = -1) -> bytes:
+        return self._file.readline(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        return self._file.truncate(size)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def getvalue(self) -> bytes:
+        """Get the whole contents, wherever they are held."""
+        if not self.spilled:
+            return self._file.getvalue()
+        position = self._file.tell()
+        self._file.seek(0)
+        data = self._file.read()
+        self._file.seek(position)
+        return data
+
+    def close(self) -> None:
+        """Discard the contents, deleting the temporary file if there is one."""
+        super().close()
+        self._file.close()
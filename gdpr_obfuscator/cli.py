@@ -0,0 +1,254 @@
+"""The command line interface, `python -m gdpr_obfuscator`."""
+
+import json
+import os
+import sys
+import threading
+
+from typing import List, Optional, TextIO
+
+from .storage import GLOB_WILDCARD, open_location
+from .metrics import InvocationMetrics
+from .events import validate_event
+from .handler import obfuscate_event
+
+
+PROGRESS_INTERVAL = 0.5
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command line interface, `python -m gdpr_obfuscator`.
+
+    Each input is obfuscated with gdpr_obfuscator into the output, or into a file
+    of the same name in the output directory when there are several inputs or
+    the output ends with '/' or is an existing directory. An input may be a glob
+    of local paths or S3 keys, e.g. 's3://bucket/exports/*.csv'. Local paths are
+    turned into 'file://' URIs, the only way an event can name a local file. An
+    --event file supplies the pii_fields and other event keys, and its
+    file_to_obfuscate and destination when no inputs or --output are given.
+    Progress and throughput are reported on stderr. A file that fails is
+    reported, and the others still run.
+
+
+    Args:
+        argv (Optional[List[str]]): The arguments, without the program name.
+            Defaults to sys.argv[1:].
+
+
+    Returns:
+        int: The exit status: 0 if every file was obfuscated, 1 if any failed.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="gdpr_obfuscator",
+        description="Obfuscate PII fields in CSV, JSON, JSON Lines or Parquet files.",
+    )
+    parser.add_argument(
+        "inputs", nargs="*", help="local paths or s3:// URIs, or globs of them"
+    )
+    parser.add_argument("--event", help="a JSON file with a gdpr_obfuscator event")
+    parser.add_argument("--pii-fields", help="comma-separated field names to mask")
+    parser.add_argument("-o", "--output", help="the output path, URI or directory")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="split large CSV and JSON Lines files into shards obfuscated on this "
+        "many processes (sets shard_workers)",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="do not report progress"
+    )
+    args = parser.parse_args(argv)
+
+    base_event = {}
+    if args.event is not None:
+        with open(args.event, encoding="utf-8") as file:
+            base_event = json.load(file)
+        if not isinstance(base_event, dict):
+            parser.error("--event must contain a JSON object")
+    if args.pii_fields is not None:
+        base_event["pii_fields"] = [f for f in args.pii_fields.split(",") if f]
+    if "pii_fields" not in base_event:
+        parser.error("--pii-fields or an --event with pii_fields is required")
+    if args.workers is not None:
+        if args.workers < 1:
+            parser.error("--workers must be a positive integer")
+        base_event["shard_workers"] = args.workers
+    patterns = args.inputs
+    if not patterns and "file_to_obfuscate" in base_event:
+        patterns = [base_event["file_to_obfuscate"]]
+    if not patterns:
+        parser.error("no input files")
+    output = args.output or base_event.get("destination")
+    if output is None:
+        parser.error("--output or an --event with a destination is required")
+
+    try:
+        inputs = expand_inputs([path_to_uri(pattern) for pattern in patterns])
+    except (OSError, ValueError) as err:
+        print(f"gdpr_obfuscator: {err}", file=sys.stderr)
+        return 1
+    into_directory = len(inputs) > 1 or is_output_directory(output)
+    output = path_to_uri(output)
+    failed = 0
+    for uri in inputs:
+        event = dict(base_event, file_to_obfuscate=uri)
+        event["destination"] = output_uri(output, uri) if into_directory else output
+        try:
+            obfuscate_with_progress(event, None if args.quiet else sys.stderr)
+        except Exception as err:
+            print(f"{uri}: {err}", file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+
+def expand_inputs(patterns: List[str], s3=None) -> List[str]:
+    """Expand the globs among some input paths and URIs.
+
+
+    Args:
+        patterns (List[str]): Paths and URIs, which may contain '*', '?' or '['
+            wildcards. '**' matches local directories recursively.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+
+
+    Returns:
+        List[str]: The inputs in order, with each glob replaced by the sorted URIs
+            of the files it matches.
+
+
+    Raises:
+        ValueError: If a glob matches no files, or a URI is invalid.
+    """
+    uris = []
+    for pattern in patterns:
+        if not GLOB_WILDCARD.search(pattern):
+            uris.append(pattern)
+            continue
+        storage, key = open_location(pattern, s3)
+        matches = storage.glob(key)
+        if not matches:
+            raise ValueError(f"No files match {pattern}")
+        uris.extend(storage.uri(match) for match in matches)
+    return uris
+
+
+def path_to_uri(path: str) -> str:
+    """Turn a local path given on the command line into a 'file://' URI.
+
+    Anything that already has a scheme, such as an S3 URI, is returned as it is.
+    """
+    if "://" in path:
+        return path
+    return "file://" + os.path.abspath(path)
+
+
+def is_output_directory(output: str) -> bool:
+    """Check whether a CLI output names a directory rather than a file."""
+    return output.endswith(("/", os.sep)) or (
+        "://" not in output and os.path.isdir(output)
+    )
+
+
+def output_uri(directory: str, uri: str) -> str:
+    """Get the output path or URI in a directory for an input path or URI.
+
+
+    Args:
+        directory (str): A local directory, or an S3 or memory URI prefix.
+        uri (str): The input path or URI.
+
+
+    Returns:
+        str: The input's file name in `directory`.
+    """
+    name = os.path.basename(uri.rstrip("/"))
+    if "://" in directory:
+        return directory.rstrip("/") + "/" + name
+    return os.path.join(directory, name)
+
+
+def obfuscate_with_progress(event: dict, stream: Optional[TextIO] = None, s3=None):
+    """Obfuscate the file of an event, reporting progress on a stream.
+
+
+    Args:
+        event (dict): A gdpr_obfuscator event.
+        stream (Optional[TextIO]): Where to report progress, or None not to.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+
+
+    Returns:
+        The return value of gdpr_obfuscator.
+    """
+    validate_event(event)
+    if stream is None:
+        return obfuscate_event(event, s3)
+    storage, key = open_location(event["file_to_obfuscate"], s3)
+    metrics = InvocationMetrics(event["file_to_obfuscate"])
+    with ProgressReporter(metrics, storage.size(key), stream):
+        return obfuscate_event(event, s3, metrics)
+
+
+class ProgressReporter:
+    """Report the bytes read, and the throughput, of a run on a text stream.
+
+    On a terminal a status line is redrawn every PROGRESS_INTERVAL seconds from a
+    background thread. A summary line is written when the `with` block exits
+    without an error.
+    """
+
+    def __init__(
+        self,
+        metrics: InvocationMetrics,
+        total: int,
+        stream: TextIO,
+        interval: float = PROGRESS_INTERVAL,
+    ):
+        """Create a reporter for a run.
+
+
+        Args:
+            metrics (InvocationMetrics): The metrics the run updates.
+            total (int): The size of the input file in bytes.
+            stream (TextIO): Where to write, usually sys.stderr.
+            interval (float): Seconds between status lines.
+        """
+        self.metrics = metrics
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self) -> "ProgressReporter":
+        if self.stream.isatty():
+            self._thread = threading.Thread(target=self._report, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.stream.write("\r\x1b[K")
+        if exc_type is None:
+            self.stream.write(self.status() + "\n")
+        self.stream.flush()
+
+    def status(self) -> str:
+        """Describe the progress so far in one line."""
+        report = self.metrics.report()
+        done = report["bytes_in"]
+        percent = 100 * done / self.total if self.total else 100.0
+        rate = done / report["duration"] / 1024 / 1024 if report["duration"] else 0.0
+        return (
+            f"{report['file']}: {percent:.0f}% of {self.total / 1024 / 1024:.1f} MB, "
+            f"{rate:.1f} MB/s, {report['rows']:,} rows in {report['duration']:.1f} s"
+        )
+
+    def _report(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.stream.write("\r\x1b[K" + self.status())
+            self.stream.flush()
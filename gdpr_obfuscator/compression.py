@@ -0,0 +1,380 @@
+"""Reading and writing gzip, zstd and bz2 compressed files."""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import RawIOBase
+import os
+import re
+import struct
+import zlib
+
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+from .buffers import ChunkCollector
+
+
+COMPRESSION_CODECS = ("gzip", "zstd", "bz2")
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".bz2": "bz2"}
+# A bz2 stream starts with 'BZh', the block size, and a block or end-of-stream magic.
+COMPRESSION_MAGIC = (
+    (re.compile(rb"\x1f\x8b"), "gzip"),
+    (re.compile(rb"\x28\xb5\x2f\xfd"), "zstd"),
+    (re.compile(rb"BZh[1-9](?:1AY&SY|\x17rE8P\x90)"), "bz2"),
+)
+COMPRESSION_MAGIC_SIZE = 10
+GZIP_BLOCK_SIZE = 1024 * 1024
+GZIP_LEVEL = 6
+DEFAULT_COMPRESSION_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def iter_compressed(chunks: Iterable[bytes], codec: str) -> Iterator[bytes]:
+    """Compress a stream of chunks, yielding compressed data as it is produced.
+
+
+    Args:
+        chunks (Iterable[bytes]): The data to compress.
+        codec (str): 'gzip', 'zstd' or 'bz2'.
+
+
+    Yields:
+        bytes: Consecutive chunks of the compressed data.
+    """
+    collector = ChunkCollector()
+    compressed = open_compressed_writer(collector, codec)
+    for chunk in chunks:
+        compressed.write(chunk)
+        yield collector.drain()
+    compressed.finish()
+    yield collector.drain()
+
+
+def run_compressed(run: Callable, codec: str, output_buffer) -> BinaryIO:
+    """Call an obfuscation with an output buffer that compresses what it writes.
+
+
+    Args:
+        run (Callable): A function that writes to its `output_buffer` argument,
+            such as run_obfuscation with its other arguments bound.
+        codec (str): 'gzip', 'zstd' or 'bz2'.
+        output_buffer: A writable binary file-like object for the compressed data.
+
+
+    Returns:
+        BinaryIO: `output_buffer`, at its start if it is seekable.
+    """
+    compressed = open_compressed_writer(output_buffer, codec)
+    run(output_buffer=compressed)
+    compressed.finish()
+    if output_buffer.seekable():
+        output_buffer.seek(0)
+    return output_buffer
+
+
+def split_compression_suffix(key: str) -> Tuple[str, Optional[str]]:
+    """Split the compression suffix, such as '.gz', off an S3 key.
+
+
+    Args:
+        key (str): An S3 key, e.g. 'exports/orders.csv.gz'.
+
+
+    Returns:
+        Tuple[str, Optional[str]]: The key without the suffix and the codec it
+            names, or the key and None if it has no compression suffix.
+    """
+    for suffix, codec in COMPRESSION_SUFFIXES.items():
+        if key.endswith(suffix):
+            return key[: -len(suffix)], codec
+    return key, None
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    """Detect the compression codec of a file from its first bytes.
+
+
+    Args:
+        head (bytes): At least the first COMPRESSION_MAGIC_SIZE bytes of the file,
+            or all of it if it is shorter.
+
+
+    Returns:
+        Optional[str]: 'gzip', 'zstd' or 'bz2', or None if the data does not start
+            with the magic bytes of any of them.
+    """
+    for magic, codec in COMPRESSION_MAGIC:
+        if magic.match(head):
+            return codec
+    return None
+
+
+def open_decompressed(body, codec: Optional[str] = None):
+    """Wrap a binary stream so that reading it decompresses it on the fly.
+
+    Without a codec the first bytes are read to detect one from its magic bytes,
+    and then put back in front of the rest of the stream, or a seekable stream is
+    seeked back to them. Concatenated gzip
+    members, bz2 streams and zstd frames are all read through.
+
+
+    Args:
+        body: A readable binary file-like object, e.g. an S3 StreamingBody.
+        codec (Optional[str]): 'gzip', 'zstd' or 'bz2', or None to detect it.
+
+
+    Returns:
+        A readable binary file-like object with the decompressed data, or `body`
+            itself if it is not compressed.
+
+
+    Raises:
+        ValueError: If the codec is unknown, or is 'zstd' and the zstandard package
+            is not installed.
+    """
+    if codec is None:
+        seekable = getattr(body, "seekable", None)
+        start = body.tell() if seekable is not None and seekable() else None
+        head = body.read(COMPRESSION_MAGIC_SIZE)
+        codec = detect_compression(head)
+        if start is None:
+            body = PrefixedReader(head, body)
+        else:
+            body.seek(start)
+    if codec is None:
+        return body
+    if codec == "gzip":
+        import gzip
+
+        return gzip.GzipFile(fileobj=body, mode="rb")
+    if codec == "bz2":
+        import bz2
+
+        return bz2.BZ2File(body)
+    if codec == "zstd":
+        return (
+            import_zstandard()
+            .ZstdDecompressor()
+            .stream_reader(body, read_across_frames=True)
+        )
+    raise ValueError(f"compression must be one of {list(COMPRESSION_CODECS)}")
+
+
+def make_decompressor(codec: str):
+    """Create an incremental decompressor with `decompress`, `eof` and `unused_data`.
+
+
+    Args:
+        codec (str): 'gzip', 'zstd' or 'bz2'.
+
+
+    Returns:
+        A decompressor for a single gzip member, bz2 stream or zstd frame.
+    """
+    if codec == "gzip":
+        return zlib.decompressobj(wbits=31)
+    if codec == "bz2":
+        import bz2
+
+        return bz2.BZ2Decompressor()
+    if codec == "zstd":
+        return import_zstandard().ZstdDecompressor().decompressobj()
+    raise ValueError(f"compression must be one of {list(COMPRESSION_CODECS)}")
+
+
+def open_compressed_writer(
+    output_buffer, codec: str, workers: int = DEFAULT_COMPRESSION_WORKERS
+):
+    """Wrap a writable stream so that what is written to it is compressed.
+
+    gzip output is compressed in blocks on `workers` threads by ParallelGzipWriter,
+    and zstd output on zstd's own worker threads. bz2 is compressed on the calling
+    thread. The writer's `finish` method must be called to write the end of the
+    compressed stream.
+
+
+    Args:
+        output_buffer: A writable binary file-like object for the compressed data.
+        codec (str): 'gzip', 'zstd' or 'bz2'.
+        workers (int): The number of threads to compress gzip and zstd output on.
+
+
+    Returns:
+        ParallelGzipWriter or CompressingWriter: The compressing writer.
+
+
+    Raises:
+        ValueError: If the codec is unknown, or is 'zstd' and the zstandard package
+            is not installed.
+    """
+    if codec == "gzip":
+        return ParallelGzipWriter(output_buffer, workers)
+    if codec == "bz2":
+        import bz2
+
+        return CompressingWriter(output_buffer, bz2.BZ2Compressor())
+    if codec == "zstd":
+        zstandard = import_zstandard()
+        threads = workers if workers > 1 else 0
+        compressor = zstandard.ZstdCompressor(threads=threads).compressobj()
+        return CompressingWriter(output_buffer, compressor)
+    raise ValueError(f"compression must be one of {list(COMPRESSION_CODECS)}")
+
+
+def import_zstandard():
+    """Import the optional zstandard package, which zstd files need."""
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compression requires the zstandard package") from None
+    return zstandard
+
+
+class PrefixedReader(RawIOBase):
+    """A readable stream of some bytes already read followed by the rest of a stream."""
+
+    def __init__(self, prefix: bytes, body):
+        self.prefix = prefix
+        self.body = body
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.prefix:
+            return self.body.read(size if size >= 0 else None)
+        if size < 0:
+            data = self.prefix + self.body.read()
+        elif size <= len(self.prefix):
+            data = self.prefix[:size]
+        else:
+            data = self.prefix + self.body.read(size - len(self.prefix))
+        self.prefix = self.prefix[len(data) :]
+        return data
+
+
+class CompressingWriter(RawIOBase):
+    """A writable stream that compresses what is written to it into another stream."""
+
+    def __init__(self, output_buffer, compressor):
+        """Create a writer around a compressor with `compress` and `flush` methods."""
+        self.output_buffer = output_buffer
+        self.compressor = compressor
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        compressed = self.compressor.compress(data)
+        if compressed:
+            self.output_buffer.write(compressed)
+        return len(data)
+
+    def finish(self) -> None:
+        """Write the end of the compressed stream. The output stream is left open."""
+        self.output_buffer.write(self.compressor.flush())
+
+
+class ParallelGzipWriter(RawIOBase):
+    """A writable stream that gzips what is written to it on several threads.
+
+    Written bytes are cut into blocks of `block_size` that are deflated
+    independently on a thread pool, which zlib allows because it releases the GIL.
+    Every block but the last ends with a sync flush, so the blocks join into a
+    single deflate stream, and the CRC-32 of the whole input is computed in order
+    as blocks are submitted. The output is one ordinary gzip member that any gzip
+    reader can decompress. At most two blocks per worker are held in memory.
+    """
+
+    def __init__(
+        self,
+        output_buffer,
+        workers: int = DEFAULT_COMPRESSION_WORKERS,
+        block_size: int = GZIP_BLOCK_SIZE,
+        level: int = GZIP_LEVEL,
+    ):
+        """Create a writer and write the gzip header.
+
+
+        Args:
+            output_buffer: A writable binary file-like object for the gzip data.
+            workers (int): The number of compression threads. With 1, blocks are
+                compressed on the calling thread.
+            block_size (int): The number of bytes deflated at a time.
+            level (int): The zlib compression level.
+        """
+        self.output_buffer = output_buffer
+        self.workers = workers
+        self.block_size = block_size
+        self.level = level
+        self.pool = ThreadPoolExecutor(workers) if workers > 1 else None
+        self.pending = deque()
+        self.crc = 0
+        self.size = 0
+        self._buffer = bytearray()
+        # Magic, deflate, no flags, no mtime, no extra flags, unknown OS.
+        output_buffer.write(b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff")
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        """Buffer `data`, deflating a block each time the buffer fills up."""
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[: self.block_size])
+            del self._buffer[: self.block_size]
+            self._submit(block, last=False)
+        return len(data)
+
+    def finish(self) -> None:
+        """Deflate the buffered bytes and write the gzip trailer.
+
+        The output stream is left open.
+        """
+        try:
+            self._submit(bytes(self._buffer), last=True)
+            self._buffer.clear()
+            while self.pending:
+                self._write_next()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+        self.output_buffer.write(struct.pack("<II", self.crc, self.size & 0xFFFFFFFF))
+
+    def _submit(self, block: bytes, last: bool) -> None:
+        self.crc = zlib.crc32(block, self.crc)
+        self.size += len(block)
+        if self.pool is None:
+            self.output_buffer.write(deflate_block(block, self.level, last))
+            return
+        if len(self.pending) >= 2 * self.workers:
+            self._write_next()
+        self.pending.append(self.pool.submit(deflate_block, block, self.level, last))
+
+    def _write_next(self) -> None:
+        self.output_buffer.write(self.pending.popleft().result())
+
+
+def deflate_block(data: bytes, level: int, last: bool) -> bytes:
+    """Deflate a block of a stream on its own, as ParallelGzipWriter does.
+
+
+    Args:
+        data (bytes): The block.
+        level (int): The zlib compression level.
+        last (bool): Whether this is the last block of the stream.
+
+
+    Returns:
+        bytes: Raw deflate data that ends the stream if `last`, and otherwise ends
+            with a sync flush so the next block can follow it.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    flush_mode = zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    return compressor.compress(data) + compressor.flush(flush_mode)
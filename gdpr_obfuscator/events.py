@@ -0,0 +1,301 @@
+"""Validation of gdpr_obfuscator events and the options they select."""
+
+from typing import List, Optional, Union
+
+from .storage import Storage, as_storage
+from .metrics import InvocationMetrics
+from .compression import (
+    COMPRESSION_CODECS,
+    detect_compression,
+    make_decompressor,
+    split_compression_suffix,
+)
+from .strategies import get_pseudonymiser
+from .csv_obfuscator import (
+    CSV_ENGINES,
+    csv_string_to_list,
+    find_record_end,
+    get_col_nums,
+    iter_obfuscate_csv,
+    normalise_newlines,
+    obfuscate_csv,
+)
+from .json_obfuscator import (
+    JSON_CODECS,
+    compile_field_paths,
+    get_json_codec,
+    iter_obfuscate_json,
+    iter_obfuscate_jsonl,
+    obfuscate_json,
+    obfuscate_jsonl,
+)
+from .parquet_obfuscator import iter_obfuscate_parquet, obfuscate_parquet
+
+
+REQUIRED_EVENT_KEYS = {"file_to_obfuscate", "pii_fields"}
+OPTIONAL_EVENT_KEYS = {
+    "destination",
+    "shard_workers",
+    "validate_first_record_only",
+    "profile",
+    "pseudonymise",
+    "strategies",
+    "output_compression",
+    "pipeline_depth",
+    "spool_threshold",
+    "job_id",
+    "time_limit",
+    "json_codec",
+    "csv_engine",
+}
+
+PREFLIGHT_PROBE_SIZE = 16 * 1024
+
+
+def obfuscation_options(
+    event: dict, key: str, metrics: Optional["InvocationMetrics"] = None
+) -> dict:
+    """Get the keyword arguments of the obfuscate function for a validated event.
+
+
+    Args:
+        event (dict): A validated gdpr_obfuscator event.
+        key (str): The key of the target file.
+        metrics (Optional[InvocationMetrics]): Metrics to pass on, if any.
+
+
+    Returns:
+        dict: The options the event sets that apply to the file's type.
+    """
+    base_key = split_compression_suffix(key)[0]
+    options = {}
+    if event.get("validate_first_record_only") and base_key.endswith(".jsonl"):
+        options["validate_first_record_only"] = True
+    if event.get("pseudonymise"):
+        options["pseudonymiser"] = get_pseudonymiser()
+    if "strategies" in event:
+        options["strategies"] = event["strategies"]
+    if "json_codec" in event and base_key.endswith((".json", ".jsonl")):
+        options["codec"] = event["json_codec"]
+    if "csv_engine" in event and base_key.endswith(".csv"):
+        options["engine"] = event["csv_engine"]
+    if metrics is not None:
+        options["metrics"] = metrics
+    if "shard_workers" in event and base_key.endswith(".parquet"):
+        options["max_workers"] = event["shard_workers"]
+    return options
+
+
+def is_sharded(event: dict, key: str) -> bool:
+    """Check whether a validated event's file is obfuscated as byte-range shards.
+
+    Only uncompressed CSV and JSONL files are sharded.
+    """
+    return (
+        "shard_workers" in event
+        and split_compression_suffix(key)[1] is None
+        and key.endswith((".csv", ".jsonl"))
+    )
+
+
+def validate_event(event: dict) -> None:
+    """Check that an event has the keys and value types gdpr_obfuscator expects.
+
+
+    Args:
+        event (dict): The event passed to gdpr_obfuscator.
+
+
+    Raises:
+        TypeError: If `event` is not a dictionary or has invalid/missing fields.
+    """
+    if not isinstance(event, dict):
+        raise TypeError("event must be a dictionary")
+    actual_keys = set(event.keys())
+    if not REQUIRED_EVENT_KEYS <= actual_keys:
+        raise TypeError(
+            "event must contain the keys {'pii_fields', 'file_to_obfuscate'}"
+        )
+    unsupported_keys = actual_keys - REQUIRED_EVENT_KEYS - OPTIONAL_EVENT_KEYS
+    if unsupported_keys:
+        raise TypeError(f"event contains unsupported keys {sorted(unsupported_keys)}")
+    elif not isinstance(event["file_to_obfuscate"], str):
+        raise TypeError("file_to_obfuscate value must be a string")
+    elif not isinstance(event["pii_fields"], list) or any(
+        not isinstance(x, str) for x in event["pii_fields"]
+    ):
+        raise TypeError("pii_fields value must be a list of strings")
+    elif "destination" in event and not isinstance(event["destination"], str):
+        raise TypeError("destination value must be a string")
+    elif "shard_workers" in event and (
+        not isinstance(event["shard_workers"], int) or event["shard_workers"] < 1
+    ):
+        raise TypeError("shard_workers value must be a positive integer")
+    elif "validate_first_record_only" in event and not isinstance(
+        event["validate_first_record_only"], bool
+    ):
+        raise TypeError("validate_first_record_only value must be a boolean")
+    elif "profile" in event and not isinstance(event["profile"], bool):
+        raise TypeError("profile value must be a boolean")
+    elif "pseudonymise" in event and not isinstance(event["pseudonymise"], bool):
+        raise TypeError("pseudonymise value must be a boolean")
+    elif "strategies" in event and (
+        not isinstance(event["strategies"], dict)
+        or any(
+            not isinstance(field, str) or not isinstance(strategy, str)
+            for field, strategy in event["strategies"].items()
+        )
+    ):
+        raise TypeError("strategies value must be a dict of strings")
+    elif (
+        "output_compression" in event
+        and event["output_compression"] not in COMPRESSION_CODECS
+    ):
+        raise TypeError(
+            f"output_compression value must be one of {list(COMPRESSION_CODECS)}"
+        )
+    elif "pipeline_depth" in event and (
+        not isinstance(event["pipeline_depth"], int) or event["pipeline_depth"] < 1
+    ):
+        raise TypeError("pipeline_depth value must be a positive integer")
+    elif "spool_threshold" in event and (
+        not isinstance(event["spool_threshold"], int) or event["spool_threshold"] < 0
+    ):
+        raise TypeError("spool_threshold value must be a non-negative integer")
+    elif "job_id" in event and (
+        not isinstance(event["job_id"], str) or not event["job_id"]
+    ):
+        raise TypeError("job_id value must be a non-empty string")
+    elif "time_limit" in event and (
+        not isinstance(event["time_limit"], (int, float))
+        or isinstance(event["time_limit"], bool)
+        or event["time_limit"] < 0
+    ):
+        raise TypeError("time_limit value must be a non-negative number")
+    elif "json_codec" in event and event["json_codec"] not in JSON_CODECS:
+        raise TypeError(f"json_codec value must be one of {list(JSON_CODECS)}")
+    elif "csv_engine" in event and event["csv_engine"] not in CSV_ENGINES:
+        raise TypeError(f"csv_engine value must be one of {list(CSV_ENGINES)}")
+
+
+def preflight_check(
+    bucket: Union[str, "Storage"], key: str, pii_fields: List[str], s3=None
+) -> None:
+    """Check that a file has the given pii_fields before downloading all of it.
+
+    The CSV header or the first JSONL record is fetched with ranged GETs of
+    PREFLIGHT_PROBE_SIZE bytes and checked the same way the obfuscate functions
+    check it, decompressing them first if the file is compressed. JSON files,
+    Parquet files and empty files are not checked here.
+
+
+    Args:
+        bucket (Union[str, Storage]): The bucket containing the file, or the
+            storage backend holding it.
+        key (str): The key of the file.
+        pii_fields (List[str]): The field names to be obfuscated.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+
+
+    Raises:
+        ValueError: If a pii_field is not in the CSV header or first JSONL record.
+    """
+    base_key, codec = split_compression_suffix(key)
+    if not pii_fields or not base_key.endswith((".csv", ".jsonl")):
+        return
+    quoted = base_key.endswith(".csv")
+    first_record = read_first_record(bucket, key, quoted, s3, codec)
+    if quoted:
+        get_col_nums(csv_string_to_list(first_record.decode("utf-8")), pii_fields)
+    elif first_record.strip():
+        compile_field_paths(pii_fields)(get_json_codec().loads(first_record))
+
+
+def read_first_record(
+    bucket: Union[str, "Storage"],
+    key: str,
+    quoted: bool = False,
+    s3=None,
+    codec: Optional[str] = None,
+) -> bytes:
+    """Fetch the first line of an S3 object with as few small ranged GETs as needed.
+
+    A compressed object is decompressed incrementally, so only as much of it is
+    fetched as it takes to decompress the first record.
+
+
+    Args:
+        bucket (Union[str, Storage]): The bucket containing the object, or the
+            storage backend holding it.
+        key (str): The key of the object.
+        quoted (bool): Whether the object is a CSV file whose first record may have
+            new lines inside quotes.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+        codec (Optional[str]): The compression of the object, or None to detect it
+            from its magic bytes.
+
+
+    Returns:
+        bytes: The first record, with normalised line endings, or b"" if the object
+            is empty.
+    """
+    storage = as_storage(bucket, s3)
+    data = b""
+    offset = 0
+    decompressor = None
+    while True:
+        chunk = storage.read_range(key, offset, offset + PREFLIGHT_PROBE_SIZE)
+        if offset == 0:
+            codec = codec or detect_compression(chunk)
+            if codec is not None:
+                decompressor = make_decompressor(codec)
+        offset += len(chunk)
+        if decompressor is None:
+            data += chunk
+        else:
+            data += decompressor.decompress(chunk)
+            # Concatenated gzip members, bz2 streams or zstd frames.
+            while decompressor.eof and decompressor.unused_data:
+                rest = decompressor.unused_data
+                decompressor = make_decompressor(codec)
+                data += decompressor.decompress(rest)
+        # A record ending at the very end of the data may be a CR before an LF.
+        record = normalise_newlines(data)
+        if quoted:
+            end = find_record_end(record)
+        else:
+            end = record.find(b"\n") + 1 or len(record)
+        if end < len(record) or len(chunk) < PREFLIGHT_PROBE_SIZE:
+            return record[:end]
+
+
+def get_obfuscate_func(key: str, iterate: bool = False):
+    """Choose the obfuscate function matching the file extension of an S3 key.
+
+    A compression suffix after the extension, such as '.gz', is ignored.
+
+
+    Args:
+        key (str): The S3 key of the target file.
+        iterate (bool): Choose the generator variant, such as iter_obfuscate_csv.
+
+
+    Returns:
+        Callable: One of obfuscate_csv, obfuscate_jsonl, obfuscate_json or
+            obfuscate_parquet, or their iter_obfuscate_* variant.
+
+
+    Raises:
+        ValueError: If the key does not end in a supported file extension.
+    """
+    key = split_compression_suffix(key)[0]
+    file_types = [
+        (".csv", obfuscate_csv, iter_obfuscate_csv),
+        (".jsonl", obfuscate_jsonl, iter_obfuscate_jsonl),
+        (".json", obfuscate_json, iter_obfuscate_json),
+        (".parquet", obfuscate_parquet, iter_obfuscate_parquet),
+    ]
+    for file_type, obfuscate_func, iter_obfuscate_func in file_types:
+        if key.endswith(file_type):
+            return iter_obfuscate_func if iterate else obfuscate_func
+    raise ValueError("target file must be a csv or json")
@@ -0,0 +1,432 @@
+"""The gdpr_obfuscator entry point and the runs it makes for an event."""
+
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
+
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
+
+from .storage import Storage, as_storage, open_location
+from .metrics import InvocationMetrics, MeteredReader, MeteredWriter, metrics_stage
+from .buffers import DEFAULT_SPOOL_THRESHOLD, SpoolingBuffer, join_chunks
+from .pipeline import PrefetchReader, WriteBehindWriter
+from .compression import (
+    iter_compressed,
+    open_decompressed,
+    run_compressed,
+    split_compression_suffix,
+)
+from .sharding import iter_obfuscate_sharded, obfuscate_sharded
+from .events import (
+    get_obfuscate_func,
+    is_sharded,
+    obfuscation_options,
+    preflight_check,
+    validate_event,
+)
+from .profiling import PROFILE_SUFFIX, is_profiling_enabled, run_profiled
+from .resumable import obfuscate_resumable
+
+
+DEFAULT_BATCH_WORKERS = 16
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def gdpr_obfuscator(
+    event: dict,
+    s3=None,
+    metrics_sink: Optional[Callable[[dict], None]] = None,
+) -> Union["SpoolingBuffer", dict]:
+    """Obfuscate PII fields in a CSV, JSON, JSON Lines or Parquet file stored in S3.
+
+    This function expects an event dictionary containing the S3 URI of the target file
+    and a list of PII fields to be obfuscated. By default it returns a seekable
+    SpoolingBuffer containing the modified content with specified fields replaced by
+    '***'. The buffer moves to a temporary file in /tmp once it holds more than
+    'spool_threshold' bytes, 32 MiB by default, so the output does not have to fit
+    in memory.
+
+    If the event also contains a 'destination' S3 URI the output is never held in
+    memory as a whole: it is streamed to the destination with a multipart upload
+    while the source is still being read, and any partial upload is aborted if
+    obfuscation fails.
+
+    Before a CSV or JSONL file is downloaded, its header or first record is fetched
+    with a small ranged GET so that missing pii_fields are reported straight away.
+
+    Parquet files are rewritten one row group at a time, replacing only the PII
+    columns; see obfuscate_parquet.
+
+    The file and the destination can also be local files, as 'file://' URIs, or
+    'memory://' keys; see open_location. Local files are read through a memory
+    map, and a local destination is only replaced once the run succeeds.
+
+    Files compressed with gzip, zstd or bz2 are decompressed as they are read. The
+    codec comes from a '.gz', '.zst' or '.bz2' suffix after the file extension, or
+    from the file's magic bytes. The output is compressed when 'output_compression'
+    is given or the destination key has one of these suffixes.
+
+    With 'profile' in the event, or the GDPR_OBFUSCATOR_PROFILE environment variable
+    set to 1, fetching and obfuscating the file runs under cProfile. The profile is
+    uploaded next to the destination with a '.prof' suffix, or attached to the
+    returned stream as its `profile` attribute; see summarise_profile.
+
+    With 'pipeline_depth' in the event, downloading, obfuscating and uploading run
+    at the same time on separate threads linked by bounded queues, so a run takes
+    about as long as the slowest of them rather than their sum. The 'fetch' and
+    'upload' metrics then count only the time spent waiting for the other threads.
+
+    With 'job_id' in the event, a CSV or JSONL file is obfuscated in a resumable
+    job that saves a checkpoint next to the destination after every uploaded part,
+    so a call that times out or fails can be picked up by another call with the
+    same event; see obfuscate_resumable.
+
+    If a `metrics_sink` is given, it is called once per invocation, including failed
+    ones, with the report described in InvocationMetrics.report, e.g.
+    `metrics_sink=emit_emf_metrics` logs CloudWatch Embedded Metric Format lines.
+    Without a sink nothing is measured.
+
+    Args:
+        event (dict): A dictionary with the following keys:
+            - 'file_to_obfuscate' (str): The S3 URI, or another URI taken by
+              open_location, of the file.
+            - 'pii_fields' (List[str]): A list of field names to be obfuscated.
+            - 'destination' (str, optional): The S3 URI, or another URI taken
+              by open_location, to write the output to.
+            - 'shard_workers' (int, optional): Obfuscate a CSV or JSONL file as
+              byte-range shards on this many worker processes, or mask this
+              many row groups of a Parquet file at once.
+            - 'validate_first_record_only' (bool, optional): For JSONL files with
+              the same keys on every line, only check the first record for the
+              pii_fields.
+            - 'profile' (bool, optional): Capture a cProfile profile of the run.
+            - 'pseudonymise' (bool, optional): Replace values with keyed tokens
+              instead of '***'; see Pseudonymiser. The key is read from the
+              GDPR_OBFUSCATOR_PSEUDONYM_KEY environment variable.
+            - 'strategies' (dict, optional): A masking strategy for some of the
+              pii_fields, e.g. {'card_number': 'keep_last:4'}; see
+              compile_strategies.
+            - 'output_compression' (str, optional): Compress the output with
+              'gzip', 'zstd' or 'bz2'. Defaults to the codec of the destination
+              key's suffix, if any.
+            - 'pipeline_depth' (int, optional): Read the file ahead, and upload
+              to the destination behind, on background threads that queue up
+              to this many 1 MiB chunks; see PrefetchReader and
+              WriteBehindWriter.
+            - 'spool_threshold' (int, optional): Without a destination, the most
+              bytes of output to hold in memory before spilling it to a temporary
+              file.
+            - 'job_id' (str, optional): Run as a resumable job with this ID,
+              carrying on from its last checkpoint if there is one.
+            - 'time_limit' (float, optional): For a resumable job, return at the
+              first checkpoint after this many seconds.
+            - 'json_codec' (str, optional): The JSON library for JSON and JSONL
+              files, 'json' (the default) or 'orjson'; see get_json_codec.
+            - 'csv_engine' (str, optional): The engine for CSV files, 'bytes'
+              (the default), 'text' or 'numpy'; see obfuscate_csv. Sharded and
+              resumable runs edit blocks of rows, so 'text' runs as 'bytes'
+              there.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+        metrics_sink (Optional[Callable[[dict], None]]): An optional function to call
+            with the metrics of this invocation.
+
+    Returns:
+        Union[SpoolingBuffer, dict]: A stream containing the obfuscated file, or when a
+            destination is given, a dict with the 'Bucket', 'Key' and 'ETag' of the
+            uploaded object ('Path' for a local file, 'Key' for a memory object),
+            and the 'ProfileKey' of the profile when profiling. A resumable job
+            returns the dict described in obfuscate_resumable.
+
+    Raises:
+        TypeError: If `event` is not a dictionary or has invalid/missing fields.
+        ValueError: If the file is not a CSV or JSON, a URI is invalid, a
+            pii_field is missing from the file, a masking strategy is invalid or
+            pseudonymise is set without a key.
+    """
+    validate_event(event)
+    if metrics_sink is None:
+        return obfuscate_event(event, s3)
+
+    metrics = InvocationMetrics(event["file_to_obfuscate"])
+    try:
+        output = obfuscate_event(event, s3, metrics)
+        if isinstance(output, SpoolingBuffer):
+            metrics.bytes_out = output.seek(0, os.SEEK_END)
+            output.seek(0)
+        metrics.succeeded = True
+        return output
+    finally:
+        metrics_sink(metrics.report())
+
+
+def obfuscate_event(
+    event: dict, s3=None, metrics: Optional["InvocationMetrics"] = None
+) -> Union["SpoolingBuffer", dict]:
+    """Obfuscate the target file of a validated event, as gdpr_obfuscator does.
+
+
+    Args:
+        event (dict): A validated gdpr_obfuscator event.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+        metrics (Optional[InvocationMetrics]): Where to record stage times and
+            counts, if anywhere.
+
+
+    Returns:
+        Union[SpoolingBuffer, dict]: The return value of gdpr_obfuscator.
+    """
+    storage, key = open_location(event["file_to_obfuscate"], s3)
+    obfuscate_func = get_obfuscate_func(key)
+    with metrics_stage(metrics, "preflight"):
+        preflight_check(storage, key, event["pii_fields"])
+    if "job_id" in event:
+        return obfuscate_resumable(event, s3, metrics)
+    run = partial(run_obfuscation, event, storage, key, obfuscate_func, metrics=metrics)
+    profiling = is_profiling_enabled(event)
+    output_codec = event.get("output_compression")
+    if "destination" not in event:
+        threshold = event.get("spool_threshold", DEFAULT_SPOOL_THRESHOLD)
+        output_buffer = SpoolingBuffer(threshold)
+        if output_codec is not None:
+            run = partial(run_compressed, run, output_codec, output_buffer)
+        else:
+            run = partial(run, output_buffer=output_buffer)
+        if not profiling:
+            return run()
+        output, profile = run_profiled(run)
+        output.profile = profile
+        return output
+
+    dest_storage, dest_key = open_location(event["destination"], s3)
+    if output_codec is None:
+        output_codec = split_compression_suffix(dest_key)[1]
+    writer = dest_storage.create_writer(dest_key)
+    output_buffer = writer
+    write_behind = None
+    if "pipeline_depth" in event:
+        write_behind = WriteBehindWriter(writer, event["pipeline_depth"])
+        output_buffer = write_behind
+    if metrics is not None:
+        output_buffer = MeteredWriter(output_buffer, metrics)
+    if output_codec is not None:
+        run = partial(run_compressed, run, output_codec, output_buffer)
+    else:
+        run = partial(run, output_buffer=output_buffer)
+    try:
+        if profiling:
+            _, profile = run_profiled(run)
+        else:
+            run()
+        with metrics_stage(metrics, "upload"):
+            if write_behind is not None:
+                write_behind.finish()
+            result = writer.close()
+    except Exception:
+        if write_behind is not None:
+            write_behind.close()
+        writer.abort()
+        raise
+    if profiling:
+        result["ProfileKey"] = dest_key + PROFILE_SUFFIX
+        dest_storage.put(result["ProfileKey"], profile)
+    return result
+
+
+def iter_obfuscate(
+    event: dict, chunk_size: int = DEFAULT_CHUNK_SIZE, s3=None
+) -> Iterator[bytes]:
+    """Obfuscate the file of a gdpr_obfuscator event, yielding the output in chunks.
+
+    This is for callers that send the output somewhere other than S3, such as a
+    local file, a socket or their own uploader. Memory use is bounded by the chunk
+    size and the obfuscator's own blocks, and the first chunk is ready before the
+    rest of the input has been read.
+
+    The event is validated and the file checked with preflight_check when this is
+    called; the file is fetched when the first chunk is asked for, and read and
+    obfuscated as the chunks are consumed. 'destination' and 'profile' are not
+    used. Output is compressed when the event sets 'output_compression', and the
+    download is read ahead when it sets 'pipeline_depth'.
+
+
+    Args:
+        event (dict): A gdpr_obfuscator event.
+        chunk_size (int): Small pieces of output are joined until they reach this
+            many bytes. Larger pieces are yielded as they are.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+
+
+    Returns:
+        Iterator[bytes]: The obfuscated file, in chunks of at least `chunk_size`
+            bytes except the last.
+
+
+    Raises:
+        TypeError: If `event` is not a dictionary or has invalid/missing fields.
+        ValueError: If `chunk_size` is not positive, the file is not a supported
+            type, a URI is invalid or a pii_field is missing from the file.
+    """
+    validate_event(event)
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    storage, key = open_location(event["file_to_obfuscate"], s3)
+    iter_obfuscate_func = get_obfuscate_func(key, iterate=True)
+    preflight_check(storage, key, event["pii_fields"])
+    options = obfuscation_options(event, key)
+    if is_sharded(event, key):
+        chunks = iter_obfuscate_sharded(
+            storage,
+            key,
+            event["pii_fields"],
+            max_workers=event["shard_workers"],
+            **options,
+        )
+    else:
+
+        def iter_body_chunks():
+            with open_event_body(event, storage, key) as body:
+                yield from iter_obfuscate_func(body, event["pii_fields"], **options)
+
+        chunks = iter_body_chunks()
+    if "output_compression" in event:
+        chunks = iter_compressed(chunks, event["output_compression"])
+    return join_chunks(chunks, chunk_size)
+
+
+def gdpr_obfuscator_batch(
+    events: List[dict],
+    max_workers: int = DEFAULT_BATCH_WORKERS,
+    metrics_sink: Optional[Callable[[dict], None]] = None,
+) -> List[dict]:
+    """Obfuscate many files concurrently, sharing one S3 connection pool.
+
+    Each event is run through gdpr_obfuscator on a pool of `max_workers` threads, so
+    fetching, obfuscating and uploading different files overlap. All threads share
+    one boto3 client whose connection pool matches the number of threads. An event
+    that fails does not stop the others; its error is returned in its result.
+
+    Args:
+        events (List[dict]): gdpr_obfuscator events, one per file.
+        max_workers (int): The number of files to process at once.
+        metrics_sink (Optional[Callable[[dict], None]]): An optional function to call
+            with the metrics of each file, from the worker threads.
+
+    Returns:
+        List[dict]: One dict per event, in the same order, with the keys:
+            - 'event' (dict): The event.
+            - 'result': The return value of gdpr_obfuscator, or None on failure.
+            - 'error' (Exception): The exception raised, or None on success.
+    """
+    from boto3 import client
+    from botocore.config import Config
+
+    s3 = client("s3", config=Config(max_pool_connections=max_workers))
+
+    def run(event):
+        try:
+            return {
+                "event": event,
+                "result": gdpr_obfuscator(event, s3, metrics_sink),
+                "error": None,
+            }
+        except Exception as err:
+            return {"event": event, "result": None, "error": err}
+
+    with ThreadPoolExecutor(max_workers) as pool:
+        return list(pool.map(run, events))
+
+
+def run_obfuscation(
+    event: dict,
+    bucket: Union[str, "Storage"],
+    key: str,
+    obfuscate_func,
+    output_buffer: Optional[BinaryIO] = None,
+    s3=None,
+    metrics: Optional["InvocationMetrics"] = None,
+) -> BinaryIO:
+    """Fetch the target file of a validated event and obfuscate it.
+
+    A compressed file is decompressed as it is read; see open_decompressed.
+    Compressed files are never sharded, since a compressed stream cannot be split
+    into byte ranges. For Parquet files `shard_workers` sets the number of row
+    groups masked at once instead.
+
+    Args:
+        event (dict): A validated gdpr_obfuscator event.
+        bucket (Union[str, Storage]): The bucket containing the file, or the
+            storage backend holding it.
+        key (str): The key of the file.
+        obfuscate_func (Callable): The obfuscate function for the file type.
+        output_buffer: An optional writable file-like object to write the output to.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+        metrics (Optional[InvocationMetrics]): Where to record the time spent
+            reading the file, the bytes read and the rows processed, if anywhere.
+
+
+    Returns:
+        BinaryIO: The output buffer containing the obfuscated data.
+    """
+    storage = as_storage(bucket, s3)
+    options = obfuscation_options(event, key, metrics)
+    if is_sharded(event, key):
+        return obfuscate_sharded(
+            storage,
+            key,
+            event["pii_fields"],
+            output_buffer,
+            max_workers=event["shard_workers"],
+            **options,
+        )
+    with open_event_body(event, storage, key, metrics=metrics) as body:
+        return obfuscate_func(body, event["pii_fields"], output_buffer, **options)
+
+
+@contextmanager
+def open_event_body(
+    event: dict,
+    bucket: Union[str, "Storage"],
+    key: str,
+    s3=None,
+    metrics: Optional["InvocationMetrics"] = None,
+):
+    """Open the target file of a validated event for an obfuscate function to read.
+
+    The file is decompressed as it is read; see open_decompressed. With
+    'pipeline_depth' in the event, a PrefetchReader keeps that many chunks of the
+    download ahead of the reader, and is stopped when the block exits.
+
+
+    Args:
+        event (dict): A validated gdpr_obfuscator event.
+        bucket (Union[str, Storage]): The bucket containing the file, or the
+            storage backend holding it.
+        key (str): The key of the file.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+        metrics (Optional[InvocationMetrics]): Where to record the time spent
+            waiting for the file and the bytes read, if anywhere.
+
+
+    Yields:
+        A readable binary file-like object of the file's contents.
+    """
+    with metrics_stage(metrics, "fetch"):
+        body = as_storage(bucket, s3).open(key)
+    prefetch = None
+    if "pipeline_depth" in event:
+        body = prefetch = PrefetchReader(body, event["pipeline_depth"])
+    if metrics is not None:
+        body = MeteredReader(body, metrics)
+    try:
+        yield open_decompressed(body, split_compression_suffix(key)[1])
+    finally:
+        if prefetch is not None:
+            prefetch.close()
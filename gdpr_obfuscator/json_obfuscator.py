@@ -0,0 +1,742 @@
+"""Obfuscation of JSON and JSON Lines files, and the pii_field paths they use."""
+
+from functools import lru_cache, partial
+from io import TextIOWrapper, BytesIO
+import json
+import re
+
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+)
+
+from .metrics import InvocationMetrics
+from .buffers import write_chunks
+from .strategies import Pseudonymiser, compile_strategies, drop_value, redact_value
+from .csv_obfuscator import iter_newline_blocks
+
+
+JSON_CODECS = ("orjson", "json")
+JSON_READ_SIZE = 64 * 1024
+JSON_BATCH_RECORDS = 1000
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+JSON_NUMBER = re.compile(r"[-+.0-9eE]*")
+# orjson reads integers outside the signed and unsigned 64-bit ranges as floats.
+# Some 19-digit integers are already outside them, so any text with a run of 19
+# digits is decoded by the standard library instead.
+ORJSON_MAX_DIGITS = 19
+ORJSON_UNSAFE_NUMBER = re.compile(f"[0-9]{{{ORJSON_MAX_DIGITS},}}")
+FIELD_PATH_WILDCARD = "[*]"
+
+
+def obfuscate_jsonl(
+    body: BytesIO,
+    pii_fields: List[str],
+    output_buffer: Optional[BinaryIO] = None,
+    codec: Optional[str] = None,
+    validate_first_record_only: bool = False,
+    metrics: Optional["InvocationMetrics"] = None,
+    pseudonymiser: Optional["Pseudonymiser"] = None,
+    strategies: Optional[dict] = None,
+) -> BinaryIO:
+    """Obfuscate specified fields in a JSONL (JSON Lines) file-like object.
+
+    Reads a stream of JSON objects (one per line), replaces the values of specified
+    PII fields with '***', and writes the modified content to an output stream.
+
+    The body is read in blocks of whole lines, each object is masked in place, and
+    the encoded lines of a block are written out together. Fields may be paths into
+    nested objects and arrays, such as 'orders[*].card_number'; see
+    compile_field_paths.
+
+    By default every object is checked for every pii_field. With
+    `validate_first_record_only` only the first object is checked and the rest are
+    masked without the checks, which is faster for files where every line has the
+    same keys; fields and nested paths missing from later objects are skipped.
+
+    Args:
+        body: A file-like object (e.g., BytesIO) containing JSONL data.
+        pii_fields (List[str]): A list of field names to be obfuscated in each JSON object.
+            Fields may be paths into nested objects and arrays; see
+            compile_field_paths.
+        output_buffer: An optional writable file-like object to write the output to,
+            e.g. an S3MultipartWriter. Defaults to a new SpoolingBuffer.
+        codec (Optional[str]): The JSON library to use, 'orjson' or 'json'. Defaults
+            to 'json'; see get_json_codec.
+        validate_first_record_only (bool): Only check the first object for the
+            pii_fields.
+        metrics (Optional[InvocationMetrics]): Where to count the rows written, if
+            anywhere.
+        pseudonymiser (Optional[Pseudonymiser]): Replace each PII value with its
+            token instead of '***'.
+        strategies (Optional[dict]): A masking strategy for some of the
+            pii_fields; see compile_strategies.
+
+    Returns:
+        BinaryIO: The output buffer containing the obfuscated JSONL data.
+
+    Raises:
+        ValueError: If a specified pii_field is not present in a checked JSON object,
+            or a strategy is invalid.
+        JSONDecodeError: If a line is not valid JSON.
+    """
+    chunks = iter_obfuscate_jsonl(
+        body,
+        pii_fields,
+        codec,
+        validate_first_record_only,
+        metrics,
+        pseudonymiser,
+        strategies,
+    )
+    return write_chunks(chunks, output_buffer)
+
+
+def iter_obfuscate_jsonl(
+    body: BytesIO,
+    pii_fields: List[str],
+    codec: Optional[str] = None,
+    validate_first_record_only: bool = False,
+    metrics: Optional["InvocationMetrics"] = None,
+    pseudonymiser: Optional["Pseudonymiser"] = None,
+    strategies: Optional[dict] = None,
+) -> Iterator[bytes]:
+    """Obfuscate a JSONL file-like object, yielding the output as it is produced.
+
+    One chunk of encoded lines is yielded per block of the body, and the body is
+    only read as far as the consumer has asked for. See obfuscate_jsonl.
+
+
+    Args:
+        body: A file-like object (e.g., BytesIO) containing JSONL data.
+        pii_fields (List[str]): The field names or paths to be obfuscated.
+        codec (Optional[str]): The JSON library to use, 'orjson' or 'json'.
+        validate_first_record_only (bool): Only check the first object for the
+            pii_fields.
+        metrics (Optional[InvocationMetrics]): Where to count the rows, if anywhere.
+        pseudonymiser (Optional[Pseudonymiser]): Tokenise values by default.
+        strategies (Optional[dict]): A masking strategy for some of the
+            pii_fields; see compile_strategies.
+
+
+    Yields:
+        bytes: Consecutive chunks of the obfuscated JSONL data.
+
+
+    Raises:
+        ValueError: If a specified pii_field is not present in a checked JSON object,
+            or a strategy is invalid.
+        JSONDecodeError: If a line is not valid JSON.
+    """
+    json_codec = get_json_codec(codec)
+    mask_checked = compile_field_paths(
+        pii_fields, pseudonymiser=pseudonymiser, strategies=strategies
+    )
+    mask_unchecked = compile_field_paths(
+        pii_fields, check=False, pseudonymiser=pseudonymiser, strategies=strategies
+    )
+    check_next = True
+
+    for block in iter_newline_blocks(body, quoted=False):
+        lines = block.decode("utf-8").split("\n")
+        if lines[-1] == "":
+            lines.pop()
+        records = list(map(json_codec.loads, lines))
+        for record in records:
+            if check_next:
+                mask_checked(record)
+                check_next = not validate_first_record_only
+            else:
+                mask_unchecked(record)
+        encoded = list(map(json_codec.dumps, records))
+        encoded.append(b"")
+        yield b"\n".join(encoded)
+        if metrics is not None:
+            metrics.rows += len(records)
+
+
+def obfuscate_json(
+    body: BytesIO,
+    pii_fields: List[str],
+    output_buffer: Optional[BinaryIO] = None,
+    codec: Optional[str] = None,
+    metrics: Optional["InvocationMetrics"] = None,
+    pseudonymiser: Optional["Pseudonymiser"] = None,
+    strategies: Optional[dict] = None,
+) -> BinaryIO:
+    """Obfuscate specified fields in a JSON file-like object.
+
+    Reads a JSON input stream, replaces the values of specified PII fields with '***',
+    and writes the modified content to an output stream.
+
+    Fields may be paths into nested objects and arrays of each record, such as
+    'customer.contact.email' or 'orders[*].card_number'; see compile_field_paths.
+
+    A top-level list of records, or a dict whose values are lists of records, is
+    parsed and written one record at a time, so memory use is bounded by the largest
+    record rather than the whole file. The output is identical to encoding the whole
+    obfuscated document at once with the chosen codec.
+
+    Args:
+        body: A file-like object (e.g., BytesIO) containing the JSON data.
+        pii_fields (List[str]): A list of header names to be obfuscated.
+        output_buffer: An optional writable file-like object to write the output to,
+            e.g. an S3MultipartWriter. Defaults to a new SpoolingBuffer.
+        codec (Optional[str]): The JSON library used to encode the output, 'orjson'
+            or 'json'. Defaults to 'json'; see get_json_codec.
+        metrics (Optional[InvocationMetrics]): Where to count the records written,
+            if anywhere.
+        pseudonymiser (Optional[Pseudonymiser]): Replace each PII value with its
+            token instead of '***'.
+        strategies (Optional[dict]): A masking strategy for some of the
+            pii_fields; see compile_strategies.
+
+    Returns:
+        BinaryIO: The output buffer containing the obfuscated JSON data.
+
+    Raises:
+        ValueError: If any specified pii_fields are not found in the JSON header, or
+            a strategy is invalid.
+        JSONDecodeError: If body contains invalid JSON.
+    """
+    chunks = iter_obfuscate_json(
+        body, pii_fields, codec, metrics, pseudonymiser, strategies
+    )
+    return write_chunks(chunks, output_buffer)
+
+
+def iter_obfuscate_json(
+    body: BytesIO,
+    pii_fields: List[str],
+    codec: Optional[str] = None,
+    metrics: Optional["InvocationMetrics"] = None,
+    pseudonymiser: Optional["Pseudonymiser"] = None,
+    strategies: Optional[dict] = None,
+) -> Iterator[bytes]:
+    """Obfuscate a JSON file-like object, yielding the output as it is produced.
+
+    Arrays of records are yielded in batches of JSON_BATCH_RECORDS as they are
+    parsed, so the body is only read as far as the consumer has asked for. See
+    obfuscate_json.
+
+
+    Args:
+        body: A file-like object (e.g., BytesIO) containing the JSON data.
+        pii_fields (List[str]): The field names or paths to be obfuscated.
+        codec (Optional[str]): The JSON library used to encode the output, 'orjson'
+            or 'json'.
+        metrics (Optional[InvocationMetrics]): Where to count the records, if
+            anywhere.
+        pseudonymiser (Optional[Pseudonymiser]): Tokenise values by default.
+        strategies (Optional[dict]): A masking strategy for some of the
+            pii_fields; see compile_strategies.
+
+
+    Yields:
+        bytes: Consecutive chunks of the obfuscated JSON data.
+
+
+    Raises:
+        ValueError: If a specified pii_field is not present in a record, or a
+            strategy is invalid.
+        JSONDecodeError: If body contains invalid JSON.
+    """
+    json_codec = get_json_codec(codec)
+    mask = compile_field_paths(
+        pii_fields, pseudonymiser=pseudonymiser, strategies=strategies
+    )
+
+    stream = JsonStream(TextIOWrapper(body, encoding="utf-8-sig"))
+    if stream.peek() == "[":
+        yield from iter_json_array(stream, mask, json_codec, metrics)
+    elif stream.peek() == "{":
+        stream.expect("{")
+        yield b"{"
+        if stream.peek() == "}":
+            stream.expect("}")
+        else:
+            while True:
+                key = stream.value()
+                if not isinstance(key, str):
+                    stream.error("Expecting property name enclosed in double quotes")
+                stream.expect(":")
+                yield json_codec.dumps(key) + json_codec.key_separator
+                if stream.peek() == "[":
+                    yield from iter_json_array(stream, mask, json_codec, metrics)
+                else:
+                    value = stream.value()
+                    for row in value:
+                        mask(row)
+                    yield json_codec.dumps(value)
+                    if metrics is not None:
+                        metrics.rows += len(value)
+                if stream.expect(",", "}") == "}":
+                    break
+                yield json_codec.item_separator
+        yield b"}"
+    else:
+        yield json_codec.dumps(stream.value())
+    stream.expect_end()
+
+
+def iter_json_array(
+    stream,
+    mask: Callable[[object], None],
+    json_codec: "JsonCodec",
+    metrics: Optional["InvocationMetrics"] = None,
+) -> Iterator[bytes]:
+    """Obfuscate the records of a JSON array one at a time as they are parsed.
+
+    Records are masked as they are read and yielded in batches of
+    JSON_BATCH_RECORDS, formatted exactly as the codec would format the whole array.
+
+
+    Args:
+        stream (JsonStream): A stream positioned at the start of the array.
+        mask (Callable[[object], None]): A function from compile_field_paths that
+            masks a record in place.
+        json_codec (JsonCodec): The codec used to encode the records.
+        metrics (Optional[InvocationMetrics]): Where to count the records, if
+            anywhere.
+
+
+    Yields:
+        bytes: Consecutive chunks of the obfuscated array.
+
+
+    Raises:
+        ValueError: If a specified pii_field is not present in a record.
+        JSONDecodeError: If the array is not valid JSON.
+    """
+    stream.expect("[")
+    yield b"["
+    if stream.peek() == "]":
+        stream.expect("]")
+    else:
+        batch = []
+        separator = b""
+        while True:
+            row = stream.value()
+            mask(row)
+            batch.append(row)
+            end = stream.expect(",", "]") == "]"
+            if end or len(batch) == JSON_BATCH_RECORDS:
+                # Encoding the batch as one list matches the codec's item spacing.
+                encoded = json_codec.dumps(batch)[1:-1]
+                yield separator + encoded
+                if metrics is not None:
+                    metrics.rows += len(batch)
+                batch = []
+                separator = json_codec.item_separator
+            if end:
+                break
+    yield b"]"
+
+
+class JsonCodec(NamedTuple):
+    """A JSON library's decode and encode functions and its output separators."""
+
+    name: str
+    loads: Callable
+    dumps: Callable
+    item_separator: bytes
+    key_separator: bytes
+
+
+class NonFiniteFloat(float):
+    """A NaN or infinity decoded by the standard library for the orjson codec.
+
+    orjson writes NaN and infinity as null but refuses float subclasses, so a
+    record holding one is encoded by the standard library instead, which writes
+    them back as NaN and Infinity.
+    """
+
+
+def encode_json(value) -> bytes:
+    """Encode a value with the standard library, as UTF-8 bytes."""
+    return json.dumps(value).encode("utf-8")
+
+
+def make_orjson_codec(orjson) -> JsonCodec:
+    """Build the orjson codec, falling back to the standard library per record.
+
+    orjson reads integers beyond 64 bits as floats and rejects NaN and Infinity,
+    which the standard library accepts. Records with a run of ORJSON_MAX_DIGITS
+    digits, or that orjson cannot decode, are decoded by the standard library, and
+    records orjson cannot encode, such as ones holding those values, are encoded
+    by it, so no value is changed. Those records keep json.dumps' separators.
+
+
+    Args:
+        orjson: The imported orjson module.
+
+
+    Returns:
+        JsonCodec: The 'orjson' codec.
+    """
+    decode_fallback = partial(json.loads, parse_constant=NonFiniteFloat)
+
+    def loads(data):
+        if ORJSON_UNSAFE_NUMBER.search(data):
+            return decode_fallback(data)
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return decode_fallback(data)
+
+    def dumps(value) -> bytes:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            return encode_json(value)
+
+    return JsonCodec("orjson", loads, dumps, b",", b":")
+
+
+@lru_cache(maxsize=None)
+def get_json_codec(name: Optional[str] = None) -> JsonCodec:
+    """Get the codec used to decode and encode JSON records.
+
+    The standard library is the default, since it reads and writes every value
+    exactly, including integers beyond 64 bits, NaN and Infinity. orjson is several
+    times faster but is an optional dependency that has to be asked for. It writes
+    compact JSON with no spaces after separators, whereas the 'json' codec writes
+    exactly what json.dumps writes; see make_orjson_codec for the values it hands
+    to the standard library. Asking for orjson when it is not installed returns the
+    'json' codec.
+
+
+    Args:
+        name (Optional[str]): 'orjson', 'json', or None for 'json'.
+
+
+    Returns:
+        JsonCodec: The codec.
+
+
+    Raises:
+        ValueError: If the name is not a known codec.
+    """
+    if name is not None and name not in JSON_CODECS:
+        raise ValueError(f"codec must be one of {list(JSON_CODECS)}")
+    if name == "orjson":
+        try:
+            import orjson
+        except ImportError:
+            pass
+        else:
+            return make_orjson_codec(orjson)
+    return JsonCodec("json", json.loads, encode_json, b", ", b": ")
+
+
+def compile_field_paths(
+    pii_fields: List[str],
+    check: bool = True,
+    pseudonymiser: Optional[Pseudonymiser] = None,
+    strategies: Optional[dict] = None,
+) -> Callable[[object], None]:
+    """Compile pii_fields into a function that masks them in a JSON record in place.
+
+    A field may be a dotted path into nested objects, e.g. 'customer.contact.email',
+    and '[*]' after a key applies the rest of the path to every item of an array,
+    e.g. 'orders[*].card_number'. The paths are merged into a tree once, so each
+    record only walks the branches that lead to a PII field. Plain top-level
+    fields that are all redacted are masked with mask_record.
+
+    A record with a top-level key spelled exactly like a field, such as
+    'user.email', has that key masked instead of the path. The tree for each set
+    of such keys is compiled the first time a record has them.
+
+
+    Args:
+        pii_fields (List[str]): Field names or paths to be obfuscated.
+        check (bool): Raise ValueError for a field missing from a record. When
+            False missing fields and missing or mistyped branches are skipped.
+        pseudonymiser (Optional[Pseudonymiser]): Replace each value with its token
+            instead of '***'.
+        strategies (Optional[dict]): A masking strategy for some of the fields; see
+            compile_strategies.
+
+
+    Returns:
+        Callable[[object], None]: A function that masks one record in place.
+    """
+    masks = compile_strategies(pii_fields, strategies, pseudonymiser)
+    paths = [parse_field_path(field) for field in pii_fields]
+    flat = all(len(path) == 1 and path[0] != FIELD_PATH_WILDCARD for path in paths)
+    if flat and masks is None:
+        if check:
+            return partial(mask_record, pii_fields=pii_fields)
+
+        def update_record(row):
+            for field in pii_fields:
+                if field in row:
+                    row[field] = "***"
+
+        return update_record
+
+    field_masks = dict(zip(pii_fields, masks or [redact_value] * len(pii_fields)))
+    literal_fields = [
+        field for field, path in zip(pii_fields, paths) if path != [field]
+    ]
+    if not literal_fields:
+        return compile_path_tree(pii_fields, paths, check, field_masks)
+
+    compiled = {}
+
+    def mask_paths(record):
+        literal = ()
+        if isinstance(record, dict):
+            literal = tuple(field for field in literal_fields if field in record)
+        mask = compiled.get(literal)
+        if mask is None:
+            literal_paths = [
+                [field] if field in literal else path
+                for field, path in zip(pii_fields, paths)
+            ]
+            mask = compile_path_tree(pii_fields, literal_paths, check, field_masks)
+            compiled[literal] = mask
+        mask(record)
+
+    return mask_paths
+
+
+def compile_path_tree(
+    pii_fields: List[str], paths: List[List[str]], check: bool, field_masks: dict
+) -> Callable[[object], None]:
+    """Merge the paths of the pii_fields into a tree and compile it.
+
+
+    Args:
+        pii_fields (List[str]): Field names or paths to be obfuscated.
+        paths (List[List[str]]): The path of each field, from parse_field_path.
+        check (bool): Raise ValueError for a missing field; see compile_field_paths.
+        field_masks (dict): The mask of each field from compile_strategies.
+
+
+    Returns:
+        Callable[[object], None]: A function that masks one record in place.
+    """
+    tree = {}
+    for field, path in zip(pii_fields, paths):
+        node = tree
+        for token in path[:-1]:
+            node.setdefault(token, (field, {}))
+            if node[token][1] is None:
+                break
+            node = node[token][1]
+        else:
+            node[path[-1]] = (field, None)
+    return compile_path_node(tree, check, field_masks)
+
+
+def parse_field_path(field: str) -> List[str]:
+    """Split a pii_field into the keys and '[*]' wildcards of its path.
+
+
+    Args:
+        field (str): A field name or path, e.g. 'orders[*].card_number'.
+
+
+    Returns:
+        List[str]: The path, e.g. ['orders', '[*]', 'card_number'].
+    """
+    path = []
+    for key in field.split("."):
+        wildcards = 0
+        while key.endswith(FIELD_PATH_WILDCARD) and len(key) > len(FIELD_PATH_WILDCARD):
+            key = key[: -len(FIELD_PATH_WILDCARD)]
+            wildcards += 1
+        path.append(key)
+        path.extend([FIELD_PATH_WILDCARD] * wildcards)
+    return path
+
+
+def compile_path_node(
+    tree: dict, check: bool, field_masks: dict
+) -> Callable[[object], None]:
+    """Compile one node of a path tree from compile_field_paths into a function.
+
+
+    Args:
+        tree (dict): Maps each key, or '[*]', to a tuple of the first field that
+            passes through it and its subtree, or None if its value is masked.
+        check (bool): Raise ValueError for a missing field; see compile_field_paths.
+        field_masks (dict): The mask of each field from compile_strategies.
+
+
+    Returns:
+        Callable[[object], None]: A function that masks the node's value in place.
+    """
+    leaves = []
+    dropped = []
+    branches = []
+    for key, (field, subtree) in tree.items():
+        if key == FIELD_PATH_WILDCARD:
+            continue
+        if subtree is None and field_masks[field] is drop_value:
+            dropped.append((key, field))
+        elif subtree is None:
+            mask = field_masks[field]
+            leaves.append((key, field, mask))
+        else:
+            mask_child = compile_path_node(subtree, check, field_masks)
+            branches.append((key, field, mask_child))
+    wildcard_field, wildcard_tree = tree.get(FIELD_PATH_WILDCARD, (None, None))
+    if wildcard_tree is not None:
+        mask_item = compile_path_node(wildcard_tree, check, field_masks)
+
+        def mask_items(items):
+            for item in items:
+                mask_item(item)
+
+    elif wildcard_field is not None:
+        wildcard_mask = field_masks[wildcard_field]
+        if wildcard_mask is drop_value:
+            mask_items = list.clear
+        elif wildcard_mask is redact_value:
+
+            def mask_items(items):
+                items[:] = ["***"] * len(items)
+
+        else:
+
+            def mask_items(items):
+                items[:] = map(wildcard_mask, items)
+
+    keyed = leaves + dropped + branches
+    keyed_field = keyed[0][1] if keyed else None
+
+    def mask_node(value):
+        if wildcard_field is not None:
+            if isinstance(value, list):
+                mask_items(value)
+            elif check:
+                raise ValueError(
+                    f"The pii_field '{wildcard_field}' not found in headers."
+                )
+        if keyed_field is None:
+            return
+        if not isinstance(value, dict):
+            if check:
+                raise ValueError(f"The pii_field '{keyed_field}' not found in headers.")
+            return
+        for key, field, mask in leaves:
+            if key in value:
+                value[key] = mask(value[key])
+            elif check:
+                raise ValueError(f"The pii_field '{field}' not found in headers.")
+        for key, field in dropped:
+            if key in value:
+                del value[key]
+            elif check:
+                raise ValueError(f"The pii_field '{field}' not found in headers.")
+        for key, field, mask_child in branches:
+            if key in value:
+                mask_child(value[key])
+            elif check:
+                raise ValueError(f"The pii_field '{field}' not found in headers.")
+
+    return mask_node
+
+
+def mask_record(row, pii_fields: List[str]) -> None:
+    """Replace the values of PII fields in a JSON record with '***' in place.
+
+
+    Args:
+        row (dict): A JSON object.
+        pii_fields (List[str]): A list of field names to be obfuscated.
+
+
+    Raises:
+        ValueError: If a specified pii_field is not present in the record.
+    """
+    for field in pii_fields:
+        if field in row:
+            row[field] = "***"
+        else:
+            raise ValueError(f"The pii_field '{field}' not found in headers.")
+
+
+class JsonStream:
+    """An incremental reader for JSON text that parses one value at a time.
+
+    The text is read in blocks of JSON_READ_SIZE characters and each value is
+    decoded with `JSONDecoder.raw_decode`, so memory use is bounded by the largest
+    single value rather than the whole document.
+    """
+
+    decoder = json.JSONDecoder(parse_constant=NonFiniteFloat)
+
+    def __init__(self, text_stream):
+        """Create a reader over a readable text stream, e.g. a TextIOWrapper."""
+        self.text_stream = text_stream
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at the end."""
+        while True:
+            if self.pos < len(self.buffer) and self.buffer[self.pos] not in " \t\n\r":
+                return self.buffer[self.pos]
+            self.pos = JSON_WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ""
+            self.fill()
+
+    def expect(self, *chars: str) -> str:
+        """Consume the next non-whitespace character, which must be one of `chars`."""
+        char = self.peek()
+        if not char or char not in chars:
+            self.error(f"Expecting {' or '.join(repr(c) for c in chars)}")
+        self.pos += 1
+        return char
+
+    def expect_end(self) -> None:
+        """Check that only whitespace is left in the stream."""
+        if self.peek():
+            self.error("Extra data")
+
+    def value(self):
+        """Decode the next complete JSON value, reading more text as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            # A number that runs to the end of the buffer, e.g. `1.` or `1.2e`,
+            # may continue in the next block, so its prefix is not the value.
+            if (
+                not self.eof
+                and isinstance(value, (int, float))
+                and JSON_NUMBER.match(self.buffer, self.pos).end() == len(self.buffer)
+            ):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+    def fill(self) -> None:
+        """Drop consumed text and read at least as much again as is buffered."""
+        remaining = self.buffer[self.pos :]
+        chunk = self.text_stream.read(max(JSON_READ_SIZE, len(remaining)))
+        if not chunk:
+            self.eof = True
+        self.buffer = remaining + chunk
+        self.pos = 0
+
+    def error(self, message: str):
+        """Raise a JSONDecodeError at the current position."""
+        raise json.JSONDecodeError(message, self.buffer, self.pos)
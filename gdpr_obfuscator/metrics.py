@@ -0,0 +1,177 @@
+"""Per-invocation metrics and their CloudWatch Embedded Metric Format output."""
+
+from contextlib import contextmanager, nullcontext
+from io import RawIOBase
+import json
+import os
+import sys
+import time
+
+from typing import Iterable, Optional, TextIO
+
+from .compression import split_compression_suffix
+
+
+METRIC_STAGES = ("preflight", "fetch", "obfuscate", "upload")
+EMF_NAMESPACE = "GdprObfuscator"
+
+
+class InvocationMetrics:
+    """Stage times and counts of one gdpr_obfuscator invocation.
+
+    Time spent reading the source file is recorded as 'fetch' and time spent in
+    writes to the destination as 'upload'. Parsing, masking and encoding are
+    interleaved block by block, so they are reported together as 'obfuscate', the
+    time left over from the other stages.
+    """
+
+    def __init__(self, file: str):
+        """Start timing an invocation.
+
+
+        Args:
+            file (str): The S3 URI of the file being obfuscated.
+        """
+        self.file = file
+        self.start = time.perf_counter()
+        self.stages = dict.fromkeys(METRIC_STAGES, 0.0)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rows = 0
+        self.succeeded = False
+
+    @contextmanager
+    def stage(self, name: str):
+        """Add the time spent in a `with` block to the named stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def count_rows(self, rows: Iterable) -> Iterable:
+        """Yield the given rows, counting them as they pass."""
+        for row in rows:
+            self.rows += 1
+            yield row
+
+    def report(self) -> dict:
+        """Summarise the invocation so far.
+
+
+        Returns:
+            dict: A report with the keys:
+                - 'file' (str): The S3 URI of the file.
+                - 'format' (str): The file extension without any compression
+                  suffix, e.g. 'csv'.
+                - 'succeeded' (bool): Whether the invocation returned normally.
+                - 'duration' (float): Seconds since the invocation started.
+                - 'stages' (dict): Seconds spent in each of METRIC_STAGES.
+                - 'bytes_in' (int): Bytes read from the source file.
+                - 'bytes_out' (int): Bytes of obfuscated output.
+                - 'rows' (int): Rows or records obfuscated.
+                - 'rows_per_second' (float): Rows divided by duration.
+        """
+        duration = time.perf_counter() - self.start
+        stages = dict(self.stages)
+        stages["obfuscate"] = max(duration - sum(stages.values()), 0.0)
+        return {
+            "file": self.file,
+            "format": os.path.splitext(split_compression_suffix(self.file)[0])[1][1:],
+            "succeeded": self.succeeded,
+            "duration": duration,
+            "stages": stages,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "rows": self.rows,
+            "rows_per_second": self.rows / duration if duration else 0.0,
+        }
+
+
+class MeteredReader(RawIOBase):
+    """A readable stream that records the time and bytes of reads from another."""
+
+    def __init__(self, body, metrics: InvocationMetrics):
+        self.body = body
+        self.metrics = metrics
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        with self.metrics.stage("fetch"):
+            data = self.body.read(size if size >= 0 else None)
+        self.metrics.bytes_in += len(data)
+        return data
+
+
+class MeteredWriter(RawIOBase):
+    """A writable stream that records the time and bytes of writes to another."""
+
+    def __init__(self, output_buffer, metrics: InvocationMetrics):
+        self.output_buffer = output_buffer
+        self.metrics = metrics
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        with self.metrics.stage("upload"):
+            self.output_buffer.write(data)
+        self.metrics.bytes_out += len(data)
+        return len(data)
+
+
+def metrics_stage(metrics: Optional[InvocationMetrics], name: str):
+    """Time a `with` block as the named stage, or do nothing without metrics."""
+    if metrics is None:
+        return nullcontext()
+    return metrics.stage(name)
+
+
+def emit_emf_metrics(
+    report: dict, namespace: str = EMF_NAMESPACE, stream: Optional[TextIO] = None
+) -> None:
+    """Write a metrics report as a CloudWatch Embedded Metric Format log line.
+
+    In AWS Lambda, lines written to stdout reach CloudWatch Logs, which turns them
+    into metrics with the file format as their dimension. Pass this function as
+    the `metrics_sink` of gdpr_obfuscator; use functools.partial to change the
+    namespace.
+
+
+    Args:
+        report (dict): A report from InvocationMetrics.report.
+        namespace (str): The CloudWatch namespace of the metrics.
+        stream (Optional[TextIO]): Where to write the line. Defaults to stdout.
+    """
+    values = [
+        (f"{stage.capitalize()}Time", "Milliseconds", seconds * 1000)
+        for stage, seconds in report["stages"].items()
+    ]
+    values += [
+        ("Duration", "Milliseconds", report["duration"] * 1000),
+        ("BytesIn", "Bytes", report["bytes_in"]),
+        ("BytesOut", "Bytes", report["bytes_out"]),
+        ("Rows", "Count", report["rows"]),
+        ("RowsPerSecond", "Count/Second", report["rows_per_second"]),
+    ]
+    line = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": namespace,
+                    "Dimensions": [["Format"]],
+                    "Metrics": [
+                        {"Name": name, "Unit": unit} for name, unit, _ in values
+                    ],
+                }
+            ],
+        },
+        "Format": report["format"],
+        "File": report["file"],
+        "Succeeded": report["succeeded"],
+    }
+    line.update((name, value) for name, _, value in values)
+    (stream or sys.stdout).write(json.dumps(line) + "\n")
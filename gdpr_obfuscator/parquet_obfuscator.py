@@ -0,0 +1,317 @@
+"""Obfuscation of Parquet files with pyarrow, one PII column at a time."""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+import os
+
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .storage import MappedReader
+from .metrics import InvocationMetrics
+from .buffers import ChunkCollector, write_chunks
+from .strategies import Pseudonymiser, constant_value, drop_value, redact_value
+from .csv_obfuscator import compile_csv_plan
+
+
+def obfuscate_parquet(
+    body: BinaryIO,
+    pii_fields: List[str],
+    output_buffer: Optional[BinaryIO] = None,
+    max_workers: Optional[int] = None,
+    metrics: Optional["InvocationMetrics"] = None,
+    pseudonymiser: Optional["Pseudonymiser"] = None,
+    strategies: Optional[dict] = None,
+) -> BinaryIO:
+    """Obfuscate specified columns in a Parquet file-like object.
+
+    Only the PII columns are rewritten. Each row group is read into Arrow arrays,
+    its PII columns are replaced with masked arrays and it is written out as one
+    row group, so the output has the same row groups, column order, column
+    compression and schema metadata as the input. Non-PII columns are carried
+    through as Arrow arrays and never converted to Python objects.
+
+    Row groups are read and masked on a pool of `max_workers` threads, since
+    Arrow releases the GIL while decoding, and written out in order. A PII column
+    is masked with a vectorised Arrow kernel when its strategy replaces every
+    value with the same constant. Other strategies are applied once to each
+    distinct value of the column, after casting it to text. Nulls stay null.
+
+    Parquet keeps its footer at the end of the file, so a body that is not
+    seekable is read into memory first.
+
+    Args:
+        body: A file-like object (e.g., BytesIO) containing the Parquet data.
+        pii_fields (List[str]): A list of column names to be obfuscated.
+        output_buffer: An optional writable file-like object to write the output to,
+            e.g. an S3MultipartWriter. Defaults to a new SpoolingBuffer.
+        max_workers (Optional[int]): The number of row groups to mask at once.
+            Defaults to the number of CPUs.
+        metrics (Optional[InvocationMetrics]): Where to count the rows written, if
+            anywhere.
+        pseudonymiser (Optional[Pseudonymiser]): Replace each PII value with its
+            token instead of '***'.
+        strategies (Optional[dict]): A masking strategy for some of the
+            pii_fields; see compile_strategies. Masked columns become string
+            columns, except with the 'null' strategy, which keeps their type.
+            Dropped columns are removed from the schema.
+
+    Returns:
+        BinaryIO: The output buffer containing the obfuscated Parquet data.
+
+    Raises:
+        ValueError: If any specified pii_fields are not found in the Parquet
+            schema, a strategy is invalid or pyarrow is not installed.
+    """
+    chunks = iter_obfuscate_parquet(
+        body, pii_fields, max_workers, metrics, pseudonymiser, strategies
+    )
+    return write_chunks(chunks, output_buffer)
+
+
+def iter_obfuscate_parquet(
+    body: BinaryIO,
+    pii_fields: List[str],
+    max_workers: Optional[int] = None,
+    metrics: Optional["InvocationMetrics"] = None,
+    pseudonymiser: Optional["Pseudonymiser"] = None,
+    strategies: Optional[dict] = None,
+) -> Iterator[bytes]:
+    """Obfuscate a Parquet file-like object, yielding the output as it is produced.
+
+    The output written for each row group is yielded as soon as it is encoded, and
+    the footer last. See obfuscate_parquet.
+
+
+    Args:
+        body: A file-like object (e.g., BytesIO) containing the Parquet data.
+        pii_fields (List[str]): A list of column names to be obfuscated.
+        max_workers (Optional[int]): The number of row groups to mask at once.
+        metrics (Optional[InvocationMetrics]): Where to count the rows, if anywhere.
+        pseudonymiser (Optional[Pseudonymiser]): Tokenise values by default.
+        strategies (Optional[dict]): A masking strategy for some of the
+            pii_fields; see compile_strategies.
+
+
+    Yields:
+        bytes: Consecutive chunks of the obfuscated Parquet data.
+
+
+    Raises:
+        ValueError: If any specified pii_fields are not found in the Parquet
+            schema, a strategy is invalid or pyarrow is not installed.
+    """
+    pa, pq = import_pyarrow()
+
+    source = read_parquet_source(body)
+    parquet_file = pq.ParquetFile(pa.BufferReader(source))
+    parquet_metadata = parquet_file.metadata
+    schema = parquet_file.schema_arrow
+    col_nums, masks = compile_csv_plan(
+        schema.names, pii_fields, strategies, pseudonymiser
+    )
+    if masks is None:
+        masks = (redact_value,) * len(col_nums)
+    plan = {schema.names[num]: mask for num, mask in zip(col_nums, masks)}
+    output_schema = parquet_output_schema(schema, plan)
+
+    def mask_row_group(index):
+        # Each thread opens its own reader over the shared buffer.
+        parquet_file = pq.ParquetFile(
+            pa.BufferReader(source), metadata=parquet_metadata
+        )
+        table = parquet_file.read_row_group(index, columns=output_schema.names)
+        return mask_parquet_table(table, plan, output_schema)
+
+    collector = ChunkCollector()
+    writer = pq.ParquetWriter(
+        collector,
+        output_schema,
+        compression=parquet_compression(parquet_metadata, output_schema.names),
+    )
+
+    def write_row_group(future):
+        table = future.result()
+        writer.write_table(table, row_group_size=max(table.num_rows, 1))
+        if metrics is not None:
+            metrics.rows += table.num_rows
+        return collector.drain()
+
+    workers = max_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(workers) as pool:
+        in_flight = deque()
+        for index in range(parquet_metadata.num_row_groups):
+            if len(in_flight) >= 2 * workers:
+                yield write_row_group(in_flight.popleft())
+            in_flight.append(pool.submit(mask_row_group, index))
+        while in_flight:
+            yield write_row_group(in_flight.popleft())
+    writer.close()
+    yield collector.drain()
+
+
+def import_pyarrow():
+    """Import the optional pyarrow package, which Parquet files need."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("parquet files require the pyarrow package") from None
+    return pyarrow, pyarrow.parquet
+
+
+def read_parquet_source(body) -> Union[bytes, memoryview]:
+    """Get the contents of a Parquet body as a buffer Arrow can read in place.
+
+
+    Args:
+        body: A binary file-like object. The contents of a BytesIO or a
+            MappedReader are used without copying them.
+
+
+    Returns:
+        Union[bytes, memoryview]: The whole body.
+    """
+    if isinstance(body, (BytesIO, MappedReader)):
+        return body.getbuffer()
+    return body.read()
+
+
+def parquet_output_schema(schema, plan: dict):
+    """Get the schema of a Parquet file once its PII columns are masked.
+
+
+    Args:
+        schema (pyarrow.Schema): The schema of the input file.
+        plan (dict): Maps each PII column name to its mask.
+
+
+    Returns:
+        pyarrow.Schema: The input schema without dropped columns, with the other
+            masked columns as nullable strings, or of their own type if every
+            value becomes null.
+    """
+    import pyarrow
+
+    fields = []
+    for field in schema:
+        mask = plan.get(field.name)
+        if mask is drop_value:
+            continue
+        if mask is not None:
+            if mask_constant(mask) != (True, None):
+                field = field.with_type(pyarrow.string())
+            field = field.with_nullable(True)
+        fields.append(field)
+    return pyarrow.schema(fields, metadata=schema.metadata)
+
+
+def parquet_compression(parquet_metadata, names: List[str]) -> Union[str, dict]:
+    """Get the compression codec of each column of a Parquet file for its writer.
+
+
+    Args:
+        parquet_metadata (pyarrow.parquet.FileMetaData): The input file's metadata.
+        names (List[str]): The columns to be written.
+
+
+    Returns:
+        Union[str, dict]: The codec of each column in its first row group, or
+            'snappy', pyarrow's default, if the file has no row groups.
+    """
+    if parquet_metadata.num_row_groups == 0:
+        return "snappy"
+    row_group = parquet_metadata.row_group(0)
+    codecs = {}
+    for index in range(row_group.num_columns):
+        column = row_group.column(index)
+        name = column.path_in_schema.split(".")[0]
+        if name in names:
+            codec = column.compression
+            codecs[name] = {"UNCOMPRESSED": "NONE", "LZ4_RAW": "LZ4"}.get(codec, codec)
+    return codecs
+
+
+def mask_parquet_table(table, plan: dict, schema):
+    """Replace the PII columns of an Arrow table with their masked columns.
+
+
+    Args:
+        table (pyarrow.Table): A row group of the input file, without dropped
+            columns.
+        plan (dict): Maps each PII column name to its mask.
+        schema (pyarrow.Schema): The output schema from parquet_output_schema.
+
+
+    Returns:
+        pyarrow.Table: The masked table. Non-PII columns are the same arrays.
+    """
+    import pyarrow
+
+    columns = []
+    for field in schema:
+        column = table.column(field.name)
+        if field.name in plan:
+            column = mask_parquet_column(column, plan[field.name], field.type)
+        columns.append(column)
+    return pyarrow.Table.from_arrays(columns, schema=schema)
+
+
+def mask_parquet_column(column, mask: Callable, output_type):
+    """Mask the values of an Arrow column, leaving its nulls null.
+
+
+    Args:
+        column (pyarrow.ChunkedArray): The values of a PII column.
+        mask (Callable): The column's mask from compile_strategies.
+        output_type (pyarrow.DataType): The type of the masked column.
+
+
+    Returns:
+        pyarrow.Array: The masked values.
+    """
+    import pyarrow
+    import pyarrow.compute
+
+    is_constant, constant = mask_constant(mask)
+    if is_constant:
+        if constant is None:
+            return pyarrow.nulls(len(column), output_type)
+        return pyarrow.compute.if_else(
+            pyarrow.compute.is_valid(column),
+            pyarrow.scalar(constant, output_type),
+            pyarrow.scalar(None, output_type),
+        )
+    text = pyarrow.compute.cast(column.combine_chunks(), output_type)
+    encoded = pyarrow.compute.dictionary_encode(text)
+    dictionary = pyarrow.array(
+        [mask(value) for value in encoded.dictionary.to_pylist()], output_type
+    )
+    return dictionary.take(encoded.indices)
+
+
+def mask_constant(mask: Callable) -> Tuple[bool, Optional[str]]:
+    """Check whether a mask replaces every value with the same constant.
+
+
+    Args:
+        mask (Callable): A mask from compile_strategies.
+
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the mask is constant, and the constant.
+    """
+    if mask is redact_value:
+        return True, "***"
+    if isinstance(mask, partial) and mask.func is constant_value:
+        return True, mask.keywords["constant"]
+    return False, None
@@ -0,0 +1,150 @@
+"""Threads that read ahead of and write behind the obfuscators."""
+
+from io import RawIOBase
+import queue
+import threading
+
+from typing import Optional
+
+
+PIPELINE_CHUNK_SIZE = 1024 * 1024
+
+
+class PrefetchReader(RawIOBase):
+    """A readable stream that reads another stream ahead on a background thread.
+
+    The thread reads chunks of `chunk_size` bytes into a queue of `depth` chunks,
+    so the download carries on while the caller transforms what it has already
+    read, and stops when the queue is full. Errors raised by the other stream are
+    raised from the read that reaches them. Closing the reader stops the thread.
+    Reads are sliced from the current chunk at an offset, so a run of small reads
+    does not copy the rest of the chunk each time.
+    """
+
+    def __init__(self, body, depth: int, chunk_size: int = PIPELINE_CHUNK_SIZE):
+        self.chunks = queue.Queue(depth)
+        self.current = b""
+        self.position = 0
+        self.at_end = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._prefetch, args=(body, chunk_size), daemon=True
+        )
+        self.thread.start()
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            return self.readall()
+        if self.position >= len(self.current) and not self._next_chunk():
+            return b""
+        start = self.position
+        self.position = min(start + size, len(self.current))
+        return self.current[start : self.position]
+
+    def readall(self) -> bytes:
+        chunks = [self.current[self.position :]]
+        while self._next_chunk():
+            chunks.append(self.current)
+        self.current = b""
+        self.position = 0
+        return b"".join(chunks)
+
+    def close(self) -> None:
+        self.stopped.set()
+        super().close()
+
+    def _next_chunk(self) -> bool:
+        if self.at_end:
+            return False
+        item = self.chunks.get()
+        if isinstance(item, BaseException):
+            self.at_end = True
+            raise item
+        self.at_end = not item
+        self.current = item
+        self.position = 0
+        return not self.at_end
+
+    def _prefetch(self, body, chunk_size: int) -> None:
+        try:
+            while not self.stopped.is_set():
+                chunk = body.read(chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except BaseException as err:
+            self._put(err)
+
+    def _put(self, item) -> None:
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+class WriteBehindWriter(RawIOBase):
+    """A writable stream that writes to another stream on a background thread.
+
+    Writes are gathered into chunks of `chunk_size` bytes and queued for the
+    thread, so uploading carries on while the caller produces more output. At most
+    `depth` chunks are queued; a write waits when the queue is full. An error from
+    the other stream is raised by the next write or by finish.
+    """
+
+    def __init__(
+        self, output_buffer, depth: int, chunk_size: int = PIPELINE_CHUNK_SIZE
+    ):
+        self.output_buffer = output_buffer
+        self.chunk_size = chunk_size
+        self.pending = queue.Queue(depth)
+        self.buffer = bytearray()
+        self.error = None
+        self.thread = threading.Thread(target=self._write_behind, daemon=True)
+        self.thread.start()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        if self.error is not None:
+            raise self.error
+        self.buffer += data
+        if len(self.buffer) >= self.chunk_size:
+            self.pending.put(bytes(self.buffer))
+            self.buffer.clear()
+        return len(data)
+
+    def finish(self) -> None:
+        """Write everything to the other stream and wait for the thread to end.
+
+
+        Raises:
+            Exception: The first error raised by the other stream, if any.
+        """
+        if self.buffer and self.error is None:
+            self.pending.put(bytes(self.buffer))
+            self.buffer.clear()
+        self.close()
+        if self.error is not None:
+            raise self.error
+
+    def close(self) -> None:
+        """Stop the thread once the queued chunks are written, dropping the rest."""
+        if not self.closed:
+            self.pending.put(None)
+            self.thread.join()
+        super().close()
+
+    def _write_behind(self) -> None:
+        # After an error, keep taking chunks so that writers never block.
+        while (data := self.pending.get()) is not None:
+            if self.error is None:
+                try:
+                    self.output_buffer.write(data)
+                except Exception as err:
+                    self.error = err
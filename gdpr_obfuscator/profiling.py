@@ -0,0 +1,96 @@
+"""Optional cProfile capture of a run and a pstats summary of it."""
+
+from io import StringIO
+import os
+import re
+
+from typing import Callable, Optional, Tuple
+
+
+PROFILE_ENV_VAR = "GDPR_OBFUSCATOR_PROFILE"
+PROFILE_SUFFIX = ".prof"
+
+
+def is_profiling_enabled(event: dict) -> bool:
+    """Check whether a run should be profiled, by its event or the environment.
+
+
+    Args:
+        event (dict): A validated gdpr_obfuscator event.
+
+
+    Returns:
+        bool: True if the event has 'profile' set, or PROFILE_ENV_VAR is '1',
+            'true' or 'yes'.
+    """
+    if "profile" in event:
+        return event["profile"]
+    return os.environ.get(PROFILE_ENV_VAR, "").lower() in ("1", "true", "yes")
+
+
+def run_profiled(func: Callable, *args, **kwargs) -> Tuple[object, bytes]:
+    """Call a function under cProfile.
+
+    Only the calling thread is profiled, so the work of sharded runs' worker
+    processes is not included.
+
+
+    Args:
+        func (Callable): The function to call with the remaining arguments.
+
+
+    Returns:
+        Tuple[object, bytes]: The function's return value and the profile, in the
+            format written by pstats.Stats.dump_stats.
+    """
+    import cProfile
+    import marshal
+    import pstats
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    return result, marshal.dumps(pstats.Stats(profiler).stats)
+
+
+def summarise_profile(
+    profile: bytes,
+    sort: str = "cumulative",
+    limit: int = 20,
+    pattern: Optional[str] = None,
+) -> str:
+    """Format the slowest functions of a profile as a pstats table.
+
+    A profile file downloaded from S3 can also be opened directly with
+    `python -m pstats <file>`.
+
+
+    Args:
+        profile (bytes): A profile from run_profiled.
+        sort (str): A pstats sort key, e.g. 'cumulative', 'tottime' or 'calls'.
+        limit (int): The number of functions to list.
+        pattern (Optional[str]): A regular expression to list only the functions
+            whose 'path:line(name)' matches, e.g. 'gdpr_obfuscator' to leave out
+            boto3 and the standard library.
+
+
+    Returns:
+        str: The pstats table, with file paths shortened to their base names.
+    """
+    import marshal
+    import pstats
+
+    output = StringIO()
+    stats = pstats.Stats(stream=output)
+    stats.stats = marshal.loads(profile)
+    stats.get_top_level_stats()
+    if pattern is not None:
+        # Match the full paths before they are shortened, so that the name of the
+        # package selects the functions of all its modules.
+        search = re.compile(pattern).search
+        stats.stats = {
+            func: stat
+            for func, stat in stats.stats.items()
+            if search(pstats.func_std_string(func))
+        }
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
@@ -0,0 +1,368 @@
+"""Resumable jobs that checkpoint their progress to an S3 manifest."""
+
+from functools import partial
+from itertools import chain
+import json
+import re
+import time
+
+from typing import Optional
+
+from .storage import (
+    DEFAULT_PART_SIZE,
+    S3MultipartWriter,
+    S3Storage,
+    Storage,
+    open_location,
+)
+from .metrics import InvocationMetrics, MeteredReader, metrics_stage
+from .compression import (
+    COMPRESSION_MAGIC_SIZE,
+    detect_compression,
+    split_compression_suffix,
+)
+from .csv_obfuscator import (
+    compile_csv_plan,
+    count_lines,
+    csv_string_to_list,
+    edit_header,
+    find_record_end,
+    get_block_editor,
+    iter_record_blocks,
+    normalise_newlines,
+)
+from .sharding import obfuscate_jsonl_shard
+from .events import obfuscation_options
+
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+# The ETag of an object uploaded in parts ends with the number of parts.
+MULTIPART_ETAG = re.compile(r'"?[0-9a-f]{32}-([0-9]+)"?')
+RESUMABLE_UNSUPPORTED_KEYS = (
+    "shard_workers",
+    "pipeline_depth",
+    "profile",
+    "output_compression",
+)
+
+
+def obfuscate_resumable(
+    event: dict,
+    s3=None,
+    metrics: Optional["InvocationMetrics"] = None,
+    part_size: int = DEFAULT_PART_SIZE,
+) -> dict:
+    """Obfuscate the file of a validated event with 'job_id', checkpointing in S3.
+
+    The output is uploaded to the S3 destination as a multipart upload. Each time
+    a part is uploaded, a manifest is saved next to the destination with the
+    input offset the part ends at, the upload ID, the part numbers and ETags so
+    far and, for CSV files, the header and the column numbers from get_col_nums.
+    Parts always end where a block of whole records ends, so the manifest
+    describes the output exactly.
+
+    A later call with the same job ID reads the manifest and carries on from the
+    saved offset with a ranged GET, so the output is byte-identical to a run that
+    was never interrupted. The manifest pins the source's size and ETag, and the
+    GET is sent with 'IfMatch', so a source that is overwritten is never resumed
+    into mixed output. With 'time_limit' in the event, the call returns at the
+    first checkpoint after that many seconds; otherwise it runs to the end, and
+    the manifest only matters if it is killed. Once the upload is complete the
+    manifest records the result, which is returned by any later call; a call that
+    died between completing the upload and recording it is recognised by
+    find_completed_upload.
+
+    A failed call leaves its multipart upload in place to be resumed; a bucket
+    lifecycle rule for incomplete multipart uploads cleans up abandoned jobs.
+
+
+    Args:
+        event (dict): A validated gdpr_obfuscator event with a 'job_id' and an S3
+            'destination', for an uncompressed CSV or JSONL file.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+        metrics (Optional[InvocationMetrics]): Where to count the bytes read and
+            rows in this call, if anywhere.
+        part_size (int): The smallest size in bytes of each uploaded part.
+
+
+    Returns:
+        dict: The 'JobId' and whether the job is 'Complete'. A complete job also
+            has the 'Bucket', 'Key' and 'ETag' of the output; an incomplete one
+            has the input 'Offset' reached, the input 'Size' and the
+            'CheckpointKey' of the manifest.
+
+
+    Raises:
+        ValueError: If the event has no S3 destination, uses an option that
+            cannot be checkpointed, the file is not an uncompressed CSV or JSONL
+            file, the manifest does not match the event or the source, or the
+            job's upload no longer exists.
+    """
+    job_id = event["job_id"]
+    unsupported = sorted(set(event) & set(RESUMABLE_UNSUPPORTED_KEYS))
+    if unsupported:
+        raise ValueError(f"job_id cannot be used with {unsupported}")
+    if "destination" not in event:
+        raise ValueError("job_id needs a destination")
+    storage, key = open_location(event["file_to_obfuscate"], s3)
+    dest_storage, dest_key = open_location(event["destination"], s3)
+    if not isinstance(dest_storage, S3Storage):
+        raise ValueError("job_id needs an S3 destination")
+    if not key.endswith((".csv", ".jsonl")):
+        raise ValueError("job_id supports csv and jsonl files")
+    source_etag = None
+    if isinstance(storage, S3Storage):
+        head = storage.s3.head_object(Bucket=storage.bucket, Key=key)
+        size, source_etag = head["ContentLength"], head["ETag"]
+    else:
+        size = storage.size(key)
+    if (
+        split_compression_suffix(key)[1] is not None
+        or split_compression_suffix(dest_key)[1] is not None
+        or detect_compression(storage.read_range(key, 0, COMPRESSION_MAGIC_SIZE))
+    ):
+        raise ValueError("job_id does not support compressed files")
+
+    checkpoint_key = dest_key + f".{job_id}" + CHECKPOINT_SUFFIX
+    checkpoint = load_checkpoint(dest_storage, checkpoint_key)
+    expected = {
+        "job_id": job_id,
+        "source": event["file_to_obfuscate"],
+        "source_size": size,
+        "source_etag": source_etag,
+        "destination": event["destination"],
+        "pii_fields": event["pii_fields"],
+        "strategies": event.get("strategies"),
+        "pseudonymise": event.get("pseudonymise", False),
+        "json_codec": event.get("json_codec"),
+    }
+    if checkpoint is not None:
+        if {name: checkpoint.get(name) for name in expected} != expected:
+            raise ValueError(
+                f"checkpoint {checkpoint_key} does not match the event; use a "
+                "new job_id"
+            )
+        if checkpoint.get("result") is not None:
+            return checkpoint["result"]
+        result = find_completed_upload(dest_storage, dest_key, checkpoint, job_id)
+        if result is not None:
+            save_checkpoint(
+                dest_storage, checkpoint_key, dict(checkpoint, result=result)
+            )
+            return result
+
+    options = obfuscation_options(event, key)
+    output = bytearray()
+    offset = 0
+    header = None
+    blocks = iter(())
+    if checkpoint is not None:
+        offset = checkpoint["offset"]
+        header = checkpoint["header"]
+    if offset < size:
+        body = open_source_version(storage, key, offset, source_etag)
+        if metrics is not None:
+            body = MeteredReader(body, metrics)
+        blocks = iter_record_blocks(body, quoted=key.endswith(".csv"))
+    if key.endswith(".csv"):
+        if header is None:
+            first_block = next(blocks, b"")
+            header_end = find_record_end(first_block)
+            header = normalise_newlines(first_block[:header_end]).decode("utf-8")
+            offset += header_end
+            if header_end < len(first_block):
+                blocks = chain([first_block[header_end:]], blocks)
+        col_nums, masks = compile_csv_plan(
+            csv_string_to_list(header),
+            event["pii_fields"],
+            options.get("strategies"),
+            options.get("pseudonymiser"),
+        )
+        if checkpoint is None:
+            output += edit_header(header, col_nums, masks).encode("utf-8")
+        elif checkpoint["col_nums"] != col_nums:
+            raise ValueError(
+                f"checkpoint {checkpoint_key} has a different column plan; use a "
+                "new job_id"
+            )
+
+        edit = get_block_editor(options.get("engine", "bytes"))
+
+        def transform(block):
+            return edit(normalise_newlines(block), col_nums, masks)
+
+    else:
+        col_nums = None
+        transform = partial(
+            obfuscate_jsonl_shard, pii_fields=event["pii_fields"], **options
+        )
+
+    writer = S3MultipartWriter(
+        dest_storage.s3,
+        dest_storage.bucket,
+        dest_key,
+        part_size,
+        upload_id=checkpoint and checkpoint["upload_id"],
+        parts=checkpoint and checkpoint["parts"],
+    )
+    deadline = None
+    if "time_limit" in event:
+        deadline = time.monotonic() + event["time_limit"]
+    manifest = dict(expected, header=header, col_nums=col_nums)
+
+    for block in blocks:
+        output += transform(block)
+        offset += len(block)
+        if metrics is not None:
+            metrics.rows += count_lines(block)
+        if len(output) < part_size:
+            continue
+        if metrics is not None:
+            metrics.bytes_out += len(output)
+        with metrics_stage(metrics, "upload"):
+            writer.upload_part(bytes(output))
+            output.clear()
+            manifest.update(offset=offset, upload_id=writer.upload_id)
+            manifest["parts"] = writer.parts
+            save_checkpoint(dest_storage, checkpoint_key, manifest)
+        if deadline is not None and time.monotonic() >= deadline and offset < size:
+            return {
+                "JobId": job_id,
+                "Complete": False,
+                "Offset": offset,
+                "Size": size,
+                "CheckpointKey": checkpoint_key,
+            }
+
+    if metrics is not None:
+        metrics.bytes_out += len(output)
+    with metrics_stage(metrics, "upload"):
+        writer.write(output)
+        result = dict(writer.close(), JobId=job_id, Complete=True)
+        manifest.update(offset=offset, result=result)
+        save_checkpoint(dest_storage, checkpoint_key, manifest)
+    return result
+
+
+def open_source_version(storage: "Storage", key: str, start: int, etag: Optional[str]):
+    """Open the source of a resumable job, failing if it is no longer `etag`.
+
+    An S3 source is read with 'IfMatch', so output is never made from two
+    versions of a file that was overwritten with one of the same size.
+
+
+    Args:
+        storage (Storage): The storage backend holding the source.
+        key (str): The key of the source.
+        start (int): The offset to read from.
+        etag (Optional[str]): The ETag of the S3 object when the job started, or
+            None for other backends.
+
+
+    Returns:
+        A readable binary file-like object of the source from `start`.
+
+
+    Raises:
+        ValueError: If the S3 object no longer has the given ETag.
+    """
+    if etag is None:
+        return storage.open(key, start)
+    from botocore.exceptions import ClientError
+
+    try:
+        return storage.open(key, start, if_match=etag)
+    except ClientError as err:
+        if err.response["Error"]["Code"] != "PreconditionFailed":
+            raise
+        raise ValueError(
+            f"{storage.uri(key)} changed while the job was running; use a new job_id"
+        ) from None
+
+
+def find_completed_upload(
+    storage: "S3Storage", key: str, checkpoint: dict, job_id: str
+) -> Optional[dict]:
+    """Check whether a resumable job's multipart upload was already completed.
+
+    A call can die after completing the upload but before saving the result in
+    the manifest. The upload ID then no longer exists, so the output is looked
+    for at the destination instead: a multipart object whose ETag counts at least
+    as many parts as the manifest is the completed upload.
+
+
+    Args:
+        storage (S3Storage): The destination bucket.
+        key (str): The destination key.
+        checkpoint (dict): The manifest of the job, without a result.
+        job_id (str): The ID of the job.
+
+
+    Returns:
+        Optional[dict]: None if the upload is still in progress, or the result of
+            the complete job, as obfuscate_resumable returns it.
+
+
+    Raises:
+        ValueError: If the upload no longer exists and the destination does not
+            hold its output.
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        storage.s3.list_parts(
+            Bucket=storage.bucket,
+            Key=key,
+            UploadId=checkpoint["upload_id"],
+            MaxParts=1,
+        )
+        return None
+    except ClientError as err:
+        if err.response["Error"]["Code"] != "NoSuchUpload":
+            raise
+    try:
+        etag = storage.s3.head_object(Bucket=storage.bucket, Key=key)["ETag"]
+    except ClientError as err:
+        if err.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+            raise
+        etag = ""
+    match = MULTIPART_ETAG.fullmatch(etag)
+    if match is None or int(match.group(1)) < len(checkpoint["parts"]):
+        raise ValueError(
+            f"the multipart upload of job {job_id} no longer exists; use a new job_id"
+        )
+    return {
+        "Bucket": storage.bucket,
+        "Key": key,
+        "ETag": etag,
+        "JobId": job_id,
+        "Complete": True,
+    }
+
+
+def load_checkpoint(storage: "S3Storage", key: str) -> Optional[dict]:
+    """Read the manifest of a resumable job, or None if it has not started.
+
+
+    Args:
+        storage (S3Storage): The destination bucket.
+        key (str): The key of the manifest.
+
+
+    Returns:
+        Optional[dict]: The manifest saved by save_checkpoint.
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        body = storage.open(key)
+    except ClientError as err:
+        if err.response["Error"]["Code"] != "NoSuchKey":
+            raise
+        return None
+    return json.loads(body.read())
+
+
+def save_checkpoint(storage: "S3Storage", key: str, manifest: dict) -> None:
+    """Save the manifest of a resumable job as a JSON object."""
+    storage.put(key, json.dumps(manifest, sort_keys=True).encode("utf-8"))
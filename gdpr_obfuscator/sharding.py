@@ -0,0 +1,444 @@
+"""Obfuscation of large CSV and JSON Lines files as byte-range shards."""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import TextIOWrapper, BytesIO
+import multiprocessing
+import os
+import queue
+
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .storage import Storage, as_storage
+from .metrics import InvocationMetrics
+from .buffers import write_chunks
+from .compression import split_compression_suffix
+from .strategies import Pseudonymiser
+from .csv_obfuscator import (
+    compile_csv_plan,
+    count_lines,
+    csv_string_to_list,
+    edit_header,
+    get_block_editor,
+    has_balanced_quotes,
+    normalise_newlines,
+)
+from .json_obfuscator import obfuscate_jsonl
+
+
+DEFAULT_SHARD_SIZE = 32 * 1024 * 1024
+SHARD_PROBE_SIZE = 64 * 1024
+
+
+def obfuscate_sharded(
+    bucket: str,
+    key: str,
+    pii_fields: List[str],
+    output_buffer: Optional[BinaryIO] = None,
+    max_workers: Optional[int] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    s3=None,
+    validate_first_record_only: bool = False,
+    metrics: Optional["InvocationMetrics"] = None,
+    pseudonymiser: Optional["Pseudonymiser"] = None,
+    strategies: Optional[dict] = None,
+    codec: Optional[str] = None,
+    engine: str = "bytes",
+) -> BinaryIO:
+    """Obfuscate a CSV or JSONL file in S3 or another store as byte-range shards.
+
+    The object size is read with `head_object` and split into ranges of about
+    `shard_size` bytes, each moved forward to start just after a newline. The CSV
+    header is fetched once and its column plan, with the compiled masks, passed to
+    every shard. Shards are
+    fetched with ranged `get_object` calls on a thread pool, transformed on a pool of
+    `max_workers` processes and written out in order, so the output is byte-identical
+    to obfuscate_csv or obfuscate_jsonl on the whole object. The workers read the
+    shards of a local file themselves, through a memory map shared with the page
+    cache, instead of being sent each shard's bytes; see transform_range.
+
+    The worker processes only talk to this one over pipes, so they also run on AWS
+    Lambda, which has no /dev/shm for the semaphores of process pools; see
+    PipeWorkerPool.
+
+    Args:
+        bucket (Union[str, Storage]): The bucket containing the file, or the
+            storage backend holding it.
+        key (str): The key of a '.csv' or '.jsonl' file.
+        pii_fields (List[str]): A list of field names to be obfuscated.
+        output_buffer: An optional writable file-like object to write the output to.
+            Defaults to a new SpoolingBuffer.
+        max_workers (Optional[int]): The number of worker processes. Defaults to the
+            number of CPUs.
+        shard_size (int): The approximate size in bytes of each shard.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+        validate_first_record_only (bool): For JSONL files, only check the first
+            record of each shard for the pii_fields.
+        metrics (Optional[InvocationMetrics]): Where to count the bytes read and
+            rows written, if anywhere. Shards are fetched while others are being
+            transformed, so fetch time is not reported separately.
+        pseudonymiser (Optional[Pseudonymiser]): Replace each PII value with its
+            token instead of '***'. Each worker process has its own cache.
+        strategies (Optional[dict]): A masking strategy for some of the
+            pii_fields; see compile_strategies.
+        codec (Optional[str]): The JSON library for JSONL files, 'orjson' or
+            'json'.
+        engine (str): The engine for CSV files; see get_block_editor.
+
+    Returns:
+        BinaryIO: The output buffer containing the obfuscated data.
+
+    Raises:
+        ValueError: If the file is not a CSV or JSONL file or is compressed, any
+            pii_fields are not found in the CSV header or a JSONL object, or a
+            strategy is invalid.
+    """
+    chunks = iter_obfuscate_sharded(
+        bucket,
+        key,
+        pii_fields,
+        max_workers,
+        shard_size,
+        s3,
+        validate_first_record_only,
+        metrics,
+        pseudonymiser,
+        strategies,
+        codec,
+        engine,
+    )
+    return write_chunks(chunks, output_buffer)
+
+
+def iter_obfuscate_sharded(
+    bucket: str,
+    key: str,
+    pii_fields: List[str],
+    max_workers: Optional[int] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    s3=None,
+    validate_first_record_only: bool = False,
+    metrics: Optional["InvocationMetrics"] = None,
+    pseudonymiser: Optional["Pseudonymiser"] = None,
+    strategies: Optional[dict] = None,
+    codec: Optional[str] = None,
+    engine: str = "bytes",
+) -> Iterator[bytes]:
+    """Obfuscate a CSV or JSONL object in S3 as shards, yielding them in order.
+
+    At most 2 * `max_workers` shards are in flight, so shards are only fetched as
+    far ahead of the consumer as that. The worker processes are shut down when the
+    generator finishes or is closed. See obfuscate_sharded.
+
+
+    Args:
+        bucket (Union[str, Storage]): The bucket containing the file, or the
+            storage backend holding it.
+        key (str): The key of a '.csv' or '.jsonl' file.
+        pii_fields (List[str]): A list of field names to be obfuscated.
+        max_workers (Optional[int]): The number of worker processes.
+        shard_size (int): The approximate size in bytes of each shard.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+        validate_first_record_only (bool): For JSONL files, only check the first
+            record of each shard for the pii_fields.
+        metrics (Optional[InvocationMetrics]): Where to count the bytes read and
+            rows, if anywhere.
+        pseudonymiser (Optional[Pseudonymiser]): Tokenise values by default.
+        strategies (Optional[dict]): A masking strategy for some of the
+            pii_fields; see compile_strategies.
+        codec (Optional[str]): The JSON library for JSONL files.
+        engine (str): The engine for CSV files; see get_block_editor.
+
+
+    Yields:
+        bytes: The CSV header, if any, then each obfuscated shard.
+
+
+    Raises:
+        ValueError: If the file is not a CSV or JSONL file or is compressed, any
+            pii_fields are not found in the CSV header or a JSONL object, or a
+            strategy is invalid.
+    """
+    if split_compression_suffix(key)[1] is not None:
+        raise ValueError("sharded obfuscation does not support compressed files")
+    storage = as_storage(bucket, s3)
+
+    size = storage.size(key)
+    if key.endswith(".csv"):
+        header_end = align_to_newline(storage, key, 0, size)
+        header_bytes = storage.read_range(key, 0, header_end)
+        header = TextIOWrapper(BytesIO(header_bytes), encoding="utf-8").readline()
+        col_nums, masks = compile_csv_plan(
+            csv_string_to_list(header), pii_fields, strategies, pseudonymiser
+        )
+        yield edit_header(header, col_nums, masks).encode("utf-8")
+        transform = partial(
+            obfuscate_csv_shard,
+            col_nums=col_nums,
+            masks=masks,
+            engine=engine,
+        )
+    elif key.endswith(".jsonl"):
+        header_end = 0
+        transform = partial(
+            obfuscate_jsonl_shard,
+            pii_fields=pii_fields,
+            validate_first_record_only=validate_first_record_only,
+            pseudonymiser=pseudonymiser,
+            strategies=strategies,
+            codec=codec,
+        )
+    else:
+        raise ValueError("sharded obfuscation supports csv and jsonl files")
+
+    if metrics is not None:
+        metrics.bytes_in += header_end
+    boundaries = [header_end]
+    while boundaries[-1] < size:
+        nominal = boundaries[-1] + shard_size
+        boundaries.append(align_to_newline(storage, key, nominal, size))
+
+    workers = max_workers or os.cpu_count() or 1
+    process_pool = PipeWorkerPool(workers) if workers > 1 else None
+
+    def shard_result(shard):
+        future, shard_size = shard
+        data = future.result()
+        if metrics is not None:
+            metrics.bytes_in += shard_size
+            metrics.rows += count_lines(data)
+        return data
+
+    def process_shard(start, end):
+        if process_pool is None:
+            return transform(storage.read_range(key, start, end))
+        if storage.shared:
+            # The worker reads its own range, so the shard is never pickled.
+            return process_pool.run(
+                transform_range, transform, storage, key, start, end
+            )
+        data = storage.read_range(key, start, end)
+        return process_pool.run(transform, data)
+
+    try:
+        with ThreadPoolExecutor(workers) as fetch_pool:
+            in_flight = deque()
+            for start, end in zip(boundaries, boundaries[1:]):
+                if len(in_flight) >= 2 * workers:
+                    yield shard_result(in_flight.popleft())
+                future = fetch_pool.submit(process_shard, start, end)
+                in_flight.append((future, end - start))
+            while in_flight:
+                yield shard_result(in_flight.popleft())
+    finally:
+        if process_pool is not None:
+            process_pool.close()
+
+
+def transform_range(
+    transform: Callable, storage: "Storage", key: str, start: int, end: int
+) -> bytes:
+    """Read a byte range of a file and obfuscate it, in a shard worker process.
+
+
+    Args:
+        transform (Callable): obfuscate_csv_shard or obfuscate_jsonl_shard with
+            their other arguments bound.
+        storage (Storage): A storage backend whose files the worker can read.
+        key (str): The key of the file.
+        start (int): The offset of the first byte of the shard.
+        end (int): The offset one past the last byte of the shard.
+
+
+    Returns:
+        bytes: The obfuscated shard.
+    """
+    return transform(storage.read_range(key, start, end))
+
+
+class PipeWorkerPool:
+    """Worker processes that each take one task at a time over their own Pipe.
+
+    ProcessPoolExecutor and multiprocessing.Pool synchronise their queues with
+    POSIX semaphores, which need /dev/shm, so they fail on AWS Lambda. These
+    workers are plain multiprocessing.Process objects that read a function and its
+    arguments from a Pipe and send back the result or the exception it raised, so
+    they only need the pipes that Lambda supports. `run` can be called from many
+    threads at once; each call waits for an idle worker.
+    """
+
+    def __init__(self, workers: int):
+        """Start `workers` worker processes."""
+        self.idle = queue.SimpleQueue()
+        self.workers = []
+        for _ in range(workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_pipe_worker, args=(worker_connection,), daemon=True
+            )
+            process.start()
+            worker_connection.close()
+            self.workers.append((process, connection))
+            self.idle.put(connection)
+
+    def run(self, func: Callable, *args):
+        """Call `func(*args)` in an idle worker process and return its result.
+
+
+        Raises:
+            Exception: Whatever the call raised in the worker, or EOFError if the
+                worker died.
+        """
+        connection = self.idle.get()
+        try:
+            connection.send((func, args))
+            succeeded, result = connection.recv()
+        finally:
+            # A dead worker's pipe is put back too, so later calls fail quickly
+            # instead of waiting for a worker that will never be idle.
+            self.idle.put(connection)
+        if not succeeded:
+            raise result
+        return result
+
+    def close(self) -> None:
+        """Stop the worker processes, terminating any that are still busy."""
+        for process, connection in self.workers:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process, connection in self.workers:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            connection.close()
+
+
+def run_pipe_worker(connection) -> None:
+    """Run the calls sent by a PipeWorkerPool until it sends None."""
+    for task in iter(connection.recv, None):
+        func, args = task
+        try:
+            result = (True, func(*args))
+        except Exception as err:
+            result = (False, err)
+        connection.send(result)
+
+
+def obfuscate_csv_shard(
+    data: bytes,
+    col_nums: List[int],
+    masks: Optional[Tuple[Callable, ...]] = None,
+    engine: str = "bytes",
+) -> bytes:
+    """Obfuscate a newline-aligned block of CSV rows that has no header.
+
+    Shard boundaries are found without reading the file from the start, so they
+    can only be trusted when no quoted field contains a new line.
+
+
+    Args:
+        data (bytes): Whole CSV rows.
+        col_nums (List[int]): Indices of the columns to obfuscate.
+        masks (Optional[Tuple[Callable, ...]]): The mask of each column from
+            compile_csv_plan, or None to replace every value with '***'.
+        engine (str): The engine that edits the rows; see get_block_editor.
+
+
+    Returns:
+        bytes: The obfuscated rows.
+
+    Raises:
+        ValueError: If a quoted field in the block spans a new line.
+    """
+    data = normalise_newlines(data)
+    if b'"' in data and not has_balanced_quotes(
+        data if data.endswith(b"\n") else data + b"\n"
+    ):
+        raise ValueError(
+            "sharded obfuscation does not support quoted fields containing new lines"
+        )
+    return get_block_editor(engine)(data, col_nums, masks)
+
+
+def obfuscate_jsonl_shard(
+    data: bytes,
+    pii_fields: List[str],
+    validate_first_record_only: bool = False,
+    pseudonymiser: Optional["Pseudonymiser"] = None,
+    strategies: Optional[dict] = None,
+    codec: Optional[str] = None,
+) -> bytes:
+    """Obfuscate a newline-aligned block of JSONL rows.
+
+
+    Args:
+        data (bytes): Whole JSONL rows.
+        pii_fields (List[str]): A list of field names to be obfuscated.
+        validate_first_record_only (bool): Only check the first row of the block
+            for the pii_fields.
+        pseudonymiser (Optional[Pseudonymiser]): Tokenise values instead of
+            replacing them with '***'.
+        strategies (Optional[dict]): A masking strategy for some of the
+            pii_fields; see compile_strategies.
+        codec (Optional[str]): The JSON library to use, 'orjson' or 'json'.
+
+
+    Returns:
+        bytes: The obfuscated rows.
+    """
+    output = obfuscate_jsonl(
+        BytesIO(data),
+        pii_fields,
+        codec=codec,
+        validate_first_record_only=validate_first_record_only,
+        pseudonymiser=pseudonymiser,
+        strategies=strategies,
+    )
+    return output.getvalue()
+
+
+def align_to_newline(
+    bucket: Union[str, "Storage"], key: str, offset: int, size: int, s3=None
+) -> int:
+    """Find the first line start at or after an offset in an S3 object.
+
+    Small ranged GETs are made from the byte before `offset` until a newline is
+    found, so at most a few KB are read however long the lines are.
+
+
+    Args:
+        bucket (Union[str, Storage]): The bucket containing the object, or the
+            storage backend holding it.
+        key (str): The key of the object.
+        offset (int): The offset to start searching from.
+        size (int): The size of the object.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+
+
+    Returns:
+        int: The offset just after the next newline, or `size` if there is none.
+    """
+    storage = as_storage(bucket, s3)
+    if offset <= 0:
+        position = 0
+    else:
+        position = offset - 1
+    while position < size:
+        end = min(position + SHARD_PROBE_SIZE, size)
+        newline = storage.read_range(key, position, end).find(b"\n")
+        if newline != -1:
+            return position + newline + 1
+        position = end
+    return size
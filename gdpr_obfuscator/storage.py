@@ -0,0 +1,600 @@
+"""Storage backends for S3, local files and memory, and S3 multipart uploads."""
+
+from abc import ABC, abstractmethod
+from io import RawIOBase, BytesIO
+import mmap
+import os
+import re
+
+from typing import (
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+
+# Created on first use by get_s3_client, so importing the package does not import
+# boto3. Tests can patch it with their own client.
+s3_client = None
+
+# The objects behind 'memory://' URIs, by key; see MemoryStorage.
+memory_objects = {}
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+GLOB_WILDCARD = re.compile(r"[*?[]")
+
+
+def get_s3_client():
+    """Get the shared S3 client, creating it on first use.
+
+    boto3 is only imported here, which keeps it off the import path of the package
+    and out of cold starts that never reach S3.
+
+
+    Returns:
+        The boto3 S3 client stored in `s3_client`.
+    """
+    global s3_client
+    if s3_client is None:
+        from boto3 import client
+
+        s3_client = client("s3")
+    return s3_client
+
+
+def get_byte_range(bucket: str, key: str, start: int, end: int, s3=None) -> bytes:
+    """Fetch the bytes in [start, end) of an S3 object with a ranged GET.
+
+
+    Args:
+        bucket (str): The bucket containing the object.
+        key (str): The key of the object.
+        start (int): The offset of the first byte to fetch.
+        end (int): The offset one past the last byte to fetch.
+        s3: An optional boto3 S3 client to use instead of the shared client.
+
+
+    Returns:
+        bytes: The requested bytes, or b"" for an empty range.
+    """
+    if end <= start:
+        return b""
+    if s3 is None:
+        s3 = get_s3_client()
+    response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end - 1}")
+    return response["Body"].read()
+
+
+def extract_bucket_key(s3_uri: str) -> Tuple[str, str]:
+    """Extract the bucket name and key from an S3 URI.
+
+
+    Args:
+        s3_uri (str): The S3 URI in the format 's3://bucket/key'.
+
+
+    Returns:
+        Tuple[str, str]: A tuple containing the bucket name and key.
+
+
+    Raises:
+        ValueError: If the URI is not a valid S3 URI.
+        ValueError: If the URI does not contain both a bucket and a key.
+    """
+    if not s3_uri.startswith("s3://"):
+        raise ValueError(f"Invalid S3 URI: {s3_uri}")
+    without_prefix = s3_uri[5:]
+    parts = without_prefix.split("/", 1)
+    if len(parts) != 2 or parts[0] == "" or parts[1] == "":
+        raise ValueError(f"S3 URI must include bucket and key: {s3_uri}")
+    bucket, key = parts
+    return bucket, key
+
+
+class S3MultipartWriter:
+    """A write-only file-like object that streams its contents to S3.
+
+    Written bytes are buffered until `part_size` is reached and then sent with
+    `upload_part`, so only about one part is held in memory at a time. Output that
+    never fills a single part is sent with `put_object` when the writer is closed.
+    """
+
+    def __init__(
+        self,
+        s3,
+        bucket: str,
+        key: str,
+        part_size: int = DEFAULT_PART_SIZE,
+        upload_id: Optional[str] = None,
+        parts: Optional[List[dict]] = None,
+    ):
+        """Create a writer for the object at `bucket`/`key`.
+
+
+        Args:
+            s3: A boto3 S3 client.
+            bucket (str): The destination bucket name.
+            key (str): The destination key.
+            part_size (int): The size in bytes of each uploaded part.
+            upload_id (Optional[str]): The ID of a multipart upload to carry on.
+            parts (Optional[List[dict]]): The 'PartNumber' and 'ETag' of each
+                part already uploaded to it.
+
+
+        Raises:
+            ValueError: If `part_size` is smaller than the S3 minimum of 5 MiB.
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.upload_id = upload_id
+        self.parts = list(parts or [])
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def write(self, data: bytes) -> int:
+        """Buffer `data`, uploading a part each time the buffer fills up."""
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[: self.part_size])
+            del self._buffer[: self.part_size]
+            self.upload_part(part)
+        return len(data)
+
+    def close(self) -> dict:
+        """Upload any buffered bytes and complete the upload.
+
+
+        Returns:
+            dict: The 'Bucket', 'Key' and 'ETag' of the uploaded object.
+        """
+        if self.upload_id is None:
+            response = self.s3.put_object(
+                Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer)
+            )
+        else:
+            if self._buffer:
+                self.upload_part(bytes(self._buffer))
+            response = self.s3.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        self._buffer.clear()
+        return {"Bucket": self.bucket, "Key": self.key, "ETag": response["ETag"]}
+
+    def abort(self) -> None:
+        """Abort an in-progress multipart upload and discard buffered bytes."""
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+            self.upload_id = None
+            self.parts = []
+        self._buffer.clear()
+
+    def upload_part(self, data: bytes) -> None:
+        """Upload `data` as the next part, starting the upload if needed.
+
+        Bytes buffered by `write` are not included. Every part but the last must
+        be at least MIN_PART_SIZE bytes.
+        """
+        if self.upload_id is None:
+            response = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self.upload_id = response["UploadId"]
+        part_number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        self.parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+
+def open_location(uri: str, s3=None) -> Tuple["Storage", str]:
+    """Find the storage backend and key for the URI of a file to read or write.
+
+    's3://bucket/key' URIs are read from S3, 'memory://key' URIs from
+    `memory_objects` and 'file:///path' URIs from the local file system. Anything
+    else, including a plain path, is an invalid S3 URI, so an event can only
+    reach local files by asking for them with 'file://'.
+
+
+    Args:
+        uri (str): The URI or path of the file.
+        s3: An optional boto3 S3 client for S3 URIs, instead of the shared client.
+
+
+    Returns:
+        Tuple[Storage, str]: The storage backend and the key of the file in it.
+
+
+    Raises:
+        ValueError: If the URI has another scheme or none, or an S3 or memory URI
+            has no key.
+    """
+    if uri.startswith("s3://"):
+        bucket, key = extract_bucket_key(uri)
+        return S3Storage(bucket, s3), key
+    if uri.startswith("memory://"):
+        key = uri[len("memory://") :]
+        if not key:
+            raise ValueError(f"Memory URI must include a key: {uri}")
+        return MemoryStorage(), key
+    if uri.startswith("file://"):
+        return LocalStorage(), uri[len("file://") :]
+    bucket, key = extract_bucket_key(uri)
+    return S3Storage(bucket, s3), key
+
+
+def as_storage(bucket: Union[str, "Storage"], s3=None) -> "Storage":
+    """Get the storage backend for a bucket name, or a backend given as is."""
+    if isinstance(bucket, Storage):
+        return bucket
+    return S3Storage(bucket, s3)
+
+
+class Storage(ABC):
+    """Where files are read from and written to, addressed by key.
+
+    Subclasses read whole files, byte ranges and sizes, and create writers whose
+    `close` method publishes the file and returns a dict describing it, and whose
+    `abort` method discards it.
+    """
+
+    # Whether worker processes can read the files themselves; see transform_range.
+    shared = False
+
+    @abstractmethod
+    def uri(self, key: str) -> str:
+        """Get the URI of a file, as open_location takes it."""
+
+    @abstractmethod
+    def glob(self, pattern: str) -> List[str]:
+        """List the keys of the files matching a shell-style pattern, sorted."""
+
+    @abstractmethod
+    def open(self, key: str, start: int = 0):
+        """Open a file for reading from byte `start` as a binary file-like object."""
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        """Get the size of a file in bytes."""
+
+    @abstractmethod
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        """Read the bytes in [start, end) of a file, or fewer at its end."""
+
+    @abstractmethod
+    def create_writer(self, key: str):
+        """Create a writer for a file, published when the writer is closed."""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Write a whole file at once."""
+
+
+class S3Storage(Storage):
+    """Objects in an S3 bucket."""
+
+    def __init__(self, bucket: str, s3=None):
+        """Create a backend for `bucket`.
+
+
+        Args:
+            bucket (str): The bucket name.
+            s3: An optional boto3 S3 client to use instead of the shared client.
+        """
+        self.bucket = bucket
+        self.s3 = s3 if s3 is not None else get_s3_client()
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    def glob(self, pattern: str) -> List[str]:
+        from fnmatch import fnmatchcase
+
+        prefix = GLOB_WILDCARD.split(pattern, 1)[0]
+        paginator = self.s3.get_paginator("list_objects_v2")
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            keys.extend(
+                item["Key"]
+                for item in page.get("Contents", [])
+                if fnmatchcase(item["Key"], pattern)
+            )
+        return sorted(keys)
+
+    def open(self, key: str, start: int = 0, if_match: Optional[str] = None):
+        """Open an object from byte `start`, only if its ETag is `if_match`."""
+        options = {}
+        if start:
+            options["Range"] = f"bytes={start}-"
+        if if_match is not None:
+            options["IfMatch"] = if_match
+        response = self.s3.get_object(Bucket=self.bucket, Key=key, **options)
+        return response["Body"]
+
+    def size(self, key: str) -> int:
+        return self.s3.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        from botocore.exceptions import ClientError
+
+        try:
+            return get_byte_range(self.bucket, key, start, end, self.s3)
+        except ClientError as err:
+            if err.response["Error"]["Code"] != "InvalidRange":
+                raise
+            return b""
+
+    def create_writer(self, key: str) -> S3MultipartWriter:
+        return S3MultipartWriter(self.s3, self.bucket, key)
+
+    def put(self, key: str, data: bytes) -> None:
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+
+class LocalStorage(Storage):
+    """Files on a local file system, keyed by their paths.
+
+    Files are read through a MappedReader, and written to a temporary file that
+    replaces the destination when the writer is closed.
+    """
+
+    shared = True
+
+    def uri(self, key: str) -> str:
+        return f"file://{key}"
+
+    def glob(self, pattern: str) -> List[str]:
+        from glob import glob
+
+        paths = glob(pattern, recursive=True)
+        return sorted(path for path in paths if os.path.isfile(path))
+
+    def open(self, key: str, start: int = 0) -> "MappedReader":
+        reader = MappedReader(key)
+        reader.seek(start)
+        return reader
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(key)
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        if end <= start:
+            return b""
+        with MappedReader(key) as reader:
+            reader.seek(start)
+            return reader.read(end - start)
+
+    def create_writer(self, key: str) -> "LocalFileWriter":
+        return LocalFileWriter(key)
+
+    def put(self, key: str, data: bytes) -> None:
+        with open(key, "wb") as file:
+            file.write(data)
+
+
+class MemoryStorage(Storage):
+    """Bytes objects in a dict, by default `memory_objects`.
+
+    This lets tests and callers that already hold their data in memory run the
+    same code paths as S3, without a network or a file system.
+    """
+
+    def __init__(self, objects: Optional[dict] = None):
+        self.objects = memory_objects if objects is None else objects
+
+    def uri(self, key: str) -> str:
+        return f"memory://{key}"
+
+    def glob(self, pattern: str) -> List[str]:
+        from fnmatch import fnmatchcase
+
+        return sorted(key for key in self.objects if fnmatchcase(key, pattern))
+
+    def open(self, key: str, start: int = 0) -> BytesIO:
+        body = BytesIO(self.get(key))
+        body.seek(start)
+        return body
+
+    def size(self, key: str) -> int:
+        return len(self.get(key))
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        return self.get(key)[start:end]
+
+    def create_writer(self, key: str) -> "MemoryWriter":
+        return MemoryWriter(self.objects, key)
+
+    def put(self, key: str, data: bytes) -> None:
+        self.objects[key] = bytes(data)
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self.objects[key]
+        except KeyError:
+            raise FileNotFoundError(f"No such memory object: {key}") from None
+
+
+class LocalFileWriter:
+    """A write-only file-like object that replaces a local file when closed.
+
+    Bytes are written to a temporary file in the destination's directory, which
+    is renamed over the destination on `close`, so a failed run never leaves a
+    partial file behind.
+    """
+
+    def __init__(self, path: str):
+        """Create a writer for the file at `path`, creating its directory.
+
+
+        Args:
+            path (str): The destination path.
+        """
+        self.path = path
+        directory, name = os.path.split(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.temp_path = os.path.join(directory, f".{name}.{os.urandom(4).hex()}.tmp")
+        # Created like open() would, so the file gets the usual permissions.
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+        fd = os.open(self.temp_path, flags, 0o666)
+        self._file = os.fdopen(fd, "wb")
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def write(self, data: bytes) -> int:
+        return self._file.write(data)
+
+    def close(self) -> dict:
+        """Move the written file into place.
+
+
+        Returns:
+            dict: The 'Path' of the written file.
+        """
+        self._file.close()
+        os.replace(self.temp_path, self.path)
+        return {"Path": self.path}
+
+    def abort(self) -> None:
+        """Delete the temporary file."""
+        self._file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class MemoryWriter:
+    """A write-only file-like object that stores its bytes in a dict when closed."""
+
+    def __init__(self, objects: dict, key: str):
+        self.objects = objects
+        self.key = key
+        self._buffer = BytesIO()
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def write(self, data: bytes) -> int:
+        return self._buffer.write(data)
+
+    def close(self) -> dict:
+        """Store the written bytes under the writer's key.
+
+
+        Returns:
+            dict: The 'Key' of the stored object.
+        """
+        self.objects[self.key] = self._buffer.getvalue()
+        return {"Key": self.key}
+
+    def abort(self) -> None:
+        """Discard the written bytes."""
+        self._buffer = BytesIO()
+
+
+class MappedReader(RawIOBase):
+    """A seekable reader of a local file through a read-only memory map.
+
+    Each read copies the requested bytes out of the mapping into a new bytes
+    object, which is the one copy a read makes: there is no read buffer in
+    between and no system call per read, and the kernel is told the file will be
+    read sequentially so it reads ahead. The copy is kept because the CSV, JSON
+    and compression readers need bytes, and a view would keep the mapping from
+    being closed. Arrow reads Parquet files straight from the mapping without a
+    copy; see getbuffer. An empty file, which cannot be mapped, reads as empty.
+    """
+
+    def __init__(self, path: str):
+        """Map the file at `path`.
+
+
+        Args:
+            path (str): The path of the file.
+        """
+        self.mapping = None
+        self.position = 0
+        with open(path, "rb") as file:
+            self.size = os.fstat(file.fileno()).st_size
+            if self.size:
+                self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mapping is not None and hasattr(mmap, "MADV_SEQUENTIAL"):
+            self.mapping.madvise(mmap.MADV_SEQUENTIAL)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self.position = offset
+        return offset
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if self.closed:
+            raise ValueError("read from closed file")
+        start = min(self.position, self.size)
+        if size is None or size < 0:
+            end = self.size
+        else:
+            end = min(start + size, self.size)
+        self.position = max(self.position, end)
+        if self.mapping is None:
+            return b""
+        return self.mapping[start:end]
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def getbuffer(self) -> memoryview:
+        """Get a view of the whole file, without copying it."""
+        if self.mapping is None:
+            return memoryview(b"")
+        return memoryview(self.mapping)
+
+    def close(self) -> None:
+        """Unmap the file, once any views of it from getbuffer are released."""
+        if self.mapping is not None:
+            try:
+                self.mapping.close()
+            except BufferError:
+                pass
+            self.mapping = None
+        super().close()
@@ -0,0 +1,320 @@
+"""Masking strategies and keyed pseudonymisation of PII values."""
+
+from functools import lru_cache, partial
+import hmac
+import json
+import os
+import re
+
+from typing import (
+    Callable,
+    List,
+    Optional,
+    Union,
+)
+
+
+PSEUDONYM_KEY_ENV_VAR = "GDPR_OBFUSCATOR_PSEUDONYM_KEY"
+PSEUDONYM_LENGTH = 16
+PSEUDONYM_CACHE_SIZE = 64 * 1024
+
+MASK_LENGTH = 8
+KEEP_LAST_COUNT = 4
+DATE_UNITS = ("year", "month", "day")
+DATE_PREFIX = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+
+
+class Pseudonymiser:
+    """Replaces values with deterministic keyed tokens, memoising recent values.
+
+    A token is the first `length` hex digits of the HMAC-SHA256 of a value under a
+    secret key, so the same value always gets the same token and pseudonymised
+    columns can still be joined across datasets. PII columns such as a country or
+    a customer's email repeat a lot, so the tokens of up to `cache_size` recently
+    seen values are kept in an LRU cache instead of being hashed again.
+    """
+
+    def __init__(
+        self,
+        key: bytes,
+        length: int = PSEUDONYM_LENGTH,
+        cache_size: int = PSEUDONYM_CACHE_SIZE,
+    ):
+        """Create a pseudonymiser for a secret key.
+
+
+        Args:
+            key (bytes): The HMAC key.
+            length (int): The number of hex digits in each token, at most 64.
+            cache_size (int): The number of values whose tokens are cached.
+
+
+        Raises:
+            ValueError: If the key is empty or the length is not between 1 and 64.
+        """
+        if not key:
+            raise ValueError("key must not be empty")
+        if not 1 <= length <= 64:
+            raise ValueError("length must be between 1 and 64")
+        self.key = key
+        self.length = length
+        self.cache_size = cache_size
+        self.token = lru_cache(maxsize=cache_size)(self.compute_token)
+
+    def __call__(self, value):
+        """Get the token of a value.
+
+        Bytes give a bytes token and anything else a str token. Values other than
+        strings and bytes, as found in JSON, are tokenised by their compact JSON
+        text, so the number 42 gets the same token as the CSV value 42.
+        """
+        if isinstance(value, bytes):
+            return self.token(value)
+        return self.token(value_text(value))
+
+    def __reduce__(self):
+        # The cache cannot be pickled, so worker processes start with their own.
+        return (Pseudonymiser, (self.key, self.length, self.cache_size))
+
+    def compute_token(self, value: Union[str, bytes]) -> Union[str, bytes]:
+        """Compute the token of a str or bytes value without the cache."""
+        data = value.encode("utf-8") if isinstance(value, str) else value
+        token = hmac.digest(self.key, data, "sha256").hex()[: self.length]
+        return token if isinstance(value, str) else token.encode("ascii")
+
+    def cache_info(self) -> dict:
+        """Get the cache statistics.
+
+
+        Returns:
+            dict: The 'hits', 'misses', 'size' and 'max_size' of the cache, and its
+                'hit_rate', the share of values whose token was cached.
+        """
+        info = self.token.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+        }
+
+
+def get_pseudonymiser() -> Pseudonymiser:
+    """Get the Pseudonymiser for the key in the PSEUDONYM_KEY_ENV_VAR variable.
+
+    The same instance is returned while the key stays the same, so its cache is
+    shared by every file a warm Lambda or a batch processes.
+
+
+    Returns:
+        Pseudonymiser: The shared pseudonymiser.
+
+    Raises:
+        ValueError: If the environment variable is not set.
+    """
+    key = os.environ.get(PSEUDONYM_KEY_ENV_VAR)
+    if not key:
+        raise ValueError(
+            f"pseudonymise requires the {PSEUDONYM_KEY_ENV_VAR} environment variable"
+        )
+    return pseudonymiser_for_key(key.encode("utf-8"))
+
+
+@lru_cache(maxsize=4)
+def pseudonymiser_for_key(key: bytes) -> Pseudonymiser:
+    return Pseudonymiser(key)
+
+
+def compile_strategies(
+    pii_fields: List[str],
+    strategies: Optional[dict] = None,
+    pseudonymiser: Optional[Pseudonymiser] = None,
+) -> Optional[List[Callable]]:
+    """Compile the masking strategy of each pii_field into a function.
+
+    `strategies` maps a field to the name of a strategy in MASKING_STRATEGIES,
+    optionally followed by ':' and an argument, e.g. 'keep_last:4'. Fields without
+    a strategy are redacted with '***', or hashed when a pseudonymiser is given.
+    The strategies are parsed here, once per file, so masking a value is a single
+    call to its field's function.
+
+
+    Args:
+        pii_fields (List[str]): The field names or paths to be obfuscated.
+        strategies (Optional[dict]): A strategy for some or all of the fields.
+        pseudonymiser (Optional[Pseudonymiser]): The pseudonymiser used by the
+            'hash' strategy, and the default strategy when given.
+
+
+    Returns:
+        Optional[List[Callable]]: The mask of each field, in the order of
+            pii_fields, or None if every field is redacted with '***'.
+
+
+    Raises:
+        ValueError: If a strategy is unknown or has an invalid argument, or is given
+            for a field that is not one of the pii_fields.
+    """
+    strategies = strategies or {}
+    unknown_fields = set(strategies) - set(pii_fields)
+    if unknown_fields:
+        raise ValueError(
+            f"strategies given for fields not in pii_fields: {sorted(unknown_fields)}"
+        )
+    default = "redact" if pseudonymiser is None else "hash"
+    masks = [
+        make_mask(strategies.get(field, default), pseudonymiser) for field in pii_fields
+    ]
+    if all(mask is redact_value for mask in masks):
+        return None
+    return masks
+
+
+def make_mask(strategy: str, pseudonymiser: Optional[Pseudonymiser] = None) -> Callable:
+    """Build the mask function of a strategy such as 'redact' or 'keep_last:4'.
+
+
+    Args:
+        strategy (str): A strategy name, optionally followed by ':' and an argument.
+        pseudonymiser (Optional[Pseudonymiser]): The pseudonymiser for 'hash'. When
+            None, 'hash' uses get_pseudonymiser.
+
+
+    Returns:
+        Callable: A function from a value to its masked value.
+
+
+    Raises:
+        ValueError: If the strategy is unknown or its argument is invalid.
+    """
+    name, _, argument = strategy.partition(":")
+    if name not in MASKING_STRATEGIES:
+        raise ValueError(
+            f"unknown masking strategy '{name}', "
+            f"choose from {sorted(MASKING_STRATEGIES)}"
+        )
+    return MASKING_STRATEGIES[name](argument, pseudonymiser)
+
+
+def parse_strategy_count(name: str, argument: str, default: int) -> int:
+    """Parse the optional length argument of a strategy such as 'mask:12'."""
+    if not argument:
+        return default
+    if not argument.isdigit() or int(argument) < 1:
+        raise ValueError(
+            f"the {name} strategy takes a positive integer, got '{argument}'"
+        )
+    return int(argument)
+
+
+def check_no_argument(name: str, argument: str) -> None:
+    """Reject an argument given to a strategy that takes none."""
+    if argument:
+        raise ValueError(f"the {name} strategy takes no argument, got '{argument}'")
+
+
+def redact_strategy(argument: str, pseudonymiser=None) -> Callable:
+    """'redact': replace values with '***'. This is the default strategy."""
+    check_no_argument("redact", argument)
+    return redact_value
+
+
+def mask_strategy(argument: str, pseudonymiser=None) -> Callable:
+    """'mask[:length]': replace values with a run of '*' that hides their length."""
+    length = parse_strategy_count("mask", argument, MASK_LENGTH)
+    return partial(constant_value, constant="*" * length)
+
+
+def keep_last_strategy(argument: str, pseudonymiser=None) -> Callable:
+    """'keep_last[:count]': mask all but the last characters of values."""
+    count = parse_strategy_count("keep_last", argument, KEEP_LAST_COUNT)
+    return partial(keep_last_value, count=count)
+
+
+def null_strategy(argument: str, pseudonymiser=None) -> Callable:
+    """'null': replace values with null in JSON and an empty field in CSV."""
+    check_no_argument("null", argument)
+    return partial(constant_value, constant=None)
+
+
+def drop_strategy(argument: str, pseudonymiser=None) -> Callable:
+    """'drop': remove the field from JSON records, or the column from CSV files."""
+    check_no_argument("drop", argument)
+    return drop_value
+
+
+def hash_strategy(argument: str, pseudonymiser=None) -> Callable:
+    """'hash': replace values with their keyed token; see Pseudonymiser."""
+    check_no_argument("hash", argument)
+    return pseudonymiser or get_pseudonymiser()
+
+
+def truncate_date_strategy(argument: str, pseudonymiser=None) -> Callable:
+    """'truncate_date[:unit]': keep an ISO date only to the year, month or day."""
+    unit = argument or "month"
+    if unit not in DATE_UNITS:
+        raise ValueError(
+            f"the truncate_date strategy takes one of {list(DATE_UNITS)}, got '{unit}'"
+        )
+    return partial(truncate_date_value, parts=DATE_UNITS.index(unit) + 1)
+
+
+def value_text(value) -> str:
+    """Get a str value itself, or the compact JSON text of any other value."""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def redact_value(value) -> str:
+    """Replace a value with '***'."""
+    return "***"
+
+
+def constant_value(value, constant):
+    """Replace a value with a constant."""
+    return constant
+
+
+def keep_last_value(value, count: int) -> str:
+    """Replace all but the last `count` characters of a value with '*'.
+
+    Values of `count` characters or fewer are masked completely.
+    """
+    text = value_text(value)
+    if len(text) <= count:
+        return "*" * len(text)
+    return "*" * (len(text) - count) + text[-count:]
+
+
+def truncate_date_value(value, parts: int) -> str:
+    """Keep the first `parts` of the year, month and day of an ISO date.
+
+    The rest of the date is set to 01 and any time is removed, so with two parts
+    '2024-05-17T10:22:00' becomes '2024-05-01'. Values that do not start with a
+    date are replaced with '***'.
+    """
+    match = DATE_PREFIX.match(value) if isinstance(value, str) else None
+    if match is None:
+        return "***"
+    return "-".join(match.groups()[:parts] + ("01",) * (3 - parts))
+
+
+def drop_value(value) -> None:
+    """The mask of dropped fields, which the planners remove instead of calling."""
+    return None
+
+
+# Maps each strategy name to a function that takes its argument, or '' if none was
+# given, and the pseudonymiser of the run, and returns the mask of a field.
+MASKING_STRATEGIES = {
+    "redact": redact_strategy,
+    "mask": mask_strategy,
+    "keep_last": keep_last_strategy,
+    "null": null_strategy,
+    "drop": drop_strategy,
+    "hash": hash_strategy,
+    "truncate_date": truncate_date_strategy,
+}
@@ -0,0 +1,31 @@
+from boto3 import client
+from os import environ
+from pytest import fixture
+from moto import mock_aws
+from unittest.mock import patch
+
+
+@fixture(scope="function")
+def aws_credentials():
+    environ["AWS_ACCESS_KEY_ID"] = "test"
+    environ["AWS_SECRET_ACCESS_KEY"] = "test"
+    environ["AWS_SECURITY_TOKEN"] = "test"
+    environ["AWS_SESSION_TOKEN"] = "test"
+    environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+
+
+@fixture(scope="function")
+def s3_client(aws_credentials):
+    with mock_aws():
+        s3 = client("s3", region_name="eu-west-2")
+        with patch("gdpr_obfuscator.storage.s3_client", s3):
+            yield s3
+
+
+@fixture(scope="function")
+def test_bucket(s3_client):
+    s3_client.create_bucket(
+        Bucket="test-bucket",
+        CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+    )
+    return s3_client
@@ -0,0 +1,39 @@
+from benchmark.data import iter_dataset, pii_column_count, pii_fields
+from io import BytesIO
+import os
+import tracemalloc
+
+MB = 1024 * 1024
+
+
+def peak_memory(func, *args, **kwargs) -> int:
+    """Run func and return the tracemalloc peak of the allocations it made."""
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def peak_memory_growth(
+    func, fmt: str, sizes=(4 * MB, 16 * MB), columns: int = 8, pii_share: float = 0.25
+) -> float:
+    """The extra tracemalloc peak per extra input byte of func between two sizes.
+
+    The output is written to os.devnull, so only the obfuscator's own memory is
+    measured. A streaming obfuscator stays near zero once the input is larger
+    than its block size, while anything that holds the whole file in memory
+    gives one or more.
+    """
+    fields = pii_fields(pii_column_count(columns, pii_share))
+    points = []
+    for size in sizes:
+        data = b"".join(
+            chunk for chunk, _ in iter_dataset(fmt, size, columns, pii_share)
+        )
+        with open(os.devnull, "wb") as output_buffer:
+            peak = peak_memory(func, BytesIO(data), fields, output_buffer)
+        points.append((len(data), peak))
+    (small_size, small_peak), (large_size, large_peak) = points
+    return (large_peak - small_peak) / (large_size - small_size)
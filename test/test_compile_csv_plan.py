@@ -0,0 +1,23 @@
+from gdpr_obfuscator.strategies import drop_value
+from gdpr_obfuscator.csv_obfuscator import compile_csv_plan
+from pytest import raises
+
+
+def test_compile_csv_plan_returns_no_masks_when_every_column_is_redacted():
+    headers = ["name", "age", "email"]
+    assert compile_csv_plan(headers, ["email", "name"]) == ([0, 2], None)
+
+
+def test_compile_csv_plan_orders_masks_by_column():
+    headers = ["name", "age", '"email"']
+    col_nums, masks = compile_csv_plan(
+        headers, ["email", "name"], {"email": "drop", "name": "mask:4"}
+    )
+    assert col_nums == [0, 2]
+    assert masks[0]("Fake Namington") == "****"
+    assert masks[1] is drop_value
+
+
+def test_compile_csv_plan_raises_value_error_for_a_missing_field():
+    with raises(ValueError):
+        compile_csv_plan(["name"], ["email"], {"email": "mask"})
@@ -0,0 +1,128 @@
+from gdpr_obfuscator.json_obfuscator import compile_field_paths, mask_record
+from functools import partial
+from pytest import raises
+
+
+def nested_record():
+    return {
+        "id": 1,
+        "customer": {
+            "name": "Fake Namington",
+            "contact": {"email": "fake@email.com", "phone": "0123"},
+        },
+        "orders": [
+            {"sku": "A1", "card_number": "4111"},
+            {"sku": "B2", "card_number": "5500"},
+        ],
+    }
+
+
+def test_compile_field_paths_uses_mask_record_for_top_level_fields():
+    mask = compile_field_paths(["email", "name"])
+    assert isinstance(mask, partial)
+    assert mask.func is mask_record
+
+
+def test_compile_field_paths_masks_nested_objects():
+    record = nested_record()
+    compile_field_paths(["customer.contact.email", "customer.name"])(record)
+    assert record["customer"] == {
+        "name": "***",
+        "contact": {"email": "***", "phone": "0123"},
+    }
+    assert record["orders"] == nested_record()["orders"]
+
+
+def test_compile_field_paths_masks_every_item_of_an_array():
+    record = nested_record()
+    compile_field_paths(["orders[*].card_number"])(record)
+    assert record["orders"] == [
+        {"sku": "A1", "card_number": "***"},
+        {"sku": "B2", "card_number": "***"},
+    ]
+
+
+def test_compile_field_paths_masks_whole_values_and_array_items():
+    record = {"tags": ["a", "b"], "customer": {"contact": {"email": "x"}}}
+    compile_field_paths(["tags[*]", "customer.contact"])(record)
+    assert record == {"tags": ["***", "***"], "customer": {"contact": "***"}}
+
+
+def test_compile_field_paths_mixes_top_level_and_nested_fields():
+    record = nested_record()
+    compile_field_paths(["id", "customer.contact.phone", "orders[*].sku"])(record)
+    assert record["id"] == "***"
+    assert record["customer"]["contact"]["phone"] == "***"
+    assert [order["sku"] for order in record["orders"]] == ["***", "***"]
+
+
+def test_compile_field_paths_masks_a_whole_value_named_by_a_shorter_path():
+    record = nested_record()
+    compile_field_paths(["customer.contact.email", "customer"])(record)
+    assert record["customer"] == "***"
+
+
+def test_compile_field_paths_masks_a_top_level_key_spelled_like_a_path():
+    mask = compile_field_paths(["user.email", "tags[*]"])
+    record = {"user.email": "a@b.com", "tags[*]": "x", "user": {"email": "c@d.com"}}
+    mask(record)
+    assert record == {
+        "user.email": "***",
+        "tags[*]": "***",
+        "user": {"email": "c@d.com"},
+    }
+
+    record = {"user": {"email": "c@d.com"}, "tags": ["x"]}
+    mask(record)
+    assert record == {"user": {"email": "***"}, "tags": ["***"]}
+
+
+def test_compile_field_paths_handles_empty_arrays():
+    record = {"orders": []}
+    compile_field_paths(["orders[*].card_number"])(record)
+    assert record == {"orders": []}
+
+
+def test_compile_field_paths_raises_error_for_a_missing_nested_field():
+    mask = compile_field_paths(["customer.contact.fax"])
+    with raises(ValueError) as err:
+        mask(nested_record())
+    assert (
+        str(err.value) == "The pii_field 'customer.contact.fax' not found in headers."
+    )
+
+
+def test_compile_field_paths_raises_error_for_a_missing_branch():
+    mask = compile_field_paths(["billing.address.postcode"])
+    with raises(ValueError) as err:
+        mask(nested_record())
+    assert (
+        str(err.value)
+        == "The pii_field 'billing.address.postcode' not found in headers."
+    )
+
+
+def test_compile_field_paths_raises_error_when_a_path_meets_the_wrong_type():
+    with raises(ValueError) as err:
+        compile_field_paths(["customer[*].name"])(nested_record())
+    assert str(err.value) == "The pii_field 'customer[*].name' not found in headers."
+
+    with raises(ValueError) as err:
+        compile_field_paths(["orders.card_number"])(nested_record())
+    assert str(err.value) == "The pii_field 'orders.card_number' not found in headers."
+
+
+def test_compile_field_paths_without_checks_skips_missing_leaves_and_branches():
+    record = {"customer": {"contact": {}}, "orders": "none"}
+    mask = compile_field_paths(
+        ["customer.contact.email", "billing.postcode", "orders[*].card_number"],
+        check=False,
+    )
+    mask(record)
+    assert record == {"customer": {"contact": {}}, "orders": "none"}
+
+
+def test_compile_field_paths_without_checks_masks_only_present_top_level_fields():
+    record = {"email": "a@b.com", "age": 44}
+    compile_field_paths(["email", "name"], check=False)(record)
+    assert record == {"email": "***", "age": 44}
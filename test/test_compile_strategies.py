@@ -0,0 +1,80 @@
+from gdpr_obfuscator import Pseudonymiser
+from gdpr_obfuscator.strategies import compile_strategies, drop_value
+from os import environ
+from pytest import mark, raises
+from unittest.mock import patch
+
+
+def mask_of(strategy, value):
+    masks = compile_strategies(["field", "other"], {"field": strategy, "other": "mask"})
+    return masks[0](value)
+
+
+def test_compile_strategies_returns_none_when_every_field_is_redacted():
+    assert compile_strategies(["email", "name"]) is None
+    assert compile_strategies(["email"], {"email": "redact"}) is None
+
+
+def test_compile_strategies_returns_a_mask_per_field_in_order():
+    masks = compile_strategies(["email", "name"], {"name": "mask"})
+    assert [mask("Fake") for mask in masks] == ["***", "********"]
+
+
+@mark.parametrize(
+    "strategy, value, expected",
+    [
+        ("redact", "a@b.com", "***"),
+        ("mask", "a@b.com", "********"),
+        ("mask:3", "a much longer value", "***"),
+        ("keep_last", "4111111111111111", "************1111"),
+        ("keep_last:2", 12345, "***45"),
+        ("keep_last:4", "123", "***"),
+        ("null", "a@b.com", None),
+        ("truncate_date", "2024-05-17", "2024-05-01"),
+        ("truncate_date:year", "2024-05-17T10:22:00Z", "2024-01-01"),
+        ("truncate_date:day", "2024-05-17T10:22:00Z", "2024-05-17"),
+        ("truncate_date", "17/05/2024", "***"),
+        ("truncate_date", 20240517, "***"),
+    ],
+)
+def test_compile_strategies_masks_values(strategy, value, expected):
+    assert mask_of(strategy, value) == expected
+
+
+def test_compile_strategies_marks_dropped_fields():
+    assert compile_strategies(["email"], {"email": "drop"}) == [drop_value]
+
+
+def test_compile_strategies_hashes_with_the_given_pseudonymiser():
+    pseudonymiser = Pseudonymiser(b"secret")
+    masks = compile_strategies(
+        ["email", "name"], {"name": "redact"}, pseudonymiser=pseudonymiser
+    )
+    assert masks[0] is pseudonymiser
+    assert masks[1]("Fake") == "***"
+
+
+def test_compile_strategies_hashes_with_the_key_from_the_environment():
+    with patch.dict(environ, {"GDPR_OBFUSCATOR_PSEUDONYM_KEY": "secret"}):
+        masks = compile_strategies(["email"], {"email": "hash"})
+    assert masks[0]("a@b.com") == Pseudonymiser(b"secret")("a@b.com")
+
+
+def test_compile_strategies_raises_value_error_for_an_unknown_strategy():
+    with raises(ValueError) as err:
+        compile_strategies(["email"], {"email": "scramble"})
+    assert str(err.value).startswith("unknown masking strategy 'scramble'")
+
+
+@mark.parametrize(
+    "strategy", ["mask:0", "mask:x", "keep_last:-1", "redact:3", "truncate_date:week"]
+)
+def test_compile_strategies_raises_value_error_for_an_invalid_argument(strategy):
+    with raises(ValueError):
+        compile_strategies(["email"], {"email": strategy})
+
+
+def test_compile_strategies_raises_value_error_for_a_field_not_in_pii_fields():
+    with raises(ValueError) as err:
+        compile_strategies(["email"], {"name": "mask"})
+    assert str(err.value) == "strategies given for fields not in pii_fields: ['name']"
@@ -1,4 +1,4 @@
-from src.gdpr_obfuscator import csv_string_to_list
+from gdpr_obfuscator.csv_obfuscator import csv_string_to_list
 
 
 def test_csv_string_to_list_returns_a_list():
@@ -29,3 +29,21 @@ def test_csv_string_to_list_separates_an_input_with_multiple_commas():
     test_line = "test1,test2,test3,test4,test5\n"
     output = csv_string_to_list(test_line)
     assert output == ["test1", "test2", "test3", "test4", "test5"]
+
+
+def test_csv_string_to_list_keeps_commas_inside_quoted_values():
+    test_line = 'test1,"Simpson, Bart",test3\n'
+    output = csv_string_to_list(test_line)
+    assert output == ["test1", '"Simpson, Bart"', "test3"]
+
+
+def test_csv_string_to_list_keeps_escaped_quotes_and_new_lines_in_quoted_values():
+    test_line = '"he said ""hi, there""","two\nlines",\n'
+    output = csv_string_to_list(test_line)
+    assert output == ['"he said ""hi, there"""', '"two\nlines"', ""]
+
+
+def test_csv_string_to_list_splits_on_every_comma_if_quotes_are_unbalanced():
+    test_line = 'test1,"test2,test3\n'
+    output = csv_string_to_list(test_line)
+    assert output == ["test1", '"test2', "test3"]
@@ -0,0 +1,84 @@
+from gdpr_obfuscator.csv_obfuscator import edit_block, edit_line
+from pytest import raises, mark
+
+
+def test_edit_block_returns_bytes():
+    output = edit_block(b"test1,test2,test3\n", [1])
+    assert isinstance(output, bytes)
+
+
+def test_edit_block_can_replace_columns_in_every_row():
+    block = b"a1,b1,c1,d1\na2,b2,c2,d2\n"
+    output = edit_block(block, [1, 3])
+    assert output == b"a1,***,c1,***\na2,***,c2,***\n"
+
+
+def test_edit_block_leaves_columns_after_the_last_pii_column_untouched():
+    block = b"a1,b1,c1,d1,e1\n"
+    output = edit_block(block, [0])
+    assert output == b"***,b1,c1,d1,e1\n"
+
+
+def test_edit_block_adds_a_new_line_to_a_final_row_without_one():
+    assert edit_block(b"a1,b1\na2,b2", [0]) == b"***,b1\n***,b2\n"
+
+
+@mark.parametrize(
+    "line",
+    [
+        "test1,test2,test3\n",
+        "  test1,test2,test3  \n",
+        "\ttest1, test2 ,test3\n",
+        "test1,test2,test3",
+        "\n",
+        "test1,,test3\n",
+        "test1,test2,test3,test4,test5,test6\n",
+        "café,naïve,über\n",
+        " test1,test2,test3 \n",
+        "test1,test2,test3 \n",
+        "\x1ctest1,test2,test3\x1f\n",
+    ],
+)
+@mark.parametrize("col_nums", [[], [0], [2], [0, 2]])
+def test_edit_block_matches_edit_line(line, col_nums):
+    if line == "\n" and col_nums not in ([], [0]):
+        return
+    expected = edit_line(line, col_nums).encode("utf-8")
+    assert edit_block(line.encode("utf-8"), col_nums) == expected
+
+
+def test_edit_block_raises_index_error_for_short_rows_like_edit_line():
+    with raises(IndexError):
+        edit_line("test1\n", [1])
+    with raises(IndexError):
+        edit_block(b"test1,test2\ntest1\n", [1])
+
+
+def test_edit_block_treats_a_quoted_field_as_one_column():
+    block = b'1,"Simpson, Bart",bart@email.com\n2,"Lisa",lisa@email.com\n'
+    output = edit_block(block, [2])
+    assert output == b'1,"Simpson, Bart",***\n2,"Lisa",***\n'
+    output = edit_block(block, [1])
+    assert output == b"1,***,bart@email.com\n2,***,lisa@email.com\n"
+
+
+def test_edit_block_handles_quoted_fields_containing_new_lines():
+    block = b'1,"line one\nline, two",bart@email.com\n2,"Lisa",lisa@email.com\n'
+    output = edit_block(block, [2])
+    assert output == b'1,"line one\nline, two",***\n2,"Lisa",***\n'
+
+
+@mark.parametrize(
+    "line",
+    [
+        '1,"a,b",3\n',
+        '"he said ""hi""",2,3\n',
+        '1,2,"x\ny"\n',
+        '1,"a,b\n',
+        'a"b,c,"d,e"\n',
+    ],
+)
+@mark.parametrize("col_nums", [[], [0], [1], [0, 2]])
+def test_edit_block_matches_edit_line_for_quoted_rows(line, col_nums):
+    expected = edit_line(line, col_nums).encode("utf-8")
+    assert edit_block(line.encode("utf-8"), col_nums) == expected
@@ -0,0 +1,64 @@
+from gdpr_obfuscator.csv_obfuscator import edit_block_numpy, edit_line
+from pytest import importorskip, raises, mark
+
+importorskip("numpy")
+
+
+def test_edit_block_numpy_returns_bytes():
+    output = edit_block_numpy(b"test1,test2,test3\n", [1])
+    assert isinstance(output, bytes)
+
+
+def test_edit_block_numpy_can_replace_columns_in_every_row():
+    block = b"a1,b1,c1,d1\na2,b2,c2,d2\n"
+    output = edit_block_numpy(block, [1, 3])
+    assert output == b"a1,***,c1,***\na2,***,c2,***\n"
+
+
+def test_edit_block_numpy_leaves_columns_after_the_last_pii_column_untouched():
+    block = b"a1,b1,c1,d1,e1\n"
+    output = edit_block_numpy(block, [0])
+    assert output == b"***,b1,c1,d1,e1\n"
+
+
+def test_edit_block_numpy_adds_a_new_line_to_a_final_row_without_one():
+    assert edit_block_numpy(b"a1,b1\na2,b2", [0]) == b"***,b1\n***,b2\n"
+
+
+@mark.parametrize(
+    "line",
+    [
+        "test1,test2,test3\n",
+        "  test1,test2,test3  \n",
+        "\ttest1, test2 ,test3\n",
+        "test1,test2,test3",
+        "\n",
+        "test1,,test3\n",
+        "test1,test2,test3,test4,test5,test6\n",
+        "café,naïve,über\n",
+        " test1,test2,test3 \n",
+        "test1,test2,test3 \n",
+        "\x1ctest1,test2,test3\x1f\n",
+    ],
+)
+@mark.parametrize("col_nums", [[], [0], [2], [0, 2]])
+def test_edit_block_numpy_matches_edit_line(line, col_nums):
+    if line == "\n" and col_nums not in ([], [0]):
+        return
+    expected = edit_line(line, col_nums).encode("utf-8")
+    assert edit_block_numpy(line.encode("utf-8"), col_nums) == expected
+
+
+def test_edit_block_numpy_handles_many_columns_and_rows():
+    row = ",".join(f"c{i}" for i in range(300)) + "\n"
+    expected = row.replace("c0,", "***,").replace(",c150,", ",***,")
+    expected = expected.replace(",c299\n", ",***\n")
+    output = edit_block_numpy((row * 1000).encode("utf-8"), [0, 150, 299])
+    assert output == (expected * 1000).encode("utf-8")
+
+
+def test_edit_block_numpy_raises_index_error_for_short_rows_like_edit_line():
+    with raises(IndexError):
+        edit_line("test1\n", [1])
+    with raises(IndexError):
+        edit_block_numpy(b"test1,test2\ntest1\n", [1])
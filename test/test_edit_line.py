@@ -1,4 +1,5 @@
-from src.gdpr_obfuscator import edit_line
+from gdpr_obfuscator.strategies import drop_value
+from gdpr_obfuscator.csv_obfuscator import edit_line
 
 
 def test_edit_line_returns_a_str():
@@ -34,3 +35,15 @@ def test_edit_line_ends_with_a_new_line_character():
     test_nums = [1]
     output = edit_line(test_line, test_nums)
     assert output[-1] == "\n"
+
+
+def test_edit_line_applies_the_mask_of_each_column():
+    masks = (str.upper, lambda value: value + ", Jr")
+    output = edit_line('"te""st1",test2,test3\n', [0, 2], masks)
+    assert output == '"TE""ST1",test2,"test3, Jr"\n'
+
+
+def test_edit_line_removes_dropped_columns():
+    masks = (drop_value, str.upper)
+    output = edit_line("test1,test2,test3\n", [0, 1], masks)
+    assert output == "TEST2,test3\n"
@@ -0,0 +1,72 @@
+from gdpr_obfuscator import emit_emf_metrics
+from io import StringIO
+import json
+
+REPORT = {
+    "file": "s3://bucket/key.csv",
+    "format": "csv",
+    "succeeded": True,
+    "duration": 2.0,
+    "stages": {"preflight": 0.1, "fetch": 0.5, "obfuscate": 1.0, "upload": 0.4},
+    "bytes_in": 1000,
+    "bytes_out": 800,
+    "rows": 10,
+    "rows_per_second": 5.0,
+}
+
+
+def test_emit_emf_metrics_writes_one_json_line():
+    stream = StringIO()
+    emit_emf_metrics(REPORT, stream=stream)
+    output = stream.getvalue()
+    assert output.endswith("\n")
+    assert output.count("\n") == 1
+    json.loads(output)
+
+
+def test_emit_emf_metrics_declares_every_metric_with_a_unit():
+    stream = StringIO()
+    emit_emf_metrics(REPORT, stream=stream)
+    line = json.loads(stream.getvalue())
+    directive = line["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == "GdprObfuscator"
+    assert directive["Dimensions"] == [["Format"]]
+    units = {metric["Name"]: metric["Unit"] for metric in directive["Metrics"]}
+    assert units == {
+        "PreflightTime": "Milliseconds",
+        "FetchTime": "Milliseconds",
+        "ObfuscateTime": "Milliseconds",
+        "UploadTime": "Milliseconds",
+        "Duration": "Milliseconds",
+        "BytesIn": "Bytes",
+        "BytesOut": "Bytes",
+        "Rows": "Count",
+        "RowsPerSecond": "Count/Second",
+    }
+    for name in units:
+        assert name in line
+    assert isinstance(line["_aws"]["Timestamp"], int)
+
+
+def test_emit_emf_metrics_converts_seconds_to_milliseconds():
+    stream = StringIO()
+    emit_emf_metrics(REPORT, stream=stream)
+    line = json.loads(stream.getvalue())
+    assert line["FetchTime"] == 500
+    assert line["Duration"] == 2000
+    assert line["Rows"] == 10
+    assert line["Format"] == "csv"
+    assert line["File"] == "s3://bucket/key.csv"
+    assert line["Succeeded"] is True
+
+
+def test_emit_emf_metrics_uses_the_given_namespace():
+    stream = StringIO()
+    emit_emf_metrics(REPORT, namespace="Custom", stream=stream)
+    line = json.loads(stream.getvalue())
+    assert line["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "Custom"
+
+
+def test_emit_emf_metrics_writes_to_stdout_by_default(capsys):
+    emit_emf_metrics(REPORT)
+    assert json.loads(capsys.readouterr().out)["Rows"] == 10
@@ -1,4 +1,4 @@
-from src.gdpr_obfuscator import extract_bucket_key
+from gdpr_obfuscator.storage import extract_bucket_key
 
 
 from pytest import raises
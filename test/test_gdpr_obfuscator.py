@@ -1,42 +1,32 @@
-from src.gdpr_obfuscator import gdpr_obfuscator, csv_string_to_list
+from gdpr_obfuscator import (
+    Pseudonymiser,
+    SpoolingBuffer,
+    gdpr_obfuscator,
+    memory_objects,
+    obfuscate_sharded,
+    summarise_profile,
+)
+from gdpr_obfuscator.csv_obfuscator import edit_block_numpy
 from io import BytesIO
+import bz2
+import gzip
 import json
-from boto3 import client
 from botocore.exceptions import ClientError
-from os import environ, getenv, path
-import time
-from pytest import raises, fixture, mark
-from moto import mock_aws
+from os import environ, listdir, path
+from pytest import fixture, importorskip, raises, mark
 from unittest.mock import patch
+import zstandard
 
 
-@fixture(scope="function")
-def aws_credentials():
-    environ["AWS_ACCESS_KEY_ID"] = "test"
-    environ["AWS_SECRET_ACCESS_KEY"] = "test"
-    environ["AWS_SECURITY_TOKEN"] = "test"
-    environ["AWS_SESSION_TOKEN"] = "test"
-    environ["AWS_DEFAULT_REGION"] = "eu-west-2"
-
-
-@fixture(scope="function")
-def s3_client(aws_credentials):
-    with mock_aws():
-        yield client("s3", region_name="eu-west-2")
-
-
-@fixture(autouse=True)
-def patch_s3_client(s3_client):
-    with patch("src.gdpr_obfuscator.s3_client", s3_client):
-        yield
+pytestmark = mark.usefixtures("s3_client")
 
 
 @fixture(scope="function")
 def patch_obfuscators():
     with (
-        patch("src.gdpr_obfuscator.obfuscate_csv") as mock_csv,
-        patch("src.gdpr_obfuscator.obfuscate_jsonl") as mock_jsonl,
-        patch("src.gdpr_obfuscator.obfuscate_json") as mock_json,
+        patch("gdpr_obfuscator.events.obfuscate_csv") as mock_csv,
+        patch("gdpr_obfuscator.events.obfuscate_jsonl") as mock_jsonl,
+        patch("gdpr_obfuscator.events.obfuscate_json") as mock_json,
     ):
         yield mock_csv, mock_jsonl, mock_json
 
@@ -167,7 +157,7 @@ class TestGdprObfuscatorRaisesErrorsCorrectly:
             gdpr_obfuscator(event2)
         assert (
             str(err.value)
-            == "event must contain only the keys {'pii_fields', 'file_to_obfuscate'}"
+            == "event must contain the keys {'pii_fields', 'file_to_obfuscate'}"
         )
 
         event3 = {
@@ -177,10 +167,7 @@ class TestGdprObfuscatorRaisesErrorsCorrectly:
         }
         with raises(TypeError) as err:
             gdpr_obfuscator(event3)
-        assert (
-            str(err.value)
-            == "event must contain only the keys {'pii_fields', 'file_to_obfuscate'}"
-        )
+        assert str(err.value) == "event contains unsupported keys ['Incorrect Key']"
 
         event4 = {
             "file_to_obfuscate": [],
@@ -206,6 +193,15 @@ class TestGdprObfuscatorRaisesErrorsCorrectly:
             gdpr_obfuscator(event6)
         assert str(err.value) == "pii_fields value must be a list of strings"
 
+        event7 = {
+            "file_to_obfuscate": "s3://valid-bucket/valid-key.csv",
+            "pii_fields": ["email"],
+            "destination": ["s3://valid-bucket/output.csv"],
+        }
+        with raises(TypeError) as err:
+            gdpr_obfuscator(event7)
+        assert str(err.value) == "destination value must be a string"
+
     def test_gdpr_obfuscator_raises_client_error_when_bucket_doesnt_exist(self):
         event = {"file_to_obfuscate": "s3://bad-bucket/key.csv", "pii_fields": []}
         with raises(ClientError) as err:
@@ -272,70 +268,947 @@ class TestGdprObfuscatorRaisesErrorsCorrectly:
         assert str(err.value) == "target file must be a csv or json"
 
 
-@mark.skipif(getenv("CI") == "true", reason="Skipped in CI environment")
-class TestGdprObfuscatorMeetsPerformanceAndNoneFunctionalCriteria:
-    @mark.skipif(getenv("TEST_TYPE") != "csv", reason="Skipped unless TEST_TYPE=csv")
-    def test_runtime_of_gdpr_obfuscator_is_less_than_one_minute_for_one_mb_of_csv_data(
-        self,
-        s3_setup,
+class TestGdprObfuscatorDestinationMode:
+    def test_gdpr_obfuscator_writes_small_output_to_the_destination(
+        self, s3_setup, s3_client
     ):
         bucket = "test-bucket"
         key = "test-key.csv"
-        csv_content = "test-data/test_csv.csv"
-        s3_setup(bucket, key, csv_content, True)
-
-        with open("test-data/test_csv.csv", "r", encoding="utf-8") as f:
-            heading_string = f.readline()
-        headings = csv_string_to_list(heading_string)
-        event = {"file_to_obfuscate": f"s3://{bucket}/{key}", "pii_fields": headings}
-        t1 = time.time()
-        gdpr_obfuscator(event)
-        t2 = time.time()
-        assert t2 - t1 <= 60
-
-    @mark.skipif(
-        getenv("TEST_TYPE") != "jsonl", reason="Skipped unless TEST_TYPE=jsonl"
-    )
-    def test_runtime_of_gdpr_obfuscator_is_less_than_one_minute_for_one_mb_of_jsonl_data(
-        self,
-        s3_setup,
+        csv_content = "age,email,name\n31,fake@email.com,Fake Namington\n"
+        s3_setup(bucket, key, csv_content)
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email", "name"],
+            "destination": f"s3://{bucket}/output/{key}",
+        }
+
+        output = gdpr_obfuscator(event)
+
+        assert output["Bucket"] == bucket
+        assert output["Key"] == f"output/{key}"
+        result = s3_client.get_object(Bucket=bucket, Key=f"output/{key}")
+        assert result["Body"].read() == b"age,email,name\n31,***,***\n"
+
+    def test_gdpr_obfuscator_streams_large_output_as_a_multipart_upload(
+        self, s3_setup, s3_client
     ):
         bucket = "test-bucket"
-        key = "test-key.jsonl"
-        jsonl_content = "test-data/test_jsonl.jsonl"
-        s3_setup(bucket, key, jsonl_content, True)
-
-        with open("test-data/test_jsonl.jsonl", "r", encoding="utf-8") as f:
-            first_line = json.loads(f.readline())
-        keys_list = list(first_line.keys())
-        event = {"file_to_obfuscate": f"s3://{bucket}/{key}", "pii_fields": keys_list}
-        t1 = time.time()
-        gdpr_obfuscator(event)
-        t2 = time.time()
-        assert t2 - t1 <= 60
+        key = "test-key.csv"
+        row = "31,fake@email.com,Fake Namington\n"
+        rows = (9 * 1024 * 1024) // len("31,***,Fake Namington\n")
+        s3_setup(bucket, key, "age,email,name\n" + row * rows)
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "destination": f"s3://{bucket}/output/{key}",
+        }
+
+        with patch.object(
+            s3_client, "put_object", wraps=s3_client.put_object
+        ) as mock_put:
+            gdpr_obfuscator(event)
+        mock_put.assert_not_called()
 
-    @mark.skipif(getenv("TEST_TYPE") != "json", reason="Skipped unless TEST_TYPE=json")
-    def test_runtime_of_gdpr_obfuscator_is_less_than_one_minute_for_one_mb_of_json_data(
-        self,
-        s3_setup,
+        result = s3_client.get_object(Bucket=bucket, Key=f"output/{key}")
+        expected = b"age,email,name\n" + b"31,***,Fake Namington\n" * rows
+        assert result["Body"].read() == expected
+
+    def test_gdpr_obfuscator_aborts_the_upload_when_obfuscation_fails(
+        self, s3_setup, s3_client
     ):
         bucket = "test-bucket"
-        key = "test-key.json"
-        jsonl_content = "test-data/test_json.json"
-        s3_setup(bucket, key, jsonl_content, True)
+        key = "test-key.csv"
+        row = "31,fake@email.com,Fake Namington\n"
+        rows = (9 * 1024 * 1024) // len("31,***,Fake Namington\n")
+        s3_setup(bucket, key, "age,email,name\n" + row * rows + "31\n")
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "destination": f"s3://{bucket}/output/{key}",
+        }
+
+        with (
+            patch.object(
+                s3_client,
+                "abort_multipart_upload",
+                wraps=s3_client.abort_multipart_upload,
+            ) as mock_abort,
+            raises(IndexError),
+        ):
+            gdpr_obfuscator(event)
+        mock_abort.assert_called_once()
+
+        uploads = s3_client.list_multipart_uploads(Bucket=bucket)
+        assert "Uploads" not in uploads
+        objects = s3_client.list_objects_v2(Bucket=bucket, Prefix="output/")
+        assert objects["KeyCount"] == 0
 
+    def test_gdpr_obfuscator_raises_value_error_with_invalid_destination(
+        self, s3_setup
+    ):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "age,email\n31,fake@email.com\n")
         event = {
             "file_to_obfuscate": f"s3://{bucket}/{key}",
-            "pii_fields": ["id", "text"],
+            "pii_fields": ["email"],
+            "destination": "output.csv",
         }
-        t1 = time.time()
-        gdpr_obfuscator(event)
-        t2 = time.time()
-        assert t2 - t1 <= 60
+        with raises(ValueError) as err:
+            gdpr_obfuscator(event)
+        assert str(err.value) == "Invalid S3 URI: output.csv"
+
 
+class TestGdprObfuscatorMeetsNoneFunctionalCriteria:
     def test_module_size_doesnt_exceed_lambda_regulations(self):
-        file_path = "src/gdpr_obfuscator.py"
+        package = "gdpr_obfuscator"
         max_size_bytes = 250 * 1024 * 1024
 
-        size = path.getsize(file_path)
+        size = sum(
+            path.getsize(path.join(package, name))
+            for name in listdir(package)
+            if name.endswith(".py")
+        )
         assert size < max_size_bytes
+
+
+class TestGdprObfuscatorShardedMode:
+    def test_gdpr_obfuscator_uses_sharded_obfuscation_for_csv_files(self, s3_setup):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "age,email\n31,fake@email.com\n")
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "shard_workers": 1,
+        }
+        with patch(
+            "gdpr_obfuscator.handler.obfuscate_sharded",
+            wraps=obfuscate_sharded,
+        ) as mock_sharded:
+            output = gdpr_obfuscator(event)
+
+        mock_sharded.assert_called_once()
+        assert output.read() == b"age,email\n31,***\n"
+
+    def test_gdpr_obfuscator_ignores_shard_workers_for_json_files(
+        self, s3_setup, patch_obfuscators
+    ):
+        bucket = "test-bucket"
+        key = "test-key.json"
+        s3_setup(bucket, key, "[]")
+        _, _, mock_json = patch_obfuscators
+        mock_json.return_value = BytesIO(b"[]")
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": [],
+            "shard_workers": 4,
+        }
+        assert gdpr_obfuscator(event).read() == b"[]"
+        mock_json.assert_called_once()
+
+    def test_gdpr_obfuscator_raises_type_error_with_invalid_shard_workers(self):
+        event = {
+            "file_to_obfuscate": "s3://valid-bucket/valid-key.csv",
+            "pii_fields": [],
+            "shard_workers": 0,
+        }
+        with raises(TypeError) as err:
+            gdpr_obfuscator(event)
+        assert str(err.value) == "shard_workers value must be a positive integer"
+
+
+class TestGdprObfuscatorPreflightCheck:
+    def test_gdpr_obfuscator_rejects_missing_csv_fields_before_downloading(
+        self, s3_setup, s3_client
+    ):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "age,email\n" + "31,fake@email.com\n" * 1000)
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email", "phone"],
+        }
+        with patch.object(
+            s3_client, "get_object", wraps=s3_client.get_object
+        ) as mock_get:
+            with raises(ValueError) as err:
+                gdpr_obfuscator(event)
+        assert str(err.value) == "The pii_fields '{'phone'}' not found in headers."
+        assert all("Range" in call.kwargs for call in mock_get.call_args_list)
+
+    def test_gdpr_obfuscator_rejects_missing_jsonl_fields_before_uploading(
+        self, s3_setup, s3_client
+    ):
+        bucket = "test-bucket"
+        key = "test-key.jsonl"
+        s3_setup(bucket, key, '{"age": 31, "email": "fake@email.com"}\n')
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["name"],
+            "destination": f"s3://{bucket}/output.jsonl",
+        }
+        with patch("gdpr_obfuscator.events.obfuscate_jsonl") as mock_jsonl:
+            with raises(ValueError) as err:
+                gdpr_obfuscator(event)
+        assert str(err.value) == "The pii_field 'name' not found in headers."
+        mock_jsonl.assert_not_called()
+        assert "Contents" not in s3_client.list_objects_v2(
+            Bucket=bucket, Prefix="output"
+        )
+
+    def test_gdpr_obfuscator_passes_validate_first_record_only_to_jsonl(
+        self, s3_setup, patch_obfuscators
+    ):
+        bucket = "test-bucket"
+        key = "test-key.jsonl"
+        s3_setup(bucket, key, '{"email": "fake@email.com"}\n')
+        _, mock_jsonl, _ = patch_obfuscators
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "validate_first_record_only": True,
+        }
+        gdpr_obfuscator(event)
+        assert mock_jsonl.call_args.kwargs == {"validate_first_record_only": True}
+
+    def test_gdpr_obfuscator_raises_type_error_with_invalid_validate_flag(self):
+        event = {
+            "file_to_obfuscate": "s3://valid-bucket/valid-key.jsonl",
+            "pii_fields": [],
+            "validate_first_record_only": "yes",
+        }
+        with raises(TypeError) as err:
+            gdpr_obfuscator(event)
+        assert str(err.value) == "validate_first_record_only value must be a boolean"
+
+
+class TestGdprObfuscatorMetrics:
+    def test_gdpr_obfuscator_reports_metrics_for_each_format(self, s3_setup, s3_client):
+        bucket = "test-bucket"
+        files = {
+            "test-key.csv": "age,email\n31,fake@email.com\n32,other@email.com\n",
+            "test-key.jsonl": '{"email": "a@b.com"}\n{"email": "c@d.com"}\n',
+            "test-key.json": '[{"email": "a@b.com"}, {"email": "c@d.com"}]',
+        }
+        s3_setup(bucket, "test-key.csv", files["test-key.csv"])
+        for key, content in files.items():
+            s3_client.put_object(Bucket=bucket, Key=key, Body=content.encode("utf-8"))
+
+        for key, content in files.items():
+            reports = []
+            event = {
+                "file_to_obfuscate": f"s3://{bucket}/{key}",
+                "pii_fields": ["email"],
+            }
+            output = gdpr_obfuscator(event, metrics_sink=reports.append)
+
+            assert len(reports) == 1
+            report = reports[0]
+            assert report["file"] == f"s3://{bucket}/{key}"
+            assert report["format"] == key.split(".")[-1]
+            assert report["succeeded"] is True
+            assert report["bytes_in"] == len(content)
+            assert report["bytes_out"] == len(output.getvalue())
+            assert report["rows"] == 2
+            assert set(report["stages"]) == {
+                "preflight",
+                "fetch",
+                "obfuscate",
+                "upload",
+            }
+            assert report["stages"]["upload"] == 0
+            assert sum(report["stages"].values()) <= report["duration"] + 1e-6
+            assert report["rows_per_second"] > 0
+
+    def test_gdpr_obfuscator_reports_upload_metrics_with_a_destination(self, s3_setup):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "age,email\n31,fake@email.com\n")
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "destination": f"s3://{bucket}/output.csv",
+        }
+        reports = []
+        gdpr_obfuscator(event, metrics_sink=reports.append)
+
+        report = reports[0]
+        assert report["bytes_out"] == len(b"age,email\n31,***\n")
+        assert report["rows"] == 1
+        assert report["stages"]["upload"] > 0
+
+    def test_gdpr_obfuscator_reports_metrics_when_obfuscation_fails(self, s3_setup):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "age,email\n31,fake@email.com\n")
+        event = {"file_to_obfuscate": f"s3://{bucket}/{key}", "pii_fields": ["name"]}
+        reports = []
+        with raises(ValueError):
+            gdpr_obfuscator(event, metrics_sink=reports.append)
+        assert reports[0]["succeeded"] is False
+
+    def test_gdpr_obfuscator_reports_rows_of_sharded_files(self, s3_setup):
+        bucket = "test-bucket"
+        key = "test-key.jsonl"
+        content = '{"email": "a@b.com"}\n' * 5
+        s3_setup(bucket, key, content)
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "shard_workers": 1,
+        }
+        reports = []
+        gdpr_obfuscator(event, metrics_sink=reports.append)
+        assert reports[0]["rows"] == 5
+        assert reports[0]["bytes_in"] == len(content)
+
+
+class TestGdprObfuscatorProfiling:
+    def test_gdpr_obfuscator_attaches_a_profile_to_the_output(self, s3_setup):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "age,email\n31,fake@email.com\n")
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "profile": True,
+        }
+        output = gdpr_obfuscator(event)
+        assert output.getvalue() == b"age,email\n31,***\n"
+        assert "obfuscate_csv" in summarise_profile(
+            output.profile, pattern="gdpr_obfuscator"
+        )
+
+    def test_gdpr_obfuscator_uploads_the_profile_next_to_the_destination(
+        self, s3_setup, s3_client
+    ):
+        bucket = "test-bucket"
+        key = "test-key.jsonl"
+        s3_setup(bucket, key, '{"email": "a@b.com"}\n')
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "destination": f"s3://{bucket}/output.jsonl",
+            "profile": True,
+        }
+        result = gdpr_obfuscator(event)
+        assert result["ProfileKey"] == "output.jsonl.prof"
+        profile = s3_client.get_object(Bucket=bucket, Key="output.jsonl.prof")
+        summary = summarise_profile(profile["Body"].read(), pattern="gdpr_obfuscator")
+        assert "obfuscate_jsonl" in summary
+
+    def test_gdpr_obfuscator_profiles_when_the_environment_variable_is_set(
+        self, s3_setup
+    ):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "age,email\n31,fake@email.com\n")
+        event = {"file_to_obfuscate": f"s3://{bucket}/{key}", "pii_fields": ["email"]}
+        with patch.dict(environ, {"GDPR_OBFUSCATOR_PROFILE": "1"}):
+            output = gdpr_obfuscator(event)
+        assert hasattr(output, "profile")
+
+    def test_gdpr_obfuscator_does_not_profile_by_default(self, s3_setup, s3_client):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "age,email\n31,fake@email.com\n")
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "destination": f"s3://{bucket}/output.csv",
+        }
+        with patch.dict(environ, {"GDPR_OBFUSCATOR_PROFILE": ""}):
+            result = gdpr_obfuscator(event)
+        assert "ProfileKey" not in result
+        keys = [
+            obj["Key"] for obj in s3_client.list_objects_v2(Bucket=bucket)["Contents"]
+        ]
+        assert "output.csv.prof" not in keys
+
+    def test_gdpr_obfuscator_raises_type_error_with_invalid_profile_flag(self):
+        event = {
+            "file_to_obfuscate": "s3://valid-bucket/valid-key.csv",
+            "pii_fields": [],
+            "profile": "yes",
+        }
+        with raises(TypeError) as err:
+            gdpr_obfuscator(event)
+        assert str(err.value) == "profile value must be a boolean"
+
+
+class TestGdprObfuscatorPseudonymisation:
+    def test_gdpr_obfuscator_pseudonymises_with_the_key_from_the_environment(
+        self, s3_setup
+    ):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "age,email\n31,fake@email.com\n")
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "pseudonymise": True,
+        }
+        with patch.dict(environ, {"GDPR_OBFUSCATOR_PSEUDONYM_KEY": "secret"}):
+            output = gdpr_obfuscator(event)
+        token = Pseudonymiser(b"secret")("fake@email.com")
+        assert output.getvalue() == f"age,email\n31,{token}\n".encode("utf-8")
+
+    def test_gdpr_obfuscator_raises_value_error_without_a_pseudonym_key(self, s3_setup):
+        bucket = "test-bucket"
+        key = "test-key.jsonl"
+        s3_setup(bucket, key, '{"email": "fake@email.com"}\n')
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "pseudonymise": True,
+        }
+        with patch.dict(environ, {"GDPR_OBFUSCATOR_PSEUDONYM_KEY": ""}):
+            with raises(ValueError) as err:
+                gdpr_obfuscator(event)
+        assert "GDPR_OBFUSCATOR_PSEUDONYM_KEY" in str(err.value)
+
+    def test_gdpr_obfuscator_raises_type_error_with_invalid_pseudonymise_flag(self):
+        event = {
+            "file_to_obfuscate": "s3://valid-bucket/valid-key.csv",
+            "pii_fields": [],
+            "pseudonymise": 1,
+        }
+        with raises(TypeError) as err:
+            gdpr_obfuscator(event)
+        assert str(err.value) == "pseudonymise value must be a boolean"
+
+
+class TestGdprObfuscatorStrategies:
+    def test_gdpr_obfuscator_applies_the_strategies_in_the_event(self, s3_setup):
+        bucket = "test-bucket"
+        key = "test-key.csv"
+        s3_setup(bucket, key, "name,card,email\nFake,4111111111111111,a@b.com\n")
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["name", "card", "email"],
+            "strategies": {"name": "drop", "card": "keep_last:4"},
+        }
+        output = gdpr_obfuscator(event)
+        assert output.getvalue() == b"card,email\n************1111,***\n"
+
+    def test_gdpr_obfuscator_raises_value_error_with_an_unknown_strategy(
+        self, s3_setup
+    ):
+        bucket = "test-bucket"
+        key = "test-key.jsonl"
+        s3_setup(bucket, key, '{"email": "fake@email.com"}\n')
+        event = {
+            "file_to_obfuscate": f"s3://{bucket}/{key}",
+            "pii_fields": ["email"],
+            "strategies": {"email": "scramble"},
+        }
+        with raises(ValueError):
+            gdpr_obfuscator(event)
+
+    def test_gdpr_obfuscator_raises_type_error_with_invalid_strategies(self):
+        event = {
+            "file_to_obfuscate": "s3://valid-bucket/valid-key.csv",
+            "pii_fields": ["email"],
+            "strategies": {"email": 4},
+        }
+        with raises(TypeError) as err:
+            gdpr_obfuscator(event)
+        assert str(err.value) == "strategies value must be a dict of strings"
+
+
+class TestGdprObfuscatorCompression:
+    csv_content = b"age,email\n31,fake@email.com\n44,Skinner@email.com\n"
+    expected = b"age,email\n31,***\n44,***\n"
+
+    def test_gdpr_obfuscator_decompresses_input_by_key_suffix(
+        self, s3_setup, s3_client
+    ):
+        s3_setup("test-bucket", "test-key.csv.gz", "")
+        s3_client.put_object(
+            Bucket="test-bucket",
+            Key="test-key.csv.gz",
+            Body=gzip.compress(self.csv_content),
+        )
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv.gz",
+            "pii_fields": ["email"],
+        }
+        assert gdpr_obfuscator(event).getvalue() == self.expected
+
+    def test_gdpr_obfuscator_decompresses_zstd_jsonl(self, s3_setup, s3_client):
+        body = b'{"email": "fake@email.com", "age": 31}\n' * 3
+        s3_setup("test-bucket", "test-key.jsonl.zst", "")
+        s3_client.put_object(
+            Bucket="test-bucket",
+            Key="test-key.jsonl.zst",
+            Body=zstandard.ZstdCompressor().compress(body),
+        )
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.jsonl.zst",
+            "pii_fields": ["email"],
+        }
+        output = gdpr_obfuscator(event)
+        assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+            {"email": "***", "age": 31}
+        ] * 3
+
+    def test_gdpr_obfuscator_detects_compressed_input_by_magic_bytes(
+        self, s3_setup, s3_client
+    ):
+        s3_setup("test-bucket", "test-key.csv", "")
+        s3_client.put_object(
+            Bucket="test-bucket",
+            Key="test-key.csv",
+            Body=bz2.compress(self.csv_content),
+        )
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+        }
+        assert gdpr_obfuscator(event).getvalue() == self.expected
+
+    def test_gdpr_obfuscator_compresses_output_by_destination_suffix(
+        self, s3_setup, s3_client
+    ):
+        s3_setup("test-bucket", "test-key.csv", self.csv_content.decode("utf-8"))
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "destination": "s3://test-bucket/output/test-key.csv.gz",
+        }
+        gdpr_obfuscator(event)
+        body = s3_client.get_object(Bucket="test-bucket", Key="output/test-key.csv.gz")[
+            "Body"
+        ].read()
+        assert gzip.decompress(body) == self.expected
+
+    def test_gdpr_obfuscator_compresses_returned_output(self, s3_setup):
+        s3_setup("test-bucket", "test-key.csv", self.csv_content.decode("utf-8"))
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "output_compression": "bz2",
+        }
+        output = gdpr_obfuscator(event)
+        assert bz2.decompress(output.read()) == self.expected
+
+    def test_gdpr_obfuscator_does_not_shard_compressed_input(self, s3_setup, s3_client):
+        s3_setup("test-bucket", "test-key.csv.gz", "")
+        s3_client.put_object(
+            Bucket="test-bucket",
+            Key="test-key.csv.gz",
+            Body=gzip.compress(self.csv_content),
+        )
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv.gz",
+            "pii_fields": ["email"],
+            "shard_workers": 2,
+        }
+        with patch("gdpr_obfuscator.handler.obfuscate_sharded") as mock_sharded:
+            output = gdpr_obfuscator(event)
+        mock_sharded.assert_not_called()
+        assert output.getvalue() == self.expected
+
+    def test_gdpr_obfuscator_raises_type_error_with_invalid_output_compression(self):
+        event = {
+            "file_to_obfuscate": "s3://valid-bucket/valid-key.csv",
+            "pii_fields": [],
+            "output_compression": "zip",
+        }
+        with raises(TypeError) as err:
+            gdpr_obfuscator(event)
+        assert (
+            str(err.value)
+            == "output_compression value must be one of ['gzip', 'zstd', 'bz2']"
+        )
+
+
+class TestGdprObfuscatorParquet:
+    def put_parquet(self, s3_setup, s3_client, key):
+        pa = importorskip("pyarrow")
+        pq = importorskip("pyarrow.parquet")
+        table = pa.table({"age": [31, 44], "email": ["a@email.com", "b@email.com"]})
+        body = BytesIO()
+        pq.write_table(table, body, row_group_size=1)
+        s3_setup("test-bucket", key, "")
+        s3_client.put_object(Bucket="test-bucket", Key=key, Body=body.getvalue())
+        return pq
+
+    def test_gdpr_obfuscator_obfuscates_parquet_files(self, s3_setup, s3_client):
+        pq = self.put_parquet(s3_setup, s3_client, "test-key.parquet")
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.parquet",
+            "pii_fields": ["email"],
+        }
+        result = pq.read_table(gdpr_obfuscator(event)).to_pydict()
+        assert result == {"age": [31, 44], "email": ["***", "***"]}
+
+    def test_gdpr_obfuscator_streams_parquet_to_destination_without_sharding(
+        self, s3_setup, s3_client
+    ):
+        pq = self.put_parquet(s3_setup, s3_client, "test-key.parquet")
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.parquet",
+            "pii_fields": ["email"],
+            "destination": "s3://test-bucket/output/test-key.parquet",
+            "shard_workers": 2,
+        }
+        with patch("gdpr_obfuscator.handler.obfuscate_sharded") as mock_sharded:
+            gdpr_obfuscator(event)
+        mock_sharded.assert_not_called()
+        body = s3_client.get_object(
+            Bucket="test-bucket", Key="output/test-key.parquet"
+        )["Body"].read()
+        parquet_file = pq.ParquetFile(BytesIO(body))
+        assert parquet_file.metadata.num_row_groups == 2
+        assert parquet_file.read().column("email").to_pylist() == ["***", "***"]
+
+
+class TestGdprObfuscatorPipeline:
+    csv_content = "age,email\n" + "31,fake@email.com\n" * 50_000
+
+    def test_gdpr_obfuscator_pipelined_output_matches_the_plain_run(
+        self, s3_setup, s3_client
+    ):
+        s3_setup("test-bucket", "test-key.csv", self.csv_content)
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "destination": "s3://test-bucket/output/test-key.csv",
+        }
+        gdpr_obfuscator({**event, "destination": "s3://test-bucket/plain.csv"})
+        gdpr_obfuscator({**event, "pipeline_depth": 2})
+        body = s3_client.get_object(Bucket="test-bucket", Key="output/test-key.csv")[
+            "Body"
+        ].read()
+        plain = s3_client.get_object(Bucket="test-bucket", Key="plain.csv")["Body"]
+        assert body == plain.read()
+        assert body.startswith(b"age,email\n31,***\n")
+
+    def test_gdpr_obfuscator_pipelines_compressed_output_and_reports_metrics(
+        self, s3_setup, s3_client
+    ):
+        s3_setup("test-bucket", "test-key.csv", self.csv_content)
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "destination": "s3://test-bucket/output/test-key.csv.gz",
+            "pipeline_depth": 4,
+        }
+        reports = []
+        gdpr_obfuscator(event, metrics_sink=reports.append)
+        body = s3_client.get_object(Bucket="test-bucket", Key="output/test-key.csv.gz")[
+            "Body"
+        ].read()
+        assert gzip.decompress(body) == ("age,email\n" + "31,***\n" * 50_000).encode(
+            "utf-8"
+        )
+        report = reports[0]
+        assert report["bytes_in"] == len(self.csv_content)
+        assert report["bytes_out"] == len(body)
+        assert sum(report["stages"].values()) <= report["duration"] + 1e-6
+
+    def test_gdpr_obfuscator_pipeline_aborts_the_upload_when_it_fails(
+        self, s3_setup, s3_client
+    ):
+        s3_setup("test-bucket", "test-key.csv", self.csv_content)
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "destination": "s3://test-bucket/output/test-key.csv",
+            "pipeline_depth": 2,
+        }
+        with patch(
+            "gdpr_obfuscator.storage.S3MultipartWriter.write",
+            side_effect=ConnectionError("upload failed"),
+        ):
+            with raises(ConnectionError):
+                gdpr_obfuscator(event)
+        listing = s3_client.list_objects_v2(Bucket="test-bucket", Prefix="output/")
+        assert "Contents" not in listing
+
+    def test_gdpr_obfuscator_raises_type_error_with_invalid_pipeline_depth(self):
+        for depth in (0, "2", 1.5):
+            event = {
+                "file_to_obfuscate": "s3://valid-bucket/valid-key.csv",
+                "pii_fields": [],
+                "pipeline_depth": depth,
+            }
+            with raises(TypeError) as err:
+                gdpr_obfuscator(event)
+            assert str(err.value) == "pipeline_depth value must be a positive integer"
+
+
+class TestGdprObfuscatorLocalFiles:
+    csv_content = "age,email\n" + "31,fake@email.com\n" * 1000
+
+    def test_gdpr_obfuscator_reads_a_local_file_uri(self, tmp_path):
+        source = tmp_path / "test-key.csv"
+        source.write_text(self.csv_content)
+        event = {"file_to_obfuscate": f"file://{source}", "pii_fields": ["email"]}
+        result = gdpr_obfuscator(event)
+        assert result.read() == ("age,email\n" + "31,***\n" * 1000).encode()
+
+    def test_gdpr_obfuscator_does_not_treat_plain_paths_as_local_files(self, tmp_path):
+        source = tmp_path / "test-key.csv"
+        source.write_text(self.csv_content)
+        for key in ("file_to_obfuscate", "destination"):
+            event = {
+                "file_to_obfuscate": f"file://{source}",
+                "pii_fields": ["email"],
+                key: str(source),
+            }
+            with raises(ValueError) as err:
+                gdpr_obfuscator(event)
+            assert str(err.value) == f"Invalid S3 URI: {source}"
+
+    def test_gdpr_obfuscator_writes_a_local_destination(self, tmp_path):
+        source = tmp_path / "test-key.jsonl.gz"
+        source.write_bytes(gzip.compress(b'{"email": "a@b.com", "age": 31}\n' * 10))
+        destination = tmp_path / "output" / "test-key.jsonl"
+        event = {
+            "file_to_obfuscate": f"file://{source}",
+            "pii_fields": ["email"],
+            "destination": f"file://{destination}",
+            "pipeline_depth": 2,
+        }
+        assert gdpr_obfuscator(event) == {"Path": str(destination)}
+        assert destination.read_bytes() == b'{"email": "***", "age": 31}\n' * 10
+        assert [p.name for p in destination.parent.iterdir()] == ["test-key.jsonl"]
+
+    def test_gdpr_obfuscator_leaves_no_local_file_when_it_fails(self, tmp_path):
+        source = tmp_path / "test-key.csv"
+        source.write_text(self.csv_content)
+        event = {
+            "file_to_obfuscate": f"file://{source}",
+            "pii_fields": ["email"],
+            "destination": f"file://{tmp_path}/output.csv",
+        }
+        with patch(
+            "gdpr_obfuscator.storage.LocalFileWriter.write",
+            side_effect=OSError("disk full"),
+        ):
+            with raises(OSError):
+                gdpr_obfuscator(event)
+        assert [p.name for p in tmp_path.iterdir()] == ["test-key.csv"]
+
+    def test_gdpr_obfuscator_shards_and_checks_a_local_file(self, tmp_path):
+        source = tmp_path / "test-key.csv"
+        source.write_text(self.csv_content)
+        event = {
+            "file_to_obfuscate": f"file://{source}",
+            "pii_fields": ["email"],
+            "shard_workers": 1,
+        }
+        result = gdpr_obfuscator(event)
+        assert result.read() == ("age,email\n" + "31,***\n" * 1000).encode()
+        with raises(ValueError):
+            gdpr_obfuscator({**event, "pii_fields": ["name"]})
+
+    def test_gdpr_obfuscator_reads_and_writes_parquet_files_locally(self, tmp_path):
+        pa = importorskip("pyarrow")
+        pq = importorskip("pyarrow.parquet")
+        source = tmp_path / "test-key.parquet"
+        pq.write_table(pa.table({"email": ["a@b.com"] * 3, "age": [1, 2, 3]}), source)
+        destination = tmp_path / "output.parquet"
+        event = {
+            "file_to_obfuscate": f"file://{source}",
+            "pii_fields": ["email"],
+            "destination": f"file://{destination}",
+        }
+        gdpr_obfuscator(event)
+        table = pq.read_table(destination)
+        assert table.column("email").to_pylist() == ["***"] * 3
+        assert table.column("age").to_pylist() == [1, 2, 3]
+
+    def test_gdpr_obfuscator_reads_and_writes_memory_objects(self):
+        memory_objects["input/test-key.csv"] = self.csv_content.encode()
+        event = {
+            "file_to_obfuscate": "memory://input/test-key.csv",
+            "pii_fields": ["email"],
+            "destination": "memory://output/test-key.csv",
+            "profile": True,
+        }
+        try:
+            result = gdpr_obfuscator(event)
+            assert result == {
+                "Key": "output/test-key.csv",
+                "ProfileKey": "output/test-key.csv.prof",
+            }
+            assert (
+                memory_objects["output/test-key.csv"]
+                == ("age,email\n" + "31,***\n" * 1000).encode()
+            )
+            assert "output/test-key.csv.prof" in memory_objects
+        finally:
+            memory_objects.clear()
+
+    def test_gdpr_obfuscator_raises_for_missing_local_and_memory_files(self, tmp_path):
+        for uri in (f"file://{tmp_path}/missing.csv", "memory://missing.csv"):
+            event = {"file_to_obfuscate": uri, "pii_fields": ["email"]}
+            with raises(FileNotFoundError):
+                gdpr_obfuscator(event)
+
+
+class TestGdprObfuscatorSpooling:
+    csv_content = "age,email\n" + "31,fake@email.com\n" * 10_000
+    expected = ("age,email\n" + "31,***\n" * 10_000).encode("utf-8")
+
+    def test_gdpr_obfuscator_returns_an_in_memory_spooling_buffer(self, s3_setup):
+        s3_setup("test-bucket", "test-key.csv", self.csv_content)
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+        }
+        output = gdpr_obfuscator(event)
+        assert isinstance(output, SpoolingBuffer)
+        assert not output.spilled
+        assert output.read() == self.expected
+
+    def test_gdpr_obfuscator_spills_output_over_the_spool_threshold(
+        self, s3_setup, s3_client
+    ):
+        s3_setup("test-bucket", "test-key.csv", self.csv_content)
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "spool_threshold": 1024,
+        }
+        reports = []
+        output = gdpr_obfuscator(event, metrics_sink=reports.append)
+        assert output.spilled
+        assert output.tell() == 0
+        assert reports[0]["bytes_out"] == len(self.expected)
+        s3_client.put_object(Bucket="test-bucket", Key="output.csv", Body=output)
+        body = s3_client.get_object(Bucket="test-bucket", Key="output.csv")["Body"]
+        assert body.read() == self.expected
+
+    def test_gdpr_obfuscator_spills_compressed_output(self, s3_setup):
+        s3_setup("test-bucket", "test-key.csv", self.csv_content)
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "output_compression": "gzip",
+            "spool_threshold": 0,
+        }
+        output = gdpr_obfuscator(event)
+        assert output.spilled
+        assert gzip.decompress(output.read()) == self.expected
+
+    def test_gdpr_obfuscator_raises_type_error_with_invalid_spool_threshold(self):
+        for threshold in (-1, "1024", 1.5):
+            event = {
+                "file_to_obfuscate": "s3://valid-bucket/valid-key.csv",
+                "pii_fields": [],
+                "spool_threshold": threshold,
+            }
+            with raises(TypeError) as err:
+                gdpr_obfuscator(event)
+            assert (
+                str(err.value) == "spool_threshold value must be a non-negative integer"
+            )
+
+
+class TestGdprObfuscatorJsonCodec:
+    def test_gdpr_obfuscator_uses_the_standard_library_by_default(self, s3_setup):
+        s3_setup("test-bucket", "test-key.jsonl", '{"id":1,"email":"a@b.com"}\n')
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.jsonl",
+            "pii_fields": ["email"],
+        }
+        output = gdpr_obfuscator(event)
+        assert output.getvalue() == b'{"id": 1, "email": "***"}\n'
+
+    def test_gdpr_obfuscator_uses_orjson_when_the_event_asks_for_it(self, s3_setup):
+        importorskip("orjson")
+        s3_setup("test-bucket", "test-key.jsonl", '{"id":1,"email":"a@b.com"}\n')
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.jsonl",
+            "pii_fields": ["email"],
+            "json_codec": "orjson",
+        }
+        output = gdpr_obfuscator(event)
+        assert output.getvalue() == b'{"id":1,"email":"***"}\n'
+
+    def test_gdpr_obfuscator_passes_the_json_codec_to_sharded_runs(self, s3_setup):
+        importorskip("orjson")
+        s3_setup("test-bucket", "test-key.jsonl", '{"id":1,"email":"a@b.com"}\n')
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.jsonl",
+            "pii_fields": ["email"],
+            "json_codec": "orjson",
+            "shard_workers": 1,
+        }
+        output = gdpr_obfuscator(event)
+        assert output.getvalue() == b'{"id":1,"email":"***"}\n'
+
+    def test_gdpr_obfuscator_raises_type_error_with_an_invalid_json_codec(self):
+        event = {
+            "file_to_obfuscate": "s3://valid-bucket/valid-key.jsonl",
+            "pii_fields": [],
+            "json_codec": "ujson",
+        }
+        with raises(TypeError) as err:
+            gdpr_obfuscator(event)
+        assert str(err.value) == "json_codec value must be one of ['orjson', 'json']"
+
+
+class TestGdprObfuscatorCsvEngine:
+    csv = "id,email,name\n1,a@b.com,Ann\n2,c@d.com,Bob\n"
+    expected = b"id,email,name\n1,***,Ann\n2,***,Bob\n"
+
+    def test_gdpr_obfuscator_uses_the_numpy_engine_when_the_event_asks_for_it(
+        self, s3_setup
+    ):
+        importorskip("numpy")
+        s3_setup("test-bucket", "test-key.csv", self.csv)
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "csv_engine": "numpy",
+        }
+        with patch(
+            "gdpr_obfuscator.csv_obfuscator.edit_block_numpy", wraps=edit_block_numpy
+        ) as edit:
+            output = gdpr_obfuscator(event)
+        edit.assert_called()
+        assert output.getvalue() == self.expected
+
+    def test_gdpr_obfuscator_passes_the_csv_engine_to_sharded_runs(self, s3_setup):
+        importorskip("numpy")
+        s3_setup("test-bucket", "test-key.csv", self.csv)
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "csv_engine": "numpy",
+            "shard_workers": 1,
+        }
+        with patch(
+            "gdpr_obfuscator.csv_obfuscator.edit_block_numpy", wraps=edit_block_numpy
+        ) as edit:
+            output = gdpr_obfuscator(event)
+        edit.assert_called()
+        assert output.getvalue() == self.expected
+
+    def test_gdpr_obfuscator_can_use_the_text_engine(self, s3_setup):
+        s3_setup("test-bucket", "test-key.csv", self.csv)
+        event = {
+            "file_to_obfuscate": "s3://test-bucket/test-key.csv",
+            "pii_fields": ["email"],
+            "csv_engine": "text",
+        }
+        assert gdpr_obfuscator(event).getvalue() == self.expected
+
+    def test_gdpr_obfuscator_raises_type_error_with_an_invalid_csv_engine(self):
+        event = {
+            "file_to_obfuscate": "s3://valid-bucket/valid-key.csv",
+            "pii_fields": [],
+            "csv_engine": "pandas",
+        }
+        with raises(TypeError) as err:
+            gdpr_obfuscator(event)
+        assert (
+            str(err.value)
+            == "csv_engine value must be one of ['bytes', 'text', 'numpy']"
+        )
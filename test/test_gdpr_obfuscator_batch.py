@@ -0,0 +1,77 @@
+from gdpr_obfuscator import gdpr_obfuscator_batch
+from boto3 import client
+from botocore.exceptions import ClientError
+import json
+from pytest import mark
+from unittest.mock import patch
+
+
+pytestmark = mark.usefixtures("test_bucket")
+
+
+def test_gdpr_obfuscator_batch_returns_a_result_per_event_in_order(s3_client):
+    events = []
+    for i in range(20):
+        key = f"file-{i}.csv"
+        body = f"id,email\n{i},person{i}@email.com\n".encode("utf-8")
+        s3_client.put_object(Bucket="test-bucket", Key=key, Body=body)
+        events.append(
+            {"file_to_obfuscate": f"s3://test-bucket/{key}", "pii_fields": ["email"]}
+        )
+
+    results = gdpr_obfuscator_batch(events, max_workers=4)
+
+    assert [result["event"] for result in results] == events
+    for i, result in enumerate(results):
+        assert result["error"] is None
+        assert result["result"].read() == f"id,email\n{i},***\n".encode("utf-8")
+
+
+def test_gdpr_obfuscator_batch_reports_errors_without_stopping_the_batch(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="good.csv", Body=b"a,email\n1,x\n")
+    events = [
+        {"file_to_obfuscate": "s3://test-bucket/missing.csv", "pii_fields": []},
+        {"file_to_obfuscate": "s3://test-bucket/good.csv", "pii_fields": ["email"]},
+        {"file_to_obfuscate": "s3://test-bucket/good.csv", "pii_fields": ["phone"]},
+        "not an event",
+    ]
+
+    results = gdpr_obfuscator_batch(events, max_workers=2)
+
+    assert isinstance(results[0]["error"], ClientError)
+    assert results[0]["result"] is None
+    assert results[1]["error"] is None
+    assert results[1]["result"].read() == b"a,email\n1,***\n"
+    assert isinstance(results[2]["error"], ValueError)
+    assert isinstance(results[3]["error"], TypeError)
+
+
+def test_gdpr_obfuscator_batch_uploads_to_each_destination(s3_client):
+    events = []
+    for i in range(5):
+        key = f"file-{i}.jsonl"
+        body = f'{{"id": {i}, "email": "person{i}@email.com"}}\n'.encode("utf-8")
+        s3_client.put_object(Bucket="test-bucket", Key=key, Body=body)
+        events.append(
+            {
+                "file_to_obfuscate": f"s3://test-bucket/{key}",
+                "pii_fields": ["email"],
+                "destination": f"s3://test-bucket/output/{key}",
+            }
+        )
+
+    results = gdpr_obfuscator_batch(events)
+
+    for i, result in enumerate(results):
+        assert result["result"]["Key"] == f"output/file-{i}.jsonl"
+        output = s3_client.get_object(
+            Bucket="test-bucket", Key=f"output/file-{i}.jsonl"
+        )
+        assert json.loads(output["Body"].read()) == {"id": i, "email": "***"}
+
+
+def test_gdpr_obfuscator_batch_sizes_the_connection_pool_to_the_workers(s3_client):
+    with patch("boto3.client", wraps=client) as mock_client:
+        gdpr_obfuscator_batch([], max_workers=12)
+    config = mock_client.call_args.kwargs["config"]
+    assert config.max_pool_connections == 12
@@ -0,0 +1,28 @@
+from gdpr_obfuscator.csv_obfuscator import (
+    edit_block,
+    edit_block_numpy,
+    get_block_editor,
+)
+from pytest import importorskip, raises
+from unittest.mock import patch
+
+
+def test_get_block_editor_edits_bytes_with_edit_block():
+    assert get_block_editor("bytes") is edit_block
+    assert get_block_editor("text") is edit_block
+
+
+def test_get_block_editor_uses_numpy_for_the_numpy_engine():
+    importorskip("numpy")
+    assert get_block_editor("numpy") is edit_block_numpy
+
+
+def test_get_block_editor_falls_back_to_edit_block_without_numpy():
+    with patch.dict("sys.modules", {"numpy": None}):
+        assert get_block_editor("numpy") is edit_block
+
+
+def test_get_block_editor_raises_value_error_for_an_unknown_engine():
+    with raises(ValueError) as err:
+        get_block_editor("pandas")
+    assert str(err.value) == "engine must be one of ['bytes', 'text', 'numpy']"
@@ -1,6 +1,6 @@
 from pytest import raises
 
-from src.gdpr_obfuscator import get_col_nums
+from gdpr_obfuscator.csv_obfuscator import get_col_nums
 
 
 def test_get_col_nums_returns_a_list():
@@ -83,3 +83,10 @@ def test_get_col_nums_raises_value_error_if_pii_field_inst_in_headers_list():
         str(err.value)
         == "The pii_fields '{'im not a header, sue me'}' not found in headers."
     )
+
+
+def test_get_col_nums_matches_quoted_headers():
+    test_header = ['"name"', '"email, work"', 'say ""hi""', '"say ""hi"""']
+    test_pii_fields = ["name", "email, work", 'say "hi"']
+    output = get_col_nums(test_header, test_pii_fields)
+    assert output == [0, 1, 3]
@@ -0,0 +1,54 @@
+from gdpr_obfuscator import get_json_codec
+from unittest.mock import patch
+from pytest import importorskip, raises
+
+
+def test_get_json_codec_json_matches_json_dumps():
+    codec = get_json_codec("json")
+    assert codec.name == "json"
+    assert codec.dumps({"a": [1, "é"]}) == b'{"a": [1, "\\u00e9"]}'
+    assert codec.loads(b'{"a": 1}') == {"a": 1}
+    assert codec.item_separator == b", "
+    assert codec.key_separator == b": "
+
+
+def test_get_json_codec_defaults_to_json_even_when_orjson_is_installed():
+    assert get_json_codec().name == "json"
+
+
+def test_get_json_codec_returns_orjson_when_asked_for():
+    importorskip("orjson")
+    codec = get_json_codec("orjson")
+    assert codec.name == "orjson"
+    assert codec.dumps({"a": [1, 2]}) == b'{"a":[1,2]}'
+    assert codec.item_separator == b","
+    assert codec.key_separator == b":"
+
+
+def test_get_json_codec_orjson_falls_back_to_json_for_values_it_would_change():
+    importorskip("orjson")
+    codec = get_json_codec("orjson")
+    record = codec.loads('{"id": 18446744073709551616, "n": -9223372036854775809}')
+    assert record == {"id": 18446744073709551616, "n": -9223372036854775809}
+    assert codec.dumps(record) == (
+        b'{"id": 18446744073709551616, "n": -9223372036854775809}'
+    )
+    record = codec.loads('{"a": NaN, "b": -Infinity}')
+    assert codec.dumps(record) == b'{"a": NaN, "b": -Infinity}'
+    assert codec.dumps({"id": 2**64}) == b'{"id": 18446744073709551616}'
+
+
+def test_get_json_codec_falls_back_to_json_without_orjson():
+    get_json_codec.cache_clear()
+    try:
+        with patch.dict("sys.modules", {"orjson": None}):
+            assert get_json_codec().name == "json"
+            assert get_json_codec("orjson").name == "json"
+    finally:
+        get_json_codec.cache_clear()
+
+
+def test_get_json_codec_raises_error_for_an_unknown_codec():
+    with raises(ValueError) as err:
+        get_json_codec("ujson")
+    assert str(err.value) == "codec must be one of ['orjson', 'json']"
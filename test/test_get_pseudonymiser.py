@@ -0,0 +1,30 @@
+from gdpr_obfuscator import Pseudonymiser
+from gdpr_obfuscator.strategies import get_pseudonymiser
+from os import environ
+from pytest import raises
+from unittest.mock import patch
+
+
+def test_get_pseudonymiser_uses_the_key_from_the_environment():
+    with patch.dict(environ, {"GDPR_OBFUSCATOR_PSEUDONYM_KEY": "secret"}):
+        pseudonymiser = get_pseudonymiser()
+    assert pseudonymiser("value") == Pseudonymiser(b"secret")("value")
+
+
+def test_get_pseudonymiser_shares_one_instance_per_key():
+    with patch.dict(environ, {"GDPR_OBFUSCATOR_PSEUDONYM_KEY": "secret"}):
+        first = get_pseudonymiser()
+        second = get_pseudonymiser()
+    with patch.dict(environ, {"GDPR_OBFUSCATOR_PSEUDONYM_KEY": "other"}):
+        other = get_pseudonymiser()
+    assert first is second
+    assert other is not first
+
+
+def test_get_pseudonymiser_raises_error_without_a_key():
+    with patch.dict(environ, {"GDPR_OBFUSCATOR_PSEUDONYM_KEY": ""}):
+        with raises(ValueError) as err:
+            get_pseudonymiser()
+    assert str(err.value) == (
+        "pseudonymise requires the GDPR_OBFUSCATOR_PSEUDONYM_KEY environment variable"
+    )
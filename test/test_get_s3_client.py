@@ -0,0 +1,30 @@
+from gdpr_obfuscator import get_s3_client
+import subprocess
+import sys
+from unittest.mock import patch, sentinel
+
+
+def test_get_s3_client_returns_a_patched_client():
+    with patch("gdpr_obfuscator.storage.s3_client", sentinel.s3):
+        assert get_s3_client() is sentinel.s3
+
+
+def test_get_s3_client_creates_the_client_once_on_first_use():
+    with (
+        patch("gdpr_obfuscator.storage.s3_client", None),
+        patch("boto3.client", return_value=sentinel.s3) as mock_client,
+    ):
+        assert get_s3_client() is sentinel.s3
+        assert get_s3_client() is sentinel.s3
+    mock_client.assert_called_once_with("s3")
+
+
+def test_importing_the_package_does_not_import_boto3():
+    code = (
+        "import sys, gdpr_obfuscator; "
+        "print(sorted(m for m in ('boto3', 'botocore') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "[]"
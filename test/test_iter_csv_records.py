@@ -0,0 +1,27 @@
+from gdpr_obfuscator.csv_obfuscator import iter_csv_records, find_record_end
+
+
+def test_iter_csv_records_yields_lines_without_quotes_unchanged():
+    lines = ["a,b\n", "c,d\n"]
+    assert list(iter_csv_records(lines)) == ["a,b\n", "c,d\n"]
+
+
+def test_iter_csv_records_joins_lines_of_a_quoted_field():
+    lines = ['a,"b\n', "c\n", 'd",e\n', '"f",g\n']
+    assert list(iter_csv_records(lines)) == ['a,"b\nc\nd",e\n', '"f",g\n']
+
+
+def test_iter_csv_records_yields_an_unclosed_record_at_the_end():
+    lines = ["a,b\n", 'c,"d\n', "e"]
+    assert list(iter_csv_records(lines)) == ["a,b\n", 'c,"d\ne']
+
+
+def test_find_record_end_skips_new_lines_inside_quotes():
+    data = b'a,"b\nc",d\ne,f\n'
+    assert find_record_end(data) == 10
+    assert find_record_end(data, 10) == len(data)
+
+
+def test_find_record_end_returns_the_length_if_there_is_no_new_line():
+    assert find_record_end(b"a,b") == 3
+    assert find_record_end(b'a,"b\nc') == 6
@@ -0,0 +1,42 @@
+from gdpr_obfuscator.csv_obfuscator import iter_newline_blocks
+from io import BytesIO
+
+
+def test_iter_newline_blocks_yields_nothing_for_an_empty_body():
+    assert list(iter_newline_blocks(BytesIO(b""))) == []
+
+
+def test_iter_newline_blocks_only_cuts_blocks_after_a_new_line():
+    body = BytesIO(b"aaa\nbbbbbbb\ncc\nd")
+    blocks = list(iter_newline_blocks(body, block_size=5))
+    assert blocks == [b"aaa\n", b"bbbbbbb\ncc\n", b"d"]
+    assert b"".join(blocks) == b"aaa\nbbbbbbb\ncc\nd"
+
+
+def test_iter_newline_blocks_normalises_line_endings():
+    body = BytesIO(b"a\r\nb\rc\r\nd")
+    assert b"".join(iter_newline_blocks(body, block_size=2)) == b"a\nb\nc\nd"
+
+
+def test_iter_newline_blocks_keeps_a_crlf_split_across_reads_together():
+    body = BytesIO(b"ab\r\ncd\r\n")
+    blocks = list(iter_newline_blocks(body, block_size=3))
+    assert b"".join(blocks) == b"ab\ncd\n"
+
+
+def test_iter_newline_blocks_never_cuts_inside_a_quoted_field():
+    body = BytesIO(b'a,"b\nc\nd",e\nf,g\n')
+    blocks = list(iter_newline_blocks(body, block_size=3))
+    assert blocks == [b'a,"b\nc\nd",e\n', b"f,g\n"]
+
+
+def test_iter_newline_blocks_yields_an_unclosed_quoted_field_at_the_end():
+    body = BytesIO(b'a,b\nc,"d\ne')
+    blocks = list(iter_newline_blocks(body, block_size=4))
+    assert blocks == [b"a,b\n", b'c,"d\ne']
+
+
+def test_iter_newline_blocks_can_cut_at_every_new_line_for_json_lines():
+    body = BytesIO(b'{"a": "one \\" quote"}\n{"a": "b"}\n{"a": "c"}\n')
+    blocks = list(iter_newline_blocks(body, block_size=4, quoted=False))
+    assert blocks == [b'{"a": "one \\" quote"}\n', b'{"a": "b"}\n', b'{"a": "c"}\n']
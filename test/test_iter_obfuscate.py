@@ -0,0 +1,107 @@
+from gdpr_obfuscator import gdpr_obfuscator, iter_obfuscate
+import gzip
+import json
+from pytest import fixture, raises, mark
+from unittest.mock import patch
+
+
+pytestmark = mark.usefixtures("s3_client")
+
+
+@fixture
+def s3_setup(s3_client):
+    def _setup(key, body: bytes):
+        s3_client.create_bucket(
+            Bucket="test-bucket",
+            CreateBucketConfiguration={"LocationConstraint": "eu-west-2"},
+        )
+        s3_client.put_object(Bucket="test-bucket", Key=key, Body=body)
+        return {"file_to_obfuscate": f"s3://test-bucket/{key}", "pii_fields": []}
+
+    return _setup
+
+
+def make_csv(rows: int) -> bytes:
+    lines = ["id,email\n"] + [f"{i},person{i}@email.com\n" for i in range(rows)]
+    return "".join(lines).encode("utf-8")
+
+
+def test_iter_obfuscate_yields_the_same_bytes_as_gdpr_obfuscator(s3_setup):
+    event = s3_setup("test-key.csv", make_csv(1000))
+    event["pii_fields"] = ["email"]
+    expected = gdpr_obfuscator(event).getvalue()
+    assert b"".join(iter_obfuscate(event)) == expected
+
+
+def test_iter_obfuscate_yields_chunks_of_at_least_chunk_size(s3_setup):
+    body = json.dumps([{"email": "a@email.com"}] * 1000).encode("utf-8")
+    event = s3_setup("test-key.json", body)
+    event["pii_fields"] = ["email"]
+    with patch("gdpr_obfuscator.json_obfuscator.JSON_BATCH_RECORDS", 10):
+        chunks = list(iter_obfuscate(event, chunk_size=1000))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 1000 for chunk in chunks[:-1])
+    assert json.loads(b"".join(chunks)) == [{"email": "***"}] * 1000
+
+
+def test_iter_obfuscate_yields_before_the_body_has_been_read(s3_setup):
+    event = s3_setup("test-key.csv", make_csv(100_000))
+    event["pii_fields"] = ["email"]
+    read_sizes = []
+
+    def iter_blocks(body, block_size=1024):
+        while block := body.read(block_size):
+            read_sizes.append(len(block))
+            yield block
+
+    with patch("gdpr_obfuscator.csv_obfuscator.iter_newline_blocks", iter_blocks):
+        chunks = iter_obfuscate(event, chunk_size=1)
+        assert next(chunks).startswith(b"id,email\n")
+        assert sum(read_sizes) < 10_000
+        chunks.close()
+
+
+def test_iter_obfuscate_reads_ahead_with_pipeline_depth(s3_setup):
+    event = s3_setup("test-key.csv", make_csv(100_000))
+    event["pii_fields"] = ["email"]
+    expected = b"".join(iter_obfuscate(event))
+    assert b"".join(iter_obfuscate({**event, "pipeline_depth": 2})) == expected
+
+
+def test_iter_obfuscate_compresses_output(s3_setup):
+    event = s3_setup("test-key.csv.gz", gzip.compress(make_csv(10)))
+    event["pii_fields"] = ["email"]
+    event["output_compression"] = "gzip"
+    output = gzip.decompress(b"".join(iter_obfuscate(event)))
+    assert output == b"id,email\n" + b"".join(f"{i},***\n".encode() for i in range(10))
+
+
+def test_iter_obfuscate_yields_sharded_output(s3_setup):
+    event = s3_setup("test-key.csv", make_csv(1000))
+    event["pii_fields"] = ["email"]
+    event["shard_workers"] = 1
+    expected = gdpr_obfuscator({**event, "shard_workers": 2}).getvalue()
+    with patch("gdpr_obfuscator.sharding.DEFAULT_SHARD_SIZE", 1000):
+        assert b"".join(iter_obfuscate(event)) == expected
+
+
+def test_iter_obfuscate_checks_the_event_when_called(s3_setup):
+    event = s3_setup("test-key.csv", make_csv(10))
+    with raises(TypeError):
+        iter_obfuscate({"file_to_obfuscate": event["file_to_obfuscate"]})
+    with raises(ValueError) as err:
+        iter_obfuscate({**event, "pii_fields": ["phone"]})
+    assert str(err.value) == "The pii_fields '{'phone'}' not found in headers."
+    with raises(ValueError) as err:
+        iter_obfuscate(event, chunk_size=0)
+    assert str(err.value) == "chunk_size must be positive"
+
+
+def test_iter_obfuscate_can_be_written_to_a_local_file(s3_setup, tmp_path):
+    event = s3_setup("test-key.json", b'[{"email": "a@email.com", "age": 1}]')
+    event["pii_fields"] = ["email"]
+    output_path = tmp_path / "output.json"
+    with open(output_path, "wb") as output:
+        for chunk in iter_obfuscate(event):
+            output.write(chunk)
+    assert json.loads(output_path.read_bytes()) == [{"email": "***", "age": 1}]
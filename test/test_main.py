@@ -0,0 +1,196 @@
+from gdpr_obfuscator import InvocationMetrics, main, memory_objects
+from gdpr_obfuscator.cli import ProgressReporter, expand_inputs, output_uri
+from io import StringIO
+import json
+import os
+import subprocess
+import sys
+import time
+from pytest import raises, mark
+
+
+pytestmark = mark.usefixtures("test_bucket")
+
+
+CSV_CONTENT = "id,email\n" + "".join(f"{i},person{i}@email.com\n" for i in range(100))
+CSV_OUTPUT = "id,email\n" + "".join(f"{i},***\n" for i in range(100))
+
+
+def test_main_obfuscates_a_file_into_an_output_path(tmp_path, capsys):
+    (tmp_path / "data.csv").write_text(CSV_CONTENT)
+    output = tmp_path / "obfuscated.csv"
+    status = main(
+        [str(tmp_path / "data.csv"), "--pii-fields", "email", "--output", str(output)]
+    )
+    assert status == 0
+    assert output.read_text() == CSV_OUTPUT
+    assert "100% of" in capsys.readouterr().err
+
+
+def test_python_m_gdpr_obfuscator_runs_from_the_repository_root(tmp_path):
+    (tmp_path / "data.csv").write_text(CSV_CONTENT)
+    output = tmp_path / "obfuscated.csv"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+    subprocess.run(
+        [sys.executable, "-m", "gdpr_obfuscator", str(tmp_path / "data.csv")]
+        + ["--pii-fields", "email", "--output", str(output), "--quiet"],
+        cwd=root,
+        env=env,
+        check=True,
+    )
+    assert output.read_text() == CSV_OUTPUT
+
+
+def test_main_takes_the_input_and_output_from_an_event_file(tmp_path):
+    (tmp_path / "data.csv").write_text(CSV_CONTENT)
+    event = {
+        "file_to_obfuscate": str(tmp_path / "data.csv"),
+        "pii_fields": ["email"],
+        "destination": str(tmp_path / "obfuscated.csv"),
+    }
+    (tmp_path / "config.json").write_text(json.dumps(event))
+    assert main(["--event", str(tmp_path / "config.json"), "--quiet"]) == 0
+    assert (tmp_path / "obfuscated.csv").read_text() == CSV_OUTPUT
+
+    (tmp_path / "other.csv").write_text(CSV_CONTENT)
+    status = main(
+        [
+            str(tmp_path / "other.csv"),
+            "--event",
+            str(tmp_path / "config.json"),
+            "-o",
+            str(tmp_path / "other-out.csv"),
+            "-q",
+        ]
+    )
+    assert status == 0
+    assert (tmp_path / "other-out.csv").read_text() == CSV_OUTPUT
+
+
+def test_main_writes_globbed_inputs_into_an_output_directory(tmp_path):
+    for name in ("a.csv", "b.csv", "c.jsonl"):
+        (tmp_path / name).write_text(CSV_CONTENT)
+    status = main(
+        [
+            str(tmp_path / "*.csv"),
+            "--pii-fields",
+            "email",
+            "-o",
+            str(tmp_path / "out"),
+            "--workers",
+            "2",
+            "-q",
+        ]
+    )
+    assert status == 0
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["a.csv", "b.csv"]
+    assert (tmp_path / "out" / "b.csv").read_text() == CSV_OUTPUT
+
+
+def test_main_reads_s3_globs(tmp_path, s3_client):
+    for key in ("exports/a.csv", "exports/b.csv", "other/c.csv"):
+        s3_client.put_object(Bucket="test-bucket", Key=key, Body=CSV_CONTENT)
+    pattern = "s3://test-bucket/exports/*.csv"
+    status = main([pattern, "--pii-fields", "email", "-o", "memory://out/"])
+    try:
+        assert status == 0
+        assert memory_objects == {
+            "out/a.csv": CSV_OUTPUT.encode(),
+            "out/b.csv": CSV_OUTPUT.encode(),
+        }
+    finally:
+        memory_objects.clear()
+
+
+def test_main_reports_failed_files_and_carries_on(tmp_path, capsys):
+    (tmp_path / "a.csv").write_text("id,name\n1,x\n")
+    (tmp_path / "b.csv").write_text(CSV_CONTENT)
+    status = main(
+        [
+            str(tmp_path / "a.csv"),
+            str(tmp_path / "b.csv"),
+            "--pii-fields",
+            "email",
+            "-o",
+            str(tmp_path / "out"),
+            "-q",
+        ]
+    )
+    assert status == 1
+    assert "a.csv: The pii_fields" in capsys.readouterr().err
+    assert [p.name for p in (tmp_path / "out").iterdir()] == ["b.csv"]
+
+
+def test_main_exits_with_usage_errors(tmp_path, capsys):
+    for argv in (
+        ["data.csv", "-o", "out.csv"],
+        ["--pii-fields", "email", "-o", "out.csv"],
+        ["data.csv", "--pii-fields", "email"],
+        ["data.csv", "--pii-fields", "email", "-o", "out.csv", "--workers", "0"],
+    ):
+        with raises(SystemExit) as err:
+            main(argv)
+        assert err.value.code == 2
+    assert main([str(tmp_path / "*.csv"), "--pii-fields", "email", "-o", "x/"]) == 1
+    assert "No files match" in capsys.readouterr().err
+
+
+def test_expand_inputs_keeps_plain_inputs_and_expands_globs(tmp_path):
+    (tmp_path / "a.csv").write_text("")
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "b.csv").write_text("")
+    memory_objects.update({"x/1.json": b"", "x/2.json": b"", "y/3.json": b""})
+    try:
+        assert expand_inputs(
+            ["file://missing.csv", f"file://{tmp_path}/**/*.csv", "memory://x/*.json"]
+        ) == [
+            "file://missing.csv",
+            f"file://{tmp_path}/a.csv",
+            f"file://{tmp_path}/nested/b.csv",
+            "memory://x/1.json",
+            "memory://x/2.json",
+        ]
+    finally:
+        memory_objects.clear()
+
+
+def test_output_uri_joins_the_input_name_to_the_directory():
+    assert output_uri("out", "s3://bucket/a/b.csv") == "out/b.csv"
+    assert output_uri("s3://bucket/out/", "data/b.csv") == "s3://bucket/out/b.csv"
+    assert output_uri("memory://out", "b.csv") == "memory://out/b.csv"
+
+
+def test_progress_reporter_summarises_a_run():
+    metrics = InvocationMetrics("data.csv")
+    stream = StringIO()
+    with ProgressReporter(metrics, 2 * 1024 * 1024, stream):
+        metrics.bytes_in = 1024 * 1024
+        metrics.rows = 1234
+    line = stream.getvalue()
+    assert line.startswith("data.csv: 50% of 2.0 MB, ")
+    assert "1,234 rows" in line
+    assert line.endswith("\n")
+
+
+def test_progress_reporter_writes_nothing_for_a_failed_run():
+    stream = StringIO()
+    with raises(RuntimeError):
+        with ProgressReporter(InvocationMetrics("data.csv"), 10, stream):
+            raise RuntimeError("failed")
+    assert stream.getvalue() == ""
+
+
+def test_progress_reporter_redraws_a_status_line_on_a_terminal():
+    class Terminal(StringIO):
+        def isatty(self):
+            return True
+
+    metrics = InvocationMetrics("data.csv")
+    stream = Terminal()
+    with ProgressReporter(metrics, 100, stream, interval=0.01):
+        metrics.bytes_in = 25
+        time.sleep(0.1)
+    lines = stream.getvalue().split("\r\x1b[K")
+    assert "data.csv: 25% of 0.0 MB" in lines[1]
+    assert lines[-1].endswith("\n")
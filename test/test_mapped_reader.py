@@ -0,0 +1,93 @@
+from gdpr_obfuscator import MappedReader
+from gdpr_obfuscator.compression import open_decompressed
+from gdpr_obfuscator.csv_obfuscator import iter_newline_blocks
+import gzip
+from io import SEEK_END
+from pytest import raises
+
+
+def test_mapped_reader_returns_the_whole_file(tmp_path):
+    path = tmp_path / "data.bin"
+    data = bytes(range(256)) * 1000
+    path.write_bytes(data)
+    reader = MappedReader(str(path))
+    assert reader.read() == data
+    assert reader.read() == b""
+    assert reader.read(10) == b""
+
+
+def test_mapped_reader_returns_sized_reads_in_order(tmp_path):
+    path = tmp_path / "data.bin"
+    data = b"0123456789" * 100
+    path.write_bytes(data)
+    reader = MappedReader(str(path))
+    pieces = []
+    while piece := reader.read(64):
+        assert len(piece) <= 64
+        pieces.append(piece)
+    assert b"".join(pieces) == data
+
+
+def test_mapped_reader_seeks_and_reads_into_buffers(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"0123456789")
+    reader = MappedReader(str(path))
+    assert reader.seek(4) == 4
+    buffer = bytearray(3)
+    assert reader.readinto(buffer) == 3
+    assert buffer == b"456"
+    assert reader.tell() == 7
+    assert reader.seek(-2, SEEK_END) == 8
+    assert reader.read() == b"89"
+    with raises(ValueError):
+        reader.seek(-1)
+
+
+def test_mapped_reader_reads_an_empty_file(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_bytes(b"")
+    reader = MappedReader(str(path))
+    assert reader.read() == b""
+    assert reader.getbuffer().nbytes == 0
+
+
+def test_mapped_reader_works_with_iter_newline_blocks(tmp_path):
+    path = tmp_path / "data.csv"
+    data = b"a,b\n" + b'1,"x\ny"\n' * 10000
+    path.write_bytes(data)
+    reader = MappedReader(str(path))
+    assert b"".join(iter_newline_blocks(reader, block_size=333)) == data
+
+
+def test_mapped_reader_is_rewound_after_detecting_compression(tmp_path):
+    path = tmp_path / "data.csv.gz"
+    path.write_bytes(gzip.compress(b"a,b\n1,2\n"))
+    assert open_decompressed(MappedReader(str(path))).read() == b"a,b\n1,2\n"
+    path = tmp_path / "data.csv"
+    path.write_bytes(b"a,b\n1,2\n")
+    reader = MappedReader(str(path))
+    assert open_decompressed(reader) is reader
+    assert reader.read() == b"a,b\n1,2\n"
+
+
+def test_mapped_reader_close_waits_for_views_to_be_released(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"0123456789")
+    reader = MappedReader(str(path))
+    view = reader.getbuffer()
+    reader.close()
+    assert reader.closed
+    assert bytes(view[2:5]) == b"234"
+    with raises(ValueError):
+        reader.read()
+    view.release()
+
+
+def test_mapped_reader_reads_copies_that_outlive_the_mapping(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"0123456789")
+    reader = MappedReader(str(path))
+    piece = reader.read(4)
+    reader.close()
+    assert type(piece) is bytes
+    assert piece == b"0123"
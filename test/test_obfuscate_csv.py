@@ -1,14 +1,22 @@
-from src.gdpr_obfuscator import obfuscate_csv
+from gdpr_obfuscator import (
+    InvocationMetrics,
+    Pseudonymiser,
+    SpoolingBuffer,
+    iter_obfuscate_csv,
+    obfuscate_csv,
+)
+from helpers import peak_memory_growth
 from io import BytesIO
-from pytest import raises
+from pytest import importorskip, raises
+from unittest.mock import patch
 
 
-def test_obfuscate_csv_returns_a_bytesio_object():
+def test_obfuscate_csv_returns_a_spooling_buffer():
     csv_content = "headers\ncontent\n"
     input_bytes = BytesIO(csv_content.encode("utf-8"))
     pii_fields = []
     output = obfuscate_csv(input_bytes, pii_fields)
-    assert isinstance(output, BytesIO)
+    assert isinstance(output, SpoolingBuffer)
 
 
 def test_obfuscate_csv_returns_the_same_contents_when_pii_fields_are_empty():
@@ -79,3 +87,203 @@ def test_obfuscate_csv_raises_error_if_pii_field_is_not_a_header():
     with raises(ValueError) as err:
         obfuscate_csv(input_bytes, pii_fields)
     assert str(err.value) == "The pii_fields '{'email'}' not found in headers."
+
+
+def test_obfuscate_csv_writes_into_the_given_output_buffer():
+    csv_content = "age,email\n31,fake@email.com\n"
+    input_bytes = BytesIO(csv_content.encode("utf-8"))
+    output_buffer = BytesIO()
+    output = obfuscate_csv(input_bytes, ["email"], output_buffer)
+    assert output is output_buffer
+    assert output.read() == b"age,email\n31,***\n"
+
+
+def test_obfuscate_csv_raises_error_for_an_unknown_engine():
+    input_bytes = BytesIO(b"age,email\n")
+    with raises(ValueError) as err:
+        obfuscate_csv(input_bytes, ["email"], engine="fast")
+    assert str(err.value) == "engine must be one of ['bytes', 'text', 'numpy']"
+
+
+def test_obfuscate_csv_bytes_engine_matches_the_text_engine():
+    csv_content = (
+        "age ,email,name\r\n"
+        + "31,fake@email.com,Fake Namington\r\n"
+        + "  10,bart@email.com,Bart Simpson  \n"
+        + "10,mil@email.com,Milhouse van Houten \r"
+        + "44,Skinner@email.com,Seymour Skïnner"
+    )
+    for pii_fields in ([], ["email"], ["age ", "name"]):
+        text_output = obfuscate_csv(
+            BytesIO(csv_content.encode("utf-8")), pii_fields, engine="text"
+        )
+        bytes_output = obfuscate_csv(
+            BytesIO(csv_content.encode("utf-8")), pii_fields, engine="bytes"
+        )
+        assert bytes_output.read() == text_output.read()
+
+
+def test_obfuscate_csv_bytes_engine_handles_many_blocks():
+    row = "31,fake@email.com,Fake Namington\n"
+    csv_content = "age,email,name\n" + row * 100000
+    output = obfuscate_csv(BytesIO(csv_content.encode("utf-8")), ["email"])
+    expected = "age,email,name\n" + "31,***,Fake Namington\n" * 100000
+    assert output.read() == expected.encode("utf-8")
+
+
+def test_obfuscate_csv_returns_a_header_without_a_new_line_unchanged():
+    for engine in ["bytes", "text", "numpy"]:
+        output = obfuscate_csv(BytesIO(b"age,email"), ["email"], engine=engine)
+        assert output.read() == b"age,email"
+
+
+def test_obfuscate_csv_numpy_engine_matches_the_text_engine():
+    importorskip("numpy")
+    csv_content = (
+        "age ,email,name\r\n"
+        + "31,fake@email.com,Fake Namington\r\n"
+        + "  10,bart@email.com,Bart Simpson  \n"
+        + "10,,Milhouse van Houten \r"
+        + "44,Skinner@email.com,Seymour Skïnner"
+    )
+    for pii_fields in ([], ["email"], ["age ", "name"]):
+        text_output = obfuscate_csv(
+            BytesIO(csv_content.encode("utf-8")), pii_fields, engine="text"
+        )
+        numpy_output = obfuscate_csv(
+            BytesIO(csv_content.encode("utf-8")), pii_fields, engine="numpy"
+        )
+        assert numpy_output.read() == text_output.read()
+
+
+def test_obfuscate_csv_numpy_engine_falls_back_without_numpy():
+    csv_content = b"age,email,name\n31,fake@email.com,Fake Namington\n"
+    with (
+        patch.dict("sys.modules", {"numpy": None}),
+        patch("gdpr_obfuscator.csv_obfuscator.edit_block_numpy") as edit_block_numpy,
+    ):
+        output = obfuscate_csv(BytesIO(csv_content), ["email"], engine="numpy")
+    edit_block_numpy.assert_not_called()
+    assert output.read() == b"age,email,name\n31,***,Fake Namington\n"
+
+
+def test_obfuscate_csv_handles_quoted_fields_in_every_engine():
+    csv_content = (
+        'id,"name",email\n'
+        + '1,"Simpson, Bart",bart@email.com\n'
+        + '2,"Lisa ""L"" Simpson",lisa@email.com\n'
+        + '3,"Maggie\nSimpson","maggie,baby@email.com"\n'
+    )
+    expected = 'id,"name",email\n' + "1,***,***\n" + "2,***,***\n" + "3,***,***\n"
+    for engine in ["bytes", "text", "numpy"]:
+        output = obfuscate_csv(
+            BytesIO(csv_content.encode("utf-8")), ["name", "email"], engine=engine
+        )
+        assert output.read() == expected.encode("utf-8")
+
+
+def test_obfuscate_csv_keeps_quoted_records_whole_across_blocks():
+    row = '31,"Namington,\nFake",fake@email.com\n'
+    csv_content = "age,name,email\n" + row * 100000
+    output = obfuscate_csv(BytesIO(csv_content.encode("utf-8")), ["email"])
+    expected = "age,name,email\n" + '31,"Namington,\nFake",***\n' * 100000
+    assert output.read() == expected.encode("utf-8")
+
+
+def test_obfuscate_csv_peak_memory_does_not_grow_with_input_size():
+    assert peak_memory_growth(obfuscate_csv, "csv") < 0.1
+
+
+def test_obfuscate_csv_counts_rows_in_every_engine():
+    csv_content = b"age,email\n31,a@b.com\n32,c@d.com\n33,e@f.com"
+    for engine in ("bytes", "text", "numpy"):
+        metrics = InvocationMetrics("s3://bucket/key.csv")
+        obfuscate_csv(BytesIO(csv_content), ["email"], engine=engine, metrics=metrics)
+        assert metrics.rows == 3
+
+
+def test_obfuscate_csv_pseudonymises_values_in_every_engine():
+    pseudonymiser = Pseudonymiser(b"secret")
+    csv_content = b'name,email\nFake,a@b.com\n"Fake, Jr",a@b.com\n"Fake, Jr",c@d.com\n'
+    expected = (
+        "name,email\n"
+        f"{pseudonymiser('Fake')},{pseudonymiser('a@b.com')}\n"
+        f"{pseudonymiser('Fake, Jr')},{pseudonymiser('a@b.com')}\n"
+        f"{pseudonymiser('Fake, Jr')},{pseudonymiser('c@d.com')}\n"
+    ).encode("utf-8")
+    for engine in ("bytes", "text", "numpy"):
+        output = obfuscate_csv(
+            BytesIO(csv_content),
+            ["name", "email"],
+            engine=engine,
+            pseudonymiser=pseudonymiser,
+        )
+        assert output.getvalue() == expected
+
+
+def test_obfuscate_csv_pseudonymises_only_the_pii_columns():
+    pseudonymiser = Pseudonymiser(b"secret")
+    csv_content = b"age,email,city\n31,a@b.com,Leeds\n"
+    output = obfuscate_csv(BytesIO(csv_content), ["email"], pseudonymiser=pseudonymiser)
+    assert output.getvalue() == (
+        f"age,email,city\n31,{pseudonymiser('a@b.com')},Leeds\n".encode("utf-8")
+    )
+
+
+def test_obfuscate_csv_applies_strategies_in_every_engine():
+    csv_content = (
+        b"id,name,email,card,dob\n"
+        b'1,"Fake, Jr",a@b.com,"4111,1111",1990-05-17\n'
+        b"2,Fake,c@d.com,5500,2001-12-01T10:00\n"
+    )
+    strategies = {
+        "name": "drop",
+        "email": "null",
+        "card": "keep_last:5",
+        "dob": "truncate_date:year",
+    }
+    expected = b'id,email,card,dob\n1,,"****,1111",1990-01-01\n2,,****,2001-01-01\n'
+    for engine in ("bytes", "text", "numpy"):
+        output = obfuscate_csv(
+            BytesIO(csv_content),
+            ["name", "email", "card", "dob"],
+            engine=engine,
+            strategies=strategies,
+        )
+        assert output.getvalue() == expected
+
+
+def test_obfuscate_csv_drops_the_first_and_last_columns():
+    csv_content = b"name,age,email\nFake,31,a@b.com\n"
+    strategies = {"name": "drop", "email": "drop"}
+    for engine in ("bytes", "text", "numpy"):
+        output = obfuscate_csv(
+            BytesIO(csv_content),
+            ["name", "email"],
+            engine=engine,
+            strategies=strategies,
+        )
+        assert output.getvalue() == b"age\n31\n"
+
+
+def test_iter_obfuscate_csv_yields_the_header_then_the_rows_of_obfuscate_csv():
+    csv_content = b"age,email\n" + b"31,fake@email.com\n" * 100
+    for engine in ("bytes", "text", "numpy"):
+        chunks = list(iter_obfuscate_csv(BytesIO(csv_content), ["email"], engine))
+        assert chunks[0] == b"age,email\n"
+        expected = obfuscate_csv(BytesIO(csv_content), ["email"], engine=engine)
+        assert b"".join(chunks) == expected.getvalue()
+
+
+def test_iter_obfuscate_csv_only_reads_the_body_as_far_as_it_is_consumed():
+    body = BytesIO(b"age,email\n" + b"31,fake@email.com\n" * 1_000_000)
+    chunks = iter_obfuscate_csv(body, ["email"])
+    next(chunks)
+    next(chunks)
+    assert body.tell() < len(body.getvalue()) // 2
+
+
+def test_iter_obfuscate_csv_raises_value_error_for_missing_pii_fields_on_first_chunk():
+    chunks = iter_obfuscate_csv(BytesIO(b"age,email\n31,a@b.com\n"), ["name"])
+    with raises(ValueError):
+        next(chunks)
@@ -1,16 +1,23 @@
-from src.gdpr_obfuscator import obfuscate_json
+from gdpr_obfuscator import (
+    Pseudonymiser,
+    SpoolingBuffer,
+    iter_obfuscate_json,
+    obfuscate_json,
+)
+from helpers import peak_memory_growth
+from unittest.mock import patch
 from io import BytesIO
 import json
-from pytest import raises
+from pytest import importorskip, raises
 
 
-def test_obfuscate_json_returns_a_bytesio_object():
+def test_obfuscate_json_returns_a_spooling_buffer():
     json_content = [{"headers": "content"}]
     json_str = json.dumps(json_content)
     input_bytes = BytesIO(json_str.encode("utf-8"))
     pii_fields = []
     output = obfuscate_json(input_bytes, pii_fields)
-    assert isinstance(output, BytesIO)
+    assert isinstance(output, SpoolingBuffer)
 
 
 def test_obfuscate_json_returns_the_same_contents_when_pii_fields_are_empty():
@@ -161,3 +168,166 @@ def test_obfuscate_json_raises_error_if_json_input_bytes_has_invalid_body():
     with raises(json.JSONDecodeError) as err:
         obfuscate_json(input_bytes, pii_fields)
     assert str(err.value) == "Expecting value: line 1 column 1 (char 0)"
+
+
+def test_obfuscate_json_matches_json_dumps_across_read_boundaries():
+    pii_fields = ["email"]
+    json_content = {
+        "first": [{"id": i, "email": f"{i}@email.com", "n": 1.5} for i in range(50)],
+        "second": [{"id": i, "email": "x", "n": 12345} for i in range(50)],
+    }
+    expected_content = {
+        key: [{**row, "email": "***"} for row in rows]
+        for key, rows in json_content.items()
+    }
+    input_bytes = BytesIO(json.dumps(json_content).encode("utf-8"))
+    with (
+        patch("gdpr_obfuscator.json_obfuscator.JSON_READ_SIZE", 7),
+        patch("gdpr_obfuscator.json_obfuscator.JSON_BATCH_RECORDS", 3),
+    ):
+        output = obfuscate_json(input_bytes, pii_fields)
+    assert output.read().decode("utf-8") == json.dumps(expected_content)
+
+
+def test_obfuscate_json_reads_a_number_cut_at_a_read_boundary():
+    json_bytes = b"[" + b",".join([b"1.2345e10"] * 20000) + b"]"
+    output = obfuscate_json(BytesIO(json_bytes), [])
+    assert json.loads(output.read()) == [1.2345e10] * 20000
+
+    json_content = [1.2345e10, -0.5, 12345, 1e-7, {"n": -6.25e3}]
+    for read_size in range(1, 12):
+        input_bytes = BytesIO(json.dumps(json_content).encode("utf-8"))
+        with patch("gdpr_obfuscator.json_obfuscator.JSON_READ_SIZE", read_size):
+            output = obfuscate_json(input_bytes, [])
+        assert json.loads(output.read()) == json_content
+
+
+def test_obfuscate_json_accepts_pretty_printed_json_with_a_bom():
+    pii_fields = ["name"]
+    json_content = [{"name": "Bart Simpson", "age": 10}, {"name": "Lisa", "age": 8}]
+    json_str = "﻿" + json.dumps(json_content, indent=4) + "\n"
+    input_bytes = BytesIO(json_str.encode("utf-8"))
+    output = obfuscate_json(input_bytes, pii_fields)
+    assert json.loads(output.read()) == [
+        {"name": "***", "age": 10},
+        {"name": "***", "age": 8},
+    ]
+
+
+def test_obfuscate_json_raises_error_for_trailing_or_truncated_json():
+    with raises(json.JSONDecodeError) as err:
+        obfuscate_json(BytesIO(b'[{"a": 1}] []'), [])
+    assert err.value.msg == "Extra data"
+
+    with raises(json.JSONDecodeError):
+        obfuscate_json(BytesIO(b'[{"a": 1}, {"a": 2}'), [])
+
+    with raises(json.JSONDecodeError):
+        obfuscate_json(BytesIO(b'{"outer": [{"a": 1}]'), [])
+
+
+def test_obfuscate_json_formats_output_like_the_codec():
+    orjson = importorskip("orjson")
+    json_content = {
+        "first": [{"id": i, "email": f"{i}@email.com"} for i in range(5)],
+        "second": [],
+    }
+    expected_content = {
+        "first": [{"id": i, "email": "***"} for i in range(5)],
+        "second": [],
+    }
+    input_bytes = BytesIO(json.dumps(json_content).encode("utf-8"))
+    with patch("gdpr_obfuscator.json_obfuscator.JSON_BATCH_RECORDS", 2):
+        output = obfuscate_json(input_bytes, ["email"], codec="orjson")
+    assert output.read() == orjson.dumps(expected_content)
+
+
+def test_obfuscate_json_keeps_big_integers_and_non_finite_numbers_with_every_codec():
+    json_str = (
+        '[{"id": 18446744073709551616, "email": "a@b.com"}, '
+        + '{"id": 2, "score": NaN, "email": "c@d.com"}]'
+    )
+    for codec in ["json", "orjson"]:
+        input_bytes = BytesIO(json_str.encode("utf-8"))
+        output = obfuscate_json(input_bytes, ["email"], codec=codec)
+        assert output.read() == (
+            b'[{"id": 18446744073709551616, "email": "***"}, '
+            + b'{"id": 2, "score": NaN, "email": "***"}]'
+        )
+
+
+def test_obfuscate_json_peak_memory_does_not_grow_with_input_size():
+    assert peak_memory_growth(obfuscate_json, "json") < 0.1
+
+
+def test_obfuscate_json_masks_nested_field_paths():
+    document = [
+        {
+            "customer": {"name": "Fake", "contact": {"email": "a@b.com"}},
+            "orders": [{"sku": "A1", "card_number": "4111"}],
+        }
+    ]
+    body = BytesIO(json.dumps(document).encode())
+    output = obfuscate_json(body, ["customer.contact.email", "orders[*].card_number"])
+    assert json.loads(output.getvalue()) == [
+        {
+            "customer": {"name": "Fake", "contact": {"email": "***"}},
+            "orders": [{"sku": "A1", "card_number": "***"}],
+        }
+    ]
+
+
+def test_obfuscate_json_masks_nested_field_paths_in_a_dict_of_lists():
+    document = {"people": [{"contact": {"email": "a@b.com"}}]}
+    body = BytesIO(json.dumps(document).encode())
+    output = obfuscate_json(body, ["contact.email"])
+    assert json.loads(output.getvalue()) == {"people": [{"contact": {"email": "***"}}]}
+
+
+def test_obfuscate_json_pseudonymises_values():
+    pseudonymiser = Pseudonymiser(b"secret")
+    document = [
+        {"email": "a@b.com", "tags": ["x", "y"]},
+        {"email": "a@b.com", "tags": []},
+    ]
+    body = BytesIO(json.dumps(document).encode())
+    output = obfuscate_json(body, ["email", "tags[*]"], pseudonymiser=pseudonymiser)
+    assert json.loads(output.getvalue()) == [
+        {
+            "email": pseudonymiser("a@b.com"),
+            "tags": [pseudonymiser("x"), pseudonymiser("y")],
+        },
+        {"email": pseudonymiser("a@b.com"), "tags": []},
+    ]
+
+
+def test_obfuscate_json_applies_strategies():
+    document = {"people": [{"email": "a@b.com", "tags": ["x", "y"], "id": 1}]}
+    body = BytesIO(json.dumps(document).encode())
+    output = obfuscate_json(
+        body, ["email", "tags[*]"], strategies={"email": "mask:3", "tags[*]": "drop"}
+    )
+    assert json.loads(output.getvalue()) == {
+        "people": [{"email": "***", "tags": [], "id": 1}]
+    }
+
+
+def test_iter_obfuscate_json_yields_the_output_of_obfuscate_json():
+    for document in (
+        [{"email": "fake@email.com", "age": 31}] * 2500,
+        {"customers": [{"email": "fake@email.com"}] * 10, "staff": []},
+        42,
+    ):
+        body = json.dumps(document).encode("utf-8")
+        chunks = list(iter_obfuscate_json(BytesIO(body), ["email"]))
+        expected = obfuscate_json(BytesIO(body), ["email"]).getvalue()
+        assert b"".join(chunks) == expected
+
+
+def test_iter_obfuscate_json_yields_arrays_in_batches():
+    body = json.dumps([{"email": "fake@email.com"}] * 2500).encode("utf-8")
+    with patch("gdpr_obfuscator.json_obfuscator.JSON_BATCH_RECORDS", 1000):
+        chunks = list(iter_obfuscate_json(BytesIO(body), ["email"]))
+    assert chunks[0] == b"["
+    assert chunks[-1] == b"]"
+    assert len(chunks) == 5
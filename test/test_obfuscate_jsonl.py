@@ -1,16 +1,22 @@
-from src.gdpr_obfuscator import obfuscate_jsonl
+from gdpr_obfuscator import (
+    Pseudonymiser,
+    SpoolingBuffer,
+    iter_obfuscate_jsonl,
+    obfuscate_jsonl,
+)
+from helpers import peak_memory_growth
 from io import BytesIO
 import json
 from pytest import raises
 
 
-def test_obfuscate_jsonl_returns_a_bytesio_object():
+def test_obfuscate_jsonl_returns_a_spooling_buffer():
     jsonl_content = {"headers": "content"}
     jsonl_str = json.dumps(jsonl_content)
     input_bytes = BytesIO(jsonl_str.encode("utf-8"))
     pii_fields = []
     output = obfuscate_jsonl(input_bytes, pii_fields)
-    assert isinstance(output, BytesIO)
+    assert isinstance(output, SpoolingBuffer)
 
 
 def test_obfuscate_jsonl_returns_the_same_contents_when_pii_fields_are_empty():
@@ -81,3 +87,221 @@ def test_obfuscate_jsonl_raises_error_if_pii_field_is_not_a_header():
     with raises(ValueError) as err:
         obfuscate_jsonl(input_bytes, pii_fields)
     assert str(err.value) == "The pii_field 'name' not found in headers."
+
+
+def test_obfuscate_jsonl_gives_the_same_records_with_every_codec():
+    pii_fields = ["email"]
+    jsonl_str = "".join(
+        json.dumps({"id": i, "email": f"{i}@email.com", "name": "Bärt"}) + "\n"
+        for i in range(10)
+    )
+    for codec in ["json", "orjson"]:
+        input_bytes = BytesIO(jsonl_str.encode("utf-8"))
+        output = obfuscate_jsonl(input_bytes, pii_fields, codec=codec)
+        lines = output.read().decode("utf-8").splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"id": i, "email": "***", "name": "Bärt"} for i in range(10)
+        ]
+
+
+def test_obfuscate_jsonl_handles_crlf_and_a_missing_final_new_line():
+    jsonl_str = '{"a": 1, "email": "x"}\r\n{"a": 2, "email": "y"}'
+    input_bytes = BytesIO(jsonl_str.encode("utf-8"))
+    output = obfuscate_jsonl(input_bytes, ["email"])
+    assert output.read() == b'{"a": 1, "email": "***"}\n{"a": 2, "email": "***"}\n'
+
+
+def test_obfuscate_jsonl_keeps_big_integers_and_non_finite_numbers_with_every_codec():
+    jsonl_str = (
+        '{"id": 18446744073709551616, "email": "a@b.com"}\n'
+        + '{"id": -9223372036854775809, "score": NaN, "email": "c@d.com"}\n'
+        + '{"id": 1, "score": Infinity, "email": "e@f.com"}\n'
+    )
+    for codec in ["json", "orjson"]:
+        input_bytes = BytesIO(jsonl_str.encode("utf-8"))
+        output = obfuscate_jsonl(input_bytes, ["email"], codec=codec)
+        assert output.read() == (
+            b'{"id": 18446744073709551616, "email": "***"}\n'
+            + b'{"id": -9223372036854775809, "score": NaN, "email": "***"}\n'
+            + b'{"id": 1, "score": Infinity, "email": "***"}\n'
+        )
+
+
+def test_obfuscate_jsonl_writes_json_dumps_output_by_default():
+    jsonl_str = '{"id":1,"email":"a@b.com"}\n'
+    output = obfuscate_jsonl(BytesIO(jsonl_str.encode("utf-8")), ["email"])
+    assert output.read() == b'{"id": 1, "email": "***"}\n'
+
+
+def test_obfuscate_jsonl_masks_top_level_keys_containing_dots():
+    input_bytes = BytesIO(b'{"user.email": "a@b.com", "id": 1}\n')
+    output = obfuscate_jsonl(input_bytes, ["user.email"])
+    assert output.read() == b'{"user.email": "***", "id": 1}\n'
+
+
+def test_obfuscate_jsonl_raises_error_for_an_unknown_codec():
+    with raises(ValueError) as err:
+        obfuscate_jsonl(BytesIO(b"{}\n"), [], codec="simplejson")
+    assert str(err.value) == "codec must be one of ['orjson', 'json']"
+
+
+def test_obfuscate_jsonl_raises_json_decode_error_for_invalid_lines():
+    for codec in ["json", "orjson"]:
+        with raises(json.JSONDecodeError):
+            obfuscate_jsonl(BytesIO(b'{"a": 1}\n\n'), [], codec=codec)
+
+
+def test_obfuscate_jsonl_can_validate_only_the_first_record():
+    jsonl_str = (
+        '{"age": 31, "email": "fake@email.com"}\n'
+        + '{"age": 10, "email": "bart@email.com"}\n'
+        + '{"age": 44}\n'
+    )
+    output = obfuscate_jsonl(
+        BytesIO(jsonl_str.encode("utf-8")),
+        ["email"],
+        validate_first_record_only=True,
+    )
+    assert output.read() == (
+        b'{"age": 31, "email": "***"}\n'
+        + b'{"age": 10, "email": "***"}\n'
+        + b'{"age": 44}\n'
+    )
+
+    with raises(ValueError) as err:
+        obfuscate_jsonl(
+            BytesIO(b'{"age": 44}\n{"email": "x"}\n'),
+            ["email"],
+            validate_first_record_only=True,
+        )
+    assert str(err.value) == "The pii_field 'email' not found in headers."
+
+
+def test_obfuscate_jsonl_peak_memory_does_not_grow_with_input_size():
+    assert peak_memory_growth(obfuscate_jsonl, "jsonl") < 0.1
+
+
+def test_obfuscate_jsonl_masks_nested_field_paths():
+    records = [
+        {"customer": {"contact": {"email": "a@b.com"}}, "orders": [{"card": "4111"}]},
+        {"customer": {"contact": {"email": "c@d.com"}}, "orders": []},
+    ]
+    body = BytesIO("\n".join(json.dumps(record) for record in records).encode())
+    output = obfuscate_jsonl(body, ["customer.contact.email", "orders[*].card"])
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+        {"customer": {"contact": {"email": "***"}}, "orders": [{"card": "***"}]},
+        {"customer": {"contact": {"email": "***"}}, "orders": []},
+    ]
+
+
+def test_obfuscate_jsonl_raises_error_for_a_missing_nested_field():
+    body = BytesIO(b'{"customer": {"name": "Fake"}}\n')
+    with raises(ValueError) as err:
+        obfuscate_jsonl(body, ["customer.contact.email"])
+    assert (
+        str(err.value) == "The pii_field 'customer.contact.email' not found in headers."
+    )
+
+
+def test_obfuscate_jsonl_skips_missing_nested_fields_after_the_first_record():
+    body = BytesIO(
+        b'{"customer": {"contact": {"email": "a@b.com"}}}\n{"customer": {}}\n'
+    )
+    output = obfuscate_jsonl(
+        body, ["customer.contact.email"], validate_first_record_only=True
+    )
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+        {"customer": {"contact": {"email": "***"}}},
+        {"customer": {}},
+    ]
+
+
+def test_obfuscate_jsonl_pseudonymises_top_level_and_nested_fields():
+    pseudonymiser = Pseudonymiser(b"secret")
+    body = BytesIO(
+        b'{"email": "a@b.com", "orders": [{"card": "4111"}, {"card": 5500}]}\n'
+        b'{"email": "a@b.com", "orders": []}\n'
+    )
+    output = obfuscate_jsonl(
+        body, ["email", "orders[*].card"], pseudonymiser=pseudonymiser
+    )
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+        {
+            "email": pseudonymiser("a@b.com"),
+            "orders": [{"card": pseudonymiser("4111")}, {"card": pseudonymiser(5500)}],
+        },
+        {"email": pseudonymiser("a@b.com"), "orders": []},
+    ]
+
+
+def test_obfuscate_jsonl_does_not_add_missing_fields_when_pseudonymising():
+    pseudonymiser = Pseudonymiser(b"secret")
+    body = BytesIO(b'{"email": "a@b.com"}\n{"name": "Fake"}\n')
+    output = obfuscate_jsonl(
+        body, ["email"], validate_first_record_only=True, pseudonymiser=pseudonymiser
+    )
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+        {"email": pseudonymiser("a@b.com")},
+        {"name": "Fake"},
+    ]
+
+
+def test_obfuscate_jsonl_applies_strategies():
+    body = BytesIO(
+        b'{"email": "a@b.com", "card": "4111111111111111", "dob": "1990-05-17",'
+        b' "orders": [{"sku": "A1", "card": 5500}]}\n'
+    )
+    output = obfuscate_jsonl(
+        body,
+        ["email", "card", "dob", "orders[*].card"],
+        strategies={
+            "email": "drop",
+            "card": "keep_last",
+            "dob": "truncate_date",
+            "orders[*].card": "null",
+        },
+    )
+    assert json.loads(output.getvalue()) == {
+        "card": "************1111",
+        "dob": "1990-05-01",
+        "orders": [{"sku": "A1", "card": None}],
+    }
+
+
+def test_obfuscate_jsonl_leaves_out_missing_fields_when_validating_the_first():
+    body = BytesIO(b'{"email": "a@b.com", "name": "Fake"}\n{"id": 2}\n')
+    output = obfuscate_jsonl(
+        body,
+        ["email", "name"],
+        validate_first_record_only=True,
+        strategies={"name": "mask"},
+    )
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+        {"email": "***", "name": "********"},
+        {"id": 2},
+    ]
+
+
+def test_iter_obfuscate_jsonl_yields_the_output_of_obfuscate_jsonl():
+    body = b'{"email": "fake@email.com", "age": 31}\n' * 100
+    chunks = list(iter_obfuscate_jsonl(BytesIO(body), ["email"]))
+    expected = obfuscate_jsonl(BytesIO(body), ["email"]).getvalue()
+    assert b"".join(chunks) == expected
+
+
+def test_iter_obfuscate_jsonl_streams_past_a_record_with_an_escaped_quote():
+    quoted = json.dumps({"email": "fake@email.com", "name": 'one " quote'})
+    record = json.dumps({"email": "fake@email.com", "name": "Fake"})
+    body = BytesIO((quoted + "\n" + (record + "\n") * 200_000).encode())
+    chunks = iter_obfuscate_jsonl(body, ["email"])
+    first = next(chunks)
+    assert json.loads(first.split(b"\n")[0]) == {"email": "***", "name": 'one " quote'}
+    assert body.tell() < len(body.getvalue()) // 2
+    assert (first + b"".join(chunks)).count(b"\n") == 200_001
+
+
+def test_iter_obfuscate_jsonl_only_reads_the_body_as_far_as_it_is_consumed():
+    body = BytesIO(b'{"email": "fake@email.com"}\n' * 500_000)
+    chunks = iter_obfuscate_jsonl(body, ["email"])
+    assert json.loads(next(chunks).split(b"\n")[0]) == {"email": "***"}
+    assert body.tell() < len(body.getvalue()) // 2
@@ -0,0 +1,159 @@
+from gdpr_obfuscator import (
+    InvocationMetrics,
+    Pseudonymiser,
+    SpoolingBuffer,
+    obfuscate_parquet,
+)
+from datetime import date
+from io import BytesIO
+from pytest import importorskip, mark, raises
+
+pa = importorskip("pyarrow")
+pq = importorskip("pyarrow.parquet")
+
+
+def make_parquet(table, **options) -> BytesIO:
+    body = BytesIO()
+    pq.write_table(table, body, **options)
+    body.seek(0)
+    return body
+
+
+def make_table():
+    return pa.table(
+        {
+            "age": pa.array([31, 10, None, 44], pa.int32()),
+            "email": ["fake@email.com", None, "bart@email.com", "fake@email.com"],
+            "card": [4111111111111111, 5500000000000004, None, 12],
+            "joined": [date(2024, 5, 17), date(2023, 1, 2), None, date(2022, 12, 31)],
+        }
+    )
+
+
+def test_obfuscate_parquet_returns_a_spooling_buffer_at_its_start():
+    output = obfuscate_parquet(make_parquet(make_table()), ["email"])
+    assert isinstance(output, SpoolingBuffer)
+    assert output.tell() == 0
+
+
+def test_obfuscate_parquet_redacts_pii_columns_and_keeps_nulls():
+    output = obfuscate_parquet(make_parquet(make_table()), ["email", "card"])
+    result = pq.read_table(output)
+    assert result.column("email").to_pylist() == ["***", None, "***", "***"]
+    assert result.column("card").to_pylist() == ["***", "***", None, "***"]
+
+
+def test_obfuscate_parquet_carries_other_columns_through_unchanged():
+    table = make_table()
+    result = pq.read_table(obfuscate_parquet(make_parquet(table), ["email"]))
+    assert result.column("age").equals(table.column("age"))
+    assert result.column("joined").equals(table.column("joined"))
+    assert result.schema.names == table.schema.names
+
+
+def test_obfuscate_parquet_preserves_the_schema_of_other_columns_and_metadata():
+    table = make_table().replace_schema_metadata({"source": "crm"})
+    result = pq.read_table(obfuscate_parquet(make_parquet(table), ["card"]))
+    assert result.schema.field("card").type == pa.string()
+    assert result.schema.field("age").type == pa.int32()
+    assert result.schema.field("joined").type == pa.date32()
+    assert result.schema.metadata == {b"source": b"crm"}
+
+
+def test_obfuscate_parquet_preserves_row_groups_and_column_compression():
+    body = make_parquet(
+        make_table(), row_group_size=3, compression={"age": "zstd", "email": "gzip"}
+    )
+    output = obfuscate_parquet(body, ["email"])
+    metadata = pq.ParquetFile(output).metadata
+    assert metadata.num_row_groups == 2
+    assert [metadata.row_group(i).num_rows for i in range(2)] == [3, 1]
+    row_group = metadata.row_group(0)
+    assert row_group.column(0).compression == "ZSTD"
+    assert row_group.column(1).compression == "GZIP"
+
+
+@mark.parametrize("max_workers", [1, 2, 4])
+def test_obfuscate_parquet_writes_row_groups_in_order(max_workers):
+    emails = [f"person{i}@email.com" for i in range(1000)]
+    table = pa.table({"id": list(range(1000)), "email": emails})
+    body = make_parquet(table, row_group_size=64)
+    output = obfuscate_parquet(body, ["email"], max_workers=max_workers)
+    result = pq.read_table(output)
+    assert result.column("id").to_pylist() == list(range(1000))
+    assert set(result.column("email").to_pylist()) == {"***"}
+    assert pq.ParquetFile(output).metadata.num_row_groups == 16
+
+
+def test_obfuscate_parquet_applies_strategies():
+    strategies = {
+        "email": "mask:4",
+        "card": "keep_last:4",
+        "joined": "truncate_date:year",
+    }
+    output = obfuscate_parquet(
+        make_parquet(make_table()), list(strategies), strategies=strategies
+    )
+    result = pq.read_table(output).to_pydict()
+    assert result["email"] == ["****", None, "****", "****"]
+    assert result["card"] == ["************1111", "************0004", None, "**"]
+    assert result["joined"] == ["2024-01-01", "2023-01-01", None, "2022-01-01"]
+
+
+def test_obfuscate_parquet_drops_columns_and_nulls_keep_their_type():
+    strategies = {"email": "drop", "card": "null"}
+    output = obfuscate_parquet(
+        make_parquet(make_table()), list(strategies), strategies=strategies
+    )
+    result = pq.read_table(output)
+    assert result.schema.names == ["age", "card", "joined"]
+    assert result.schema.field("card").type == pa.int64()
+    assert result.column("card").to_pylist() == [None] * 4
+
+
+def test_obfuscate_parquet_pseudonymises_equal_values_to_equal_tokens():
+    pseudonymiser = Pseudonymiser(b"secret")
+    output = obfuscate_parquet(
+        make_parquet(make_table()), ["email"], pseudonymiser=pseudonymiser
+    )
+    tokens = pq.read_table(output).column("email").to_pylist()
+    assert tokens == [
+        pseudonymiser("fake@email.com"),
+        None,
+        pseudonymiser("bart@email.com"),
+        pseudonymiser("fake@email.com"),
+    ]
+
+
+def test_obfuscate_parquet_reads_bodies_that_are_not_seekable():
+    class Body:
+        def __init__(self, data):
+            self.data = data
+
+        def read(self):
+            return self.data
+
+    body = Body(make_parquet(make_table()).getvalue())
+    result = pq.read_table(obfuscate_parquet(body, ["email"]))
+    assert result.column("email").to_pylist() == ["***", None, "***", "***"]
+
+
+def test_obfuscate_parquet_writes_a_file_with_no_rows():
+    table = make_table().slice(0, 0)
+    result = pq.read_table(obfuscate_parquet(make_parquet(table), ["email"]))
+    assert result.num_rows == 0
+    assert result.schema.names == table.schema.names
+
+
+def test_obfuscate_parquet_counts_rows():
+    metrics = InvocationMetrics("s3://bucket/key.parquet")
+    obfuscate_parquet(
+        make_parquet(make_table(), row_group_size=3), ["email"], metrics=metrics
+    )
+    assert metrics.rows == 4
+
+
+def test_obfuscate_parquet_raises_value_error_for_missing_pii_fields():
+    with raises(ValueError) as err:
+        obfuscate_parquet(make_parquet(make_table()), ["email", "phone"])
+    assert str(err.value) == "The pii_fields '{'phone'}' not found in headers."
@@ -0,0 +1,303 @@
+from gdpr_obfuscator import (
+    MIN_PART_SIZE,
+    InvocationMetrics,
+    S3MultipartWriter,
+    S3Storage,
+    gdpr_obfuscator,
+    obfuscate_csv,
+    obfuscate_jsonl,
+    obfuscate_resumable,
+)
+from gdpr_obfuscator.resumable import save_checkpoint
+from io import BytesIO
+import gzip
+import json
+from pytest import importorskip, raises, mark
+from unittest.mock import patch
+
+
+pytestmark = mark.usefixtures("test_bucket")
+
+
+def make_csv(rows, newline="\n"):
+    lines = [f"id,email,name,notes{newline}"]
+    for i in range(rows):
+        notes = '"a, b"' if i % 3 else '"multi\nline"'
+        lines.append(f"{i},person{i}@email.com,Person {i},{notes}{newline}")
+    return "".join(lines).encode("utf-8")
+
+
+def make_event(key, **options):
+    return {
+        "file_to_obfuscate": f"s3://test-bucket/{key}",
+        "pii_fields": ["email", "name"],
+        "destination": f"s3://test-bucket/output/{key}",
+        "job_id": "job-1",
+        **options,
+    }
+
+
+def read_object(s3_client, key):
+    return s3_client.get_object(Bucket="test-bucket", Key=key)["Body"].read()
+
+
+def run_to_completion(event):
+    results = []
+    while not results or not results[-1]["Complete"]:
+        results.append(obfuscate_resumable(event, part_size=MIN_PART_SIZE))
+    return results
+
+
+def test_obfuscate_resumable_resumed_output_is_byte_identical(s3_client):
+    content = make_csv(300_000)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+
+    results = run_to_completion(make_event("data.csv", time_limit=0))
+
+    assert len(results) >= 2
+    assert not any(result["Complete"] for result in results[:-1])
+    assert 0 < results[0]["Offset"] < len(content)
+    expected = obfuscate_csv(BytesIO(content), ["email", "name"]).read()
+    assert read_object(s3_client, "output/data.csv") == expected
+    assert results[-1]["Key"] == "output/data.csv"
+    assert results[-1]["JobId"] == "job-1"
+
+
+def test_obfuscate_resumable_saves_a_manifest_at_each_checkpoint(s3_client):
+    content = make_csv(300_000)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+
+    result = obfuscate_resumable(
+        make_event("data.csv", time_limit=0), part_size=MIN_PART_SIZE
+    )
+
+    assert result["CheckpointKey"] == "output/data.csv.job-1.checkpoint.json"
+    manifest = json.loads(read_object(s3_client, result["CheckpointKey"]))
+    assert manifest["offset"] == result["Offset"]
+    assert manifest["header"] == "id,email,name,notes\n"
+    assert manifest["col_nums"] == [1, 2]
+    assert [part["PartNumber"] for part in manifest["parts"]] == [1]
+    uploads = s3_client.list_multipart_uploads(Bucket="test-bucket")["Uploads"]
+    assert [upload["UploadId"] for upload in uploads] == [manifest["upload_id"]]
+    assert content[manifest["offset"] - 1 : manifest["offset"]] == b"\n"
+
+
+def test_obfuscate_resumable_resumes_after_a_failed_call(s3_client):
+    content = make_csv(300_000, newline="\r\n")
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+    event = make_event("data.csv")
+    upload_part = S3MultipartWriter.upload_part
+    calls = []
+
+    def fail_on_second_part(writer, data):
+        calls.append(len(data))
+        if len(calls) == 2:
+            raise ConnectionError("connection reset")
+        upload_part(writer, data)
+
+    with patch.object(S3MultipartWriter, "upload_part", fail_on_second_part):
+        with raises(ConnectionError):
+            obfuscate_resumable(event, part_size=MIN_PART_SIZE)
+    metrics = InvocationMetrics(event["file_to_obfuscate"])
+    result = obfuscate_resumable(event, metrics=metrics, part_size=MIN_PART_SIZE)
+
+    assert result["Complete"]
+    assert 0 < metrics.bytes_in < len(content)
+    expected = obfuscate_csv(BytesIO(content), ["email", "name"]).read()
+    assert read_object(s3_client, "output/data.csv") == expected
+
+
+def test_obfuscate_resumable_returns_the_result_of_a_complete_job(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=make_csv(10))
+    event = make_event("data.csv")
+
+    first = gdpr_obfuscator(event)
+    with patch("gdpr_obfuscator.csv_obfuscator.edit_block") as edit_block:
+        second = gdpr_obfuscator(event)
+
+    edit_block.assert_not_called()
+    assert second == first
+    assert first["Complete"] and "ETag" in first
+
+
+def test_obfuscate_resumable_can_use_the_numpy_engine(s3_client):
+    importorskip("numpy")
+    rows = (f"{i},person{i}@email.com,Person {i},notes\n" for i in range(300_000))
+    content = ("id,email,name,notes\n" + "".join(rows)).encode("utf-8")
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+
+    with patch("gdpr_obfuscator.csv_obfuscator.edit_block") as edit_block:
+        run_to_completion(make_event("data.csv", csv_engine="numpy", time_limit=0))
+
+    edit_block.assert_not_called()
+    expected = obfuscate_csv(BytesIO(content), ["email", "name"]).read()
+    assert read_object(s3_client, "output/data.csv") == expected
+
+
+def test_obfuscate_resumable_jsonl_matches_obfuscate_jsonl(s3_client):
+    records = [
+        {"id": i, "email": f"person{i}@email.com", "name": f"Person {i}"}
+        for i in range(150_000)
+    ]
+    content = "".join(json.dumps(record) + "\n" for record in records).encode()
+    s3_client.put_object(Bucket="test-bucket", Key="data.jsonl", Body=content)
+    strategies = {"email": "keep_last:4"}
+
+    results = run_to_completion(
+        make_event("data.jsonl", strategies=strategies, time_limit=0)
+    )
+
+    assert len(results) >= 2
+    expected = obfuscate_jsonl(
+        BytesIO(content), ["email", "name"], strategies=strategies
+    ).read()
+    assert read_object(s3_client, "output/data.jsonl") == expected
+
+
+def test_obfuscate_resumable_jsonl_resumes_past_a_record_with_an_escaped_quote(
+    s3_client,
+):
+    quoted = json.dumps({"id": -1, "email": "fake@email.com", "name": 'one " quote'})
+    records = [
+        {"id": i, "email": f"person{i}@email.com", "name": f"Person {i}"}
+        for i in range(150_000)
+    ]
+    content = (
+        quoted + "\n" + "".join(json.dumps(record) + "\n" for record in records)
+    ).encode()
+    s3_client.put_object(Bucket="test-bucket", Key="data.jsonl", Body=content)
+
+    results = run_to_completion(make_event("data.jsonl", time_limit=0))
+
+    assert len(results) >= 2
+    expected = obfuscate_jsonl(BytesIO(content), ["email", "name"]).read()
+    assert read_object(s3_client, "output/data.jsonl") == expected
+
+
+def test_obfuscate_resumable_rejects_a_checkpoint_for_another_event(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=make_csv(10))
+    gdpr_obfuscator(make_event("data.csv"))
+
+    with raises(ValueError) as err:
+        gdpr_obfuscator({**make_event("data.csv"), "pii_fields": ["email"]})
+    assert str(err.value) == (
+        "checkpoint output/data.csv.job-1.checkpoint.json does not match the "
+        "event; use a new job_id"
+    )
+
+
+def test_obfuscate_resumable_recovers_an_upload_completed_before_its_result(
+    s3_client,
+):
+    content = make_csv(300_000)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+    event = make_event("data.csv", time_limit=0)
+    obfuscate_resumable(event, part_size=MIN_PART_SIZE)
+
+    def fail_to_save_the_result(storage, key, manifest):
+        if "result" in manifest:
+            raise ConnectionError("connection reset")
+        save_checkpoint(storage, key, manifest)
+
+    with patch("gdpr_obfuscator.resumable.save_checkpoint", fail_to_save_the_result):
+        with raises(ConnectionError):
+            run_to_completion(event)
+    with patch("gdpr_obfuscator.csv_obfuscator.edit_block") as edit_block:
+        result = obfuscate_resumable(event, part_size=MIN_PART_SIZE)
+
+    edit_block.assert_not_called()
+    assert result["Complete"]
+    head = s3_client.head_object(Bucket="test-bucket", Key="output/data.csv")
+    assert result["ETag"] == head["ETag"]
+    manifest = json.loads(
+        read_object(s3_client, "output/data.csv.job-1.checkpoint.json")
+    )
+    assert manifest["result"] == result
+    expected = obfuscate_csv(BytesIO(content), ["email", "name"]).read()
+    assert read_object(s3_client, "output/data.csv") == expected
+
+
+def test_obfuscate_resumable_raises_value_error_for_a_lost_upload(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=make_csv(300_000))
+    event = make_event("data.csv", time_limit=0)
+    result = obfuscate_resumable(event, part_size=MIN_PART_SIZE)
+    manifest = json.loads(read_object(s3_client, result["CheckpointKey"]))
+    s3_client.abort_multipart_upload(
+        Bucket="test-bucket", Key="output/data.csv", UploadId=manifest["upload_id"]
+    )
+
+    with raises(ValueError) as err:
+        obfuscate_resumable(event, part_size=MIN_PART_SIZE)
+    assert str(err.value) == (
+        "the multipart upload of job job-1 no longer exists; use a new job_id"
+    )
+
+
+def test_obfuscate_resumable_rejects_a_source_overwritten_at_the_same_size(
+    s3_client,
+):
+    content = make_csv(300_000)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+    event = make_event("data.csv", time_limit=0)
+    obfuscate_resumable(event, part_size=MIN_PART_SIZE)
+    changed = content.replace(b"person1@", b"person2@")
+    assert len(changed) == len(content)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=changed)
+
+    with raises(ValueError) as err:
+        obfuscate_resumable(event, part_size=MIN_PART_SIZE)
+    assert "does not match the event" in str(err.value)
+
+
+def test_obfuscate_resumable_reads_the_source_only_if_it_is_unchanged(s3_client):
+    content = make_csv(10)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+    open_object = S3Storage.open
+
+    def overwrite_then_open(storage, key, start=0, if_match=None):
+        if key == "data.csv":
+            s3_client.put_object(Bucket="test-bucket", Key=key, Body=content.upper())
+        return open_object(storage, key, start, if_match)
+
+    with patch.object(S3Storage, "open", overwrite_then_open):
+        with raises(ValueError) as err:
+            obfuscate_resumable(make_event("data.csv"))
+    assert str(err.value) == (
+        "s3://test-bucket/data.csv changed while the job was running; use a new job_id"
+    )
+
+
+def test_obfuscate_resumable_raises_value_error_for_unsupported_events(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=make_csv(10))
+    s3_client.put_object(Bucket="test-bucket", Key="data.json", Body=b"[]")
+    s3_client.put_object(
+        Bucket="test-bucket", Key="packed.csv", Body=gzip.compress(make_csv(10))
+    )
+    event = make_event("data.csv")
+    without_destination = {k: v for k, v in event.items() if k != "destination"}
+    for bad_event, message in (
+        ({**event, "shard_workers": 2}, "job_id cannot be used with ['shard_workers']"),
+        (without_destination, "job_id needs a destination"),
+        ({**event, "destination": "file://out.csv"}, "job_id needs an S3 destination"),
+        (make_event("data.json"), "job_id supports csv and jsonl files"),
+        (make_event("packed.csv"), "job_id does not support compressed files"),
+        (
+            {**event, "destination": "s3://test-bucket/out.csv.gz"},
+            "job_id does not support compressed files",
+        ),
+    ):
+        with raises(ValueError) as err:
+            obfuscate_resumable(bad_event)
+        assert str(err.value) == message
+
+
+def test_gdpr_obfuscator_raises_type_error_with_invalid_job_options():
+    event = {"file_to_obfuscate": "s3://bucket/key.csv", "pii_fields": []}
+    for job_id in ("", 1):
+        with raises(TypeError) as err:
+            gdpr_obfuscator({**event, "job_id": job_id})
+        assert str(err.value) == "job_id value must be a non-empty string"
+    for time_limit in (-1, "60", True):
+        with raises(TypeError) as err:
+            gdpr_obfuscator({**event, "job_id": "job-1", "time_limit": time_limit})
+        assert str(err.value) == "time_limit value must be a non-negative number"
@@ -0,0 +1,292 @@
+from gdpr_obfuscator import (
+    InvocationMetrics,
+    LocalStorage,
+    Pseudonymiser,
+    obfuscate_csv,
+    obfuscate_jsonl,
+    obfuscate_sharded,
+)
+from gdpr_obfuscator.sharding import PipeWorkerPool, align_to_newline
+from io import BytesIO
+import json
+from pytest import importorskip, raises, mark
+from unittest.mock import patch
+
+
+pytestmark = mark.usefixtures("test_bucket")
+
+
+def make_csv(rows):
+    lines = ["id,email,name,city\n"]
+    for i in range(rows):
+        lines.append(f"{i},person{i}@email.com,Person {i},City {i % 7}\n")
+    return "".join(lines).encode("utf-8")
+
+
+def make_jsonl(rows):
+    lines = []
+    for i in range(rows):
+        record = {"id": i, "email": f"person{i}@email.com", "name": f"Person {i}"}
+        lines.append(json.dumps(record) + "\n")
+    return "".join(lines).encode("utf-8")
+
+
+@mark.parametrize("max_workers", [1, 2])
+def test_obfuscate_sharded_csv_is_byte_identical_to_obfuscate_csv(
+    s3_client, max_workers
+):
+    content = make_csv(500)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+
+    output = obfuscate_sharded(
+        "test-bucket",
+        "data.csv",
+        ["email", "name"],
+        max_workers=max_workers,
+        shard_size=1000,
+    )
+
+    expected = obfuscate_csv(BytesIO(content), ["email", "name"]).read()
+    assert output.read() == expected
+
+
+@mark.parametrize("max_workers", [1, 2])
+def test_obfuscate_sharded_jsonl_is_byte_identical_to_obfuscate_jsonl(
+    s3_client, max_workers
+):
+    content = make_jsonl(500)
+    s3_client.put_object(Bucket="test-bucket", Key="data.jsonl", Body=content)
+
+    output = obfuscate_sharded(
+        "test-bucket",
+        "data.jsonl",
+        ["email"],
+        max_workers=max_workers,
+        shard_size=1000,
+    )
+
+    expected = obfuscate_jsonl(BytesIO(content), ["email"]).read()
+    assert output.read() == expected
+
+
+@mark.parametrize("max_workers", [1, 2])
+@mark.parametrize("key", ["data.csv", "data.jsonl"])
+def test_obfuscate_sharded_pseudonymises_like_the_single_process_path(
+    s3_client, max_workers, key
+):
+    content = make_csv(200) if key.endswith(".csv") else make_jsonl(200)
+    s3_client.put_object(Bucket="test-bucket", Key=key, Body=content)
+    pseudonymiser = Pseudonymiser(b"secret")
+
+    output = obfuscate_sharded(
+        "test-bucket",
+        key,
+        ["email"],
+        max_workers=max_workers,
+        shard_size=1000,
+        pseudonymiser=pseudonymiser,
+    )
+
+    obfuscate = obfuscate_csv if key.endswith(".csv") else obfuscate_jsonl
+    expected = obfuscate(BytesIO(content), ["email"], pseudonymiser=pseudonymiser)
+    assert output.read() == expected.read()
+
+
+@mark.parametrize("max_workers", [1, 2])
+@mark.parametrize("key", ["data.csv", "data.jsonl"])
+def test_obfuscate_sharded_applies_strategies_like_the_single_process_path(
+    s3_client, max_workers, key
+):
+    content = make_csv(200) if key.endswith(".csv") else make_jsonl(200)
+    s3_client.put_object(Bucket="test-bucket", Key=key, Body=content)
+    strategies = {"email": "drop", "name": "keep_last:2"}
+
+    output = obfuscate_sharded(
+        "test-bucket",
+        key,
+        ["email", "name"],
+        max_workers=max_workers,
+        shard_size=1000,
+        strategies=strategies,
+    )
+
+    obfuscate = obfuscate_csv if key.endswith(".csv") else obfuscate_jsonl
+    expected = obfuscate(BytesIO(content), ["email", "name"], strategies=strategies)
+    assert output.read() == expected.read()
+
+
+def test_obfuscate_sharded_runs_several_workers_without_semaphores(s3_client):
+    # AWS Lambda has no /dev/shm, so creating a semaphore fails there, and with it
+    # ProcessPoolExecutor and multiprocessing.Pool.
+    content = make_csv(500)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+
+    with (
+        patch(
+            "multiprocessing.synchronize.SemLock.__init__",
+            side_effect=OSError(38, "Function not implemented"),
+        ),
+        patch(
+            "gdpr_obfuscator.sharding.PipeWorkerPool", wraps=PipeWorkerPool
+        ) as worker_pool,
+    ):
+        output = obfuscate_sharded(
+            "test-bucket", "data.csv", ["email"], max_workers=3, shard_size=1000
+        )
+
+    worker_pool.assert_called_once_with(3)
+    expected = obfuscate_csv(BytesIO(content), ["email"]).read()
+    assert output.read() == expected
+
+
+def test_obfuscate_sharded_handles_crlf_and_a_missing_final_newline(s3_client):
+    content = make_csv(200).replace(b"\n", b"\r\n").rstrip(b"\r\n")
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+
+    output = obfuscate_sharded(
+        "test-bucket", "data.csv", ["email"], max_workers=1, shard_size=333
+    )
+
+    expected = obfuscate_csv(BytesIO(content), ["email"]).read()
+    assert output.read() == expected
+
+
+def test_obfuscate_sharded_handles_a_header_only_csv(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=b"a,email\n")
+    output = obfuscate_sharded("test-bucket", "data.csv", ["email"], max_workers=1)
+    assert output.read() == b"a,email\n"
+
+
+def test_obfuscate_sharded_writes_into_the_given_output_buffer(s3_client):
+    content = make_csv(10)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+    output_buffer = BytesIO()
+
+    output = obfuscate_sharded(
+        "test-bucket", "data.csv", ["email"], output_buffer, max_workers=1
+    )
+
+    assert output is output_buffer
+    assert output.read() == obfuscate_csv(BytesIO(content), ["email"]).read()
+
+
+def test_obfuscate_sharded_raises_value_error_for_a_missing_csv_field(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=make_csv(10))
+    with raises(ValueError) as err:
+        obfuscate_sharded("test-bucket", "data.csv", ["phone"], max_workers=1)
+    assert str(err.value) == "The pii_fields '{'phone'}' not found in headers."
+
+
+def test_obfuscate_sharded_raises_value_error_for_unsupported_files(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.json", Body=b"[]")
+    with raises(ValueError) as err:
+        obfuscate_sharded("test-bucket", "data.json", [])
+    assert str(err.value) == "sharded obfuscation supports csv and jsonl files"
+
+
+def test_obfuscate_sharded_handles_quoted_fields_without_new_lines(s3_client):
+    content = (
+        make_csv(200).replace(b"Person ", b'"Person, ').replace(b",City", b'",City')
+    )
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+
+    output = obfuscate_sharded(
+        "test-bucket", "data.csv", ["city"], max_workers=1, shard_size=333
+    )
+
+    expected = obfuscate_csv(BytesIO(content), ["city"]).read()
+    assert output.read() == expected
+
+
+def test_obfuscate_sharded_raises_value_error_for_quoted_new_lines(s3_client):
+    content = (
+        make_csv(200).replace(b"Person ", b'"Person\n').replace(b",City", b'",City')
+    )
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+    with raises(ValueError) as err:
+        obfuscate_sharded(
+            "test-bucket", "data.csv", ["city"], max_workers=1, shard_size=333
+        )
+    assert str(err.value) == (
+        "sharded obfuscation does not support quoted fields containing new lines"
+    )
+
+
+def test_align_to_newline_returns_the_offset_after_the_next_newline(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data", Body=b"abc\ndefgh\nij")
+    assert align_to_newline("test-bucket", "data", 0, 12) == 4
+    assert align_to_newline("test-bucket", "data", 4, 12) == 4
+    assert align_to_newline("test-bucket", "data", 5, 12) == 10
+    assert align_to_newline("test-bucket", "data", 11, 12) == 12
+
+
+def test_align_to_newline_reads_past_lines_longer_than_one_probe(s3_client):
+    body = b"x" * 50 + b"\n" + b"y" * 10
+    s3_client.put_object(Bucket="test-bucket", Key="data", Body=body)
+    with patch("gdpr_obfuscator.sharding.SHARD_PROBE_SIZE", 8):
+        assert align_to_newline("test-bucket", "data", 3, len(body)) == 51
+
+
+def test_obfuscate_sharded_can_validate_only_the_first_jsonl_record(s3_client):
+    content = make_jsonl(100) + b'{"id": 100}\n'
+    s3_client.put_object(Bucket="test-bucket", Key="data.jsonl", Body=content)
+
+    output = obfuscate_sharded(
+        "test-bucket",
+        "data.jsonl",
+        ["email"],
+        max_workers=1,
+        validate_first_record_only=True,
+    )
+
+    assert json.loads(output.read().splitlines()[-1]) == {"id": 100}
+
+
+@mark.parametrize("max_workers", [1, 2])
+def test_obfuscate_sharded_numpy_engine_matches_obfuscate_csv(s3_client, max_workers):
+    importorskip("numpy")
+    content = make_csv(2000)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=content)
+
+    output = obfuscate_sharded(
+        "test-bucket",
+        "data.csv",
+        ["email", "name"],
+        max_workers=max_workers,
+        shard_size=4096,
+        engine="numpy",
+    )
+
+    expected = obfuscate_csv(BytesIO(content), ["email", "name"]).read()
+    assert output.read() == expected
+
+
+def test_obfuscate_sharded_raises_value_error_for_compressed_files(s3_client):
+    with raises(ValueError) as err:
+        obfuscate_sharded("test-bucket", "data.csv.gz", ["email"])
+    assert str(err.value) == "sharded obfuscation does not support compressed files"
+
+
+@mark.parametrize("max_workers", [1, 2])
+def test_obfuscate_sharded_reads_local_files_in_the_workers(tmp_path, max_workers):
+    path = tmp_path / "data.csv"
+    content = make_csv(500)
+    path.write_bytes(content)
+    metrics = InvocationMetrics(str(path))
+
+    with patch(
+        "gdpr_obfuscator.storage.get_byte_range", side_effect=AssertionError("S3 read")
+    ):
+        output = obfuscate_sharded(
+            LocalStorage(),
+            str(path),
+            ["email", "name"],
+            max_workers=max_workers,
+            shard_size=1000,
+            metrics=metrics,
+        )
+
+    expected = obfuscate_csv(BytesIO(content), ["email", "name"]).read()
+    assert output.read() == expected
+    assert metrics.bytes_in == len(content)
+    assert metrics.rows == 500
@@ -0,0 +1,43 @@
+from gdpr_obfuscator.compression import open_decompressed
+from io import BytesIO
+from pytest import mark, raises
+import bz2
+import gzip
+
+import zstandard
+
+
+def zstd_compress(data):
+    return zstandard.ZstdCompressor().compress(data)
+
+
+CODECS = [("gzip", gzip.compress), ("bz2", bz2.compress), ("zstd", zstd_compress)]
+
+
+@mark.parametrize("codec, compress", CODECS)
+def test_open_decompressed_decompresses_with_the_given_codec(codec, compress):
+    data = b"age,email\n31,fake@email.com\n" * 1000
+    assert open_decompressed(BytesIO(compress(data)), codec).read() == data
+
+
+@mark.parametrize("codec, compress", CODECS)
+def test_open_decompressed_detects_the_codec_from_magic_bytes(codec, compress):
+    data = b"age,email\n31,fake@email.com\n" * 1000
+    assert open_decompressed(BytesIO(compress(data))).read() == data
+
+
+@mark.parametrize("codec, compress", CODECS)
+def test_open_decompressed_reads_concatenated_streams(codec, compress):
+    body = BytesIO(compress(b"age,email\n") + compress(b"31,fake@email.com\n"))
+    assert open_decompressed(body, codec).read() == b"age,email\n31,fake@email.com\n"
+
+
+@mark.parametrize("data", [b"", b"a", b"BZh is a header\n1\n", b"age,email\n31,x\n"])
+def test_open_decompressed_passes_uncompressed_data_through(data):
+    body = open_decompressed(BytesIO(data))
+    assert body.read(3) + body.read() == data
+
+
+def test_open_decompressed_raises_value_error_for_an_unknown_codec():
+    with raises(ValueError):
+        open_decompressed(BytesIO(b""), "lzma")
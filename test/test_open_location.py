@@ -0,0 +1,100 @@
+from gdpr_obfuscator import (
+    LocalStorage,
+    MemoryStorage,
+    S3Storage,
+    Storage,
+    memory_objects,
+    open_location,
+)
+from pytest import raises
+
+
+def test_open_location_returns_s3_storage_for_s3_uris():
+    s3 = object()
+    storage, key = open_location("s3://bucket/path/to/key.csv", s3)
+    assert isinstance(storage, S3Storage)
+    assert storage.bucket == "bucket"
+    assert storage.s3 is s3
+    assert key == "path/to/key.csv"
+
+
+def test_open_location_returns_local_storage_for_file_uris():
+    storage, key = open_location("file:///tmp/key.csv")
+    assert isinstance(storage, LocalStorage)
+    assert key == "/tmp/key.csv"
+    assert storage.uri(key) == "file:///tmp/key.csv"
+
+
+def test_open_location_returns_memory_storage_for_memory_uris():
+    storage, key = open_location("memory://path/key.csv")
+    assert isinstance(storage, MemoryStorage)
+    assert storage.objects is memory_objects
+    assert key == "path/key.csv"
+
+
+def test_open_location_raises_value_error_for_invalid_uris():
+    for uri in ("gs://bucket/key.csv", "/tmp/key.csv", "data/key.csv"):
+        with raises(ValueError) as err:
+            open_location(uri)
+        assert str(err.value) == f"Invalid S3 URI: {uri}"
+    with raises(ValueError) as err:
+        open_location("memory://")
+    assert str(err.value) == "Memory URI must include a key: memory://"
+    with raises(ValueError) as err:
+        open_location("s3://bucket/")
+    assert str(err.value) == "S3 URI must include bucket and key: s3://bucket/"
+
+
+def test_storage_cannot_be_created_without_its_methods():
+    with raises(TypeError):
+        Storage()
+
+    class ReadOnlyStorage(Storage):
+        def open(self, key, start=0):
+            return None
+
+    with raises(TypeError):
+        ReadOnlyStorage()
+
+
+def test_local_storage_reads_ranges_and_writes_files(tmp_path):
+    storage = LocalStorage()
+    path = str(tmp_path / "key.csv")
+    storage.put(path, b"0123456789")
+    assert storage.size(path) == 10
+    assert storage.read_range(path, 2, 5) == b"234"
+    assert storage.read_range(path, 8, 20) == b"89"
+    assert storage.read_range(path, 20, 30) == b""
+    assert storage.open(path).read() == b"0123456789"
+
+
+def test_local_storage_writer_only_replaces_the_file_when_closed(tmp_path):
+    path = tmp_path / "nested" / "key.csv"
+    writer = LocalStorage().create_writer(str(path))
+    writer.write(b"abc")
+    assert not path.exists()
+    assert writer.close() == {"Path": str(path)}
+    assert path.read_bytes() == b"abc"
+
+    writer = LocalStorage().create_writer(str(path))
+    writer.write(b"def")
+    writer.abort()
+    assert path.read_bytes() == b"abc"
+    assert [p.name for p in path.parent.iterdir()] == ["key.csv"]
+
+
+def test_memory_storage_reads_and_writes_its_objects():
+    objects = {"key.csv": b"0123456789"}
+    storage = MemoryStorage(objects)
+    assert storage.size("key.csv") == 10
+    assert storage.read_range("key.csv", 2, 5) == b"234"
+    assert storage.open("key.csv").read() == b"0123456789"
+
+    writer = storage.create_writer("output.csv")
+    writer.write(b"abc")
+    writer.abort()
+    writer.write(b"def")
+    assert writer.close() == {"Key": "output.csv"}
+    assert objects["output.csv"] == b"def"
+    with raises(FileNotFoundError):
+        storage.open("missing.csv")
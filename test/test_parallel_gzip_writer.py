@@ -0,0 +1,62 @@
+from gdpr_obfuscator.compression import ParallelGzipWriter, open_compressed_writer
+from io import BytesIO
+from pytest import mark
+import bz2
+import gzip
+import zlib
+
+import zstandard
+
+
+def make_data():
+    return b"".join(
+        b"%d,person%d@email.com,%d\n" % (i, i, i % 97) for i in range(20000)
+    )
+
+
+@mark.parametrize("workers", [1, 2, 4])
+def test_parallel_gzip_writer_writes_a_single_gzip_member(workers):
+    data = make_data()
+    output = BytesIO()
+    writer = ParallelGzipWriter(output, workers, block_size=64 * 1024)
+    for start in range(0, len(data), 10000):
+        writer.write(data[start : start + 10000])
+    writer.finish()
+    decompressor = zlib.decompressobj(wbits=31)
+    assert decompressor.decompress(output.getvalue()) == data
+    assert decompressor.eof and decompressor.unused_data == b""
+
+
+def test_parallel_gzip_writer_output_does_not_depend_on_the_workers():
+    data = make_data()
+    outputs = []
+    for workers in (1, 3):
+        output = BytesIO()
+        writer = ParallelGzipWriter(output, workers, block_size=64 * 1024)
+        writer.write(data)
+        writer.finish()
+        outputs.append(output.getvalue())
+    assert outputs[0] == outputs[1]
+
+
+def test_parallel_gzip_writer_writes_an_empty_stream():
+    output = BytesIO()
+    ParallelGzipWriter(output, 2).finish()
+    assert gzip.decompress(output.getvalue()) == b""
+
+
+@mark.parametrize(
+    "codec, decompress",
+    [
+        ("gzip", gzip.decompress),
+        ("bz2", bz2.decompress),
+        ("zstd", zstandard.ZstdDecompressor().decompressobj().decompress),
+    ],
+)
+def test_open_compressed_writer_compresses_with_each_codec(codec, decompress):
+    data = make_data()
+    output = BytesIO()
+    writer = open_compressed_writer(output, codec, workers=2)
+    writer.write(data)
+    writer.finish()
+    assert decompress(output.getvalue()) == data
@@ -0,0 +1,27 @@
+from gdpr_obfuscator.json_obfuscator import parse_field_path
+
+
+def test_parse_field_path_returns_a_plain_field_unchanged():
+    assert parse_field_path("email") == ["email"]
+
+
+def test_parse_field_path_splits_dotted_paths():
+    assert parse_field_path("customer.contact.email") == [
+        "customer",
+        "contact",
+        "email",
+    ]
+
+
+def test_parse_field_path_splits_array_wildcards():
+    assert parse_field_path("orders[*].card_number") == [
+        "orders",
+        "[*]",
+        "card_number",
+    ]
+    assert parse_field_path("matrix[*][*]") == ["matrix", "[*]", "[*]"]
+
+
+def test_parse_field_path_keeps_other_brackets_in_the_key():
+    assert parse_field_path("items[0]") == ["items[0]"]
+    assert parse_field_path("[*]") == ["[*]"]
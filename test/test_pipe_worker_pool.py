@@ -0,0 +1,32 @@
+from gdpr_obfuscator.sharding import PipeWorkerPool
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pytest import raises
+
+
+def test_pipe_worker_pool_runs_calls_in_other_processes():
+    pool = PipeWorkerPool(2)
+    try:
+        with ThreadPoolExecutor(4) as threads:
+            pids = set(threads.map(lambda _: pool.run(os.getpid), range(20)))
+        assert os.getpid() not in pids
+        assert 1 <= len(pids) <= 2
+        assert pool.run(divmod, 7, 2) == (3, 1)
+    finally:
+        pool.close()
+
+
+def test_pipe_worker_pool_raises_the_exception_from_the_worker():
+    pool = PipeWorkerPool(1)
+    try:
+        with raises(ZeroDivisionError):
+            pool.run(divmod, 1, 0)
+        assert pool.run(divmod, 1, 1) == (1, 0)
+    finally:
+        pool.close()
+
+
+def test_pipe_worker_pool_stops_its_workers_when_closed():
+    pool = PipeWorkerPool(2)
+    pool.close()
+    assert all(not process.is_alive() for process, _ in pool.workers)
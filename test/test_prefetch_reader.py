@@ -0,0 +1,84 @@
+from gdpr_obfuscator.pipeline import PrefetchReader
+from gdpr_obfuscator.csv_obfuscator import iter_newline_blocks
+from io import BytesIO, RawIOBase
+import time
+from pytest import raises
+
+
+class SlowBody(RawIOBase):
+    def __init__(self, data: bytes, fail_after: int = -1):
+        self.body = BytesIO(data)
+        self.reads = 0
+        self.fail_after = fail_after
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if self.reads == self.fail_after:
+            raise ConnectionError("connection reset")
+        self.reads += 1
+        return self.body.read(size)
+
+
+def test_prefetch_reader_returns_the_whole_stream():
+    data = bytes(range(256)) * 1000
+    reader = PrefetchReader(BytesIO(data), 2, chunk_size=1000)
+    assert reader.read() == data
+    assert reader.read() == b""
+
+
+def test_prefetch_reader_returns_sized_reads_in_order():
+    data = b"0123456789" * 100
+    reader = PrefetchReader(BytesIO(data), 3, chunk_size=64)
+    pieces = []
+    while piece := reader.read(50):
+        assert len(piece) <= 50
+        pieces.append(piece)
+    assert b"".join(pieces) == data
+
+
+def test_prefetch_reader_reads_from_the_current_chunk_without_copying_it():
+    data = b"0123456789" * 100
+    reader = PrefetchReader(BytesIO(data), 2, chunk_size=1000)
+    assert reader.read(10) == b"0123456789"
+    chunk = reader.current
+    assert reader.read(25) == b"0123456789" * 2 + b"01234"
+    assert reader.current is chunk
+    assert reader.position == 35
+    assert reader.read() == data[35:]
+
+
+def test_prefetch_reader_works_with_iter_newline_blocks():
+    data = b"a,b\n" + b'1,"x\ny"\n' * 10000
+    reader = PrefetchReader(BytesIO(data), 2, chunk_size=100)
+    assert b"".join(iter_newline_blocks(reader, block_size=333)) == data
+
+
+def test_prefetch_reader_reads_ahead_up_to_its_depth():
+    body = SlowBody(b"x" * 10000)
+    reader = PrefetchReader(body, 3, chunk_size=100)
+    time.sleep(0.2)
+    # Three chunks are queued and a fourth is waiting for space.
+    assert body.reads == 4
+    reader.read(100)
+    time.sleep(0.2)
+    assert body.reads == 5
+    reader.close()
+
+
+def test_prefetch_reader_raises_errors_from_the_stream_in_order():
+    reader = PrefetchReader(SlowBody(b"x" * 1000, fail_after=2), 4, chunk_size=100)
+    assert reader.read(100) == b"x" * 100
+    assert reader.read(100) == b"x" * 100
+    with raises(ConnectionError):
+        reader.read(100)
+    assert reader.read(100) == b""
+
+
+def test_prefetch_reader_stops_its_thread_when_closed():
+    reader = PrefetchReader(BytesIO(b"x" * 100000), 1, chunk_size=10)
+    reader.read(10)
+    reader.close()
+    reader.thread.join(timeout=1)
+    assert not reader.thread.is_alive()
@@ -0,0 +1,100 @@
+from gdpr_obfuscator.events import preflight_check, read_first_record
+import gzip
+from pytest import raises, mark
+from unittest.mock import patch
+
+
+pytestmark = mark.usefixtures("test_bucket")
+
+
+def test_preflight_check_accepts_fields_in_the_csv_header(s3_client):
+    body = b"age,email,name\n" + b"31,fake@email.com,Fake\n" * 100
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=body)
+    assert preflight_check("test-bucket", "data.csv", ["email", "name"]) is None
+
+
+def test_preflight_check_raises_value_error_for_a_missing_csv_field(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=b"age,email\n")
+    with raises(ValueError) as err:
+        preflight_check("test-bucket", "data.csv", ["name"])
+    assert str(err.value) == "The pii_fields '{'name'}' not found in headers."
+
+
+def test_preflight_check_raises_value_error_for_a_missing_jsonl_field(s3_client):
+    body = b'{"age": 31, "email": "fake@email.com"}\n{"age": 31, "name": "Fake"}\n'
+    s3_client.put_object(Bucket="test-bucket", Key="data.jsonl", Body=body)
+    preflight_check("test-bucket", "data.jsonl", ["email"])
+    with raises(ValueError) as err:
+        preflight_check("test-bucket", "data.jsonl", ["name"])
+    assert str(err.value) == "The pii_field 'name' not found in headers."
+
+
+def test_preflight_check_follows_nested_jsonl_field_paths(s3_client):
+    body = b'{"customer": {"contact": {"email": "a@b.com"}}}\n'
+    s3_client.put_object(Bucket="test-bucket", Key="data.jsonl", Body=body)
+    preflight_check("test-bucket", "data.jsonl", ["customer.contact.email"])
+    with raises(ValueError) as err:
+        preflight_check("test-bucket", "data.jsonl", ["customer.contact.phone"])
+    assert (
+        str(err.value) == "The pii_field 'customer.contact.phone' not found in headers."
+    )
+
+
+def test_preflight_check_accepts_a_jsonl_key_spelled_like_a_path(s3_client):
+    body = b'{"user.email": "a@b.com"}\n'
+    s3_client.put_object(Bucket="test-bucket", Key="data.jsonl", Body=body)
+    preflight_check("test-bucket", "data.jsonl", ["user.email"])
+
+
+def test_preflight_check_skips_json_files_and_empty_pii_fields(s3_client):
+    with patch.object(s3_client, "get_object") as mock_get:
+        preflight_check("test-bucket", "data.json", ["email"])
+        preflight_check("test-bucket", "data.csv", [])
+    mock_get.assert_not_called()
+
+
+def test_preflight_check_accepts_an_empty_file(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.jsonl", Body=b"")
+    preflight_check("test-bucket", "data.jsonl", ["email"])
+
+
+def test_read_first_record_reads_past_lines_longer_than_one_probe(s3_client):
+    header = ",".join(f"column_{i}" for i in range(100)) + "\r\n"
+    body = (header + "1,2\r\n").encode("utf-8")
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=body)
+    with patch("gdpr_obfuscator.events.PREFLIGHT_PROBE_SIZE", 64):
+        record = read_first_record("test-bucket", "data.csv", quoted=True)
+    assert record == header.replace("\r\n", "\n").encode("utf-8")
+
+
+def test_read_first_record_keeps_new_lines_inside_quotes_for_csv(s3_client):
+    body = b'id,"first\nsecond",email\n1,2,3\n'
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=body)
+    with patch("gdpr_obfuscator.events.PREFLIGHT_PROBE_SIZE", 4):
+        assert read_first_record("test-bucket", "data.csv", quoted=True) == (
+            b'id,"first\nsecond",email\n'
+        )
+        assert read_first_record("test-bucket", "data.csv") == b'id,"first\n'
+
+
+def test_read_first_record_returns_a_file_without_a_new_line(s3_client):
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=b"age,email")
+    with patch("gdpr_obfuscator.events.PREFLIGHT_PROBE_SIZE", 4):
+        assert read_first_record("test-bucket", "data.csv") == b"age,email"
+
+
+def test_preflight_check_decompresses_the_first_record(s3_client):
+    body = gzip.compress(b"age,email\n" + b"31,fake@email.com\n" * 1000)
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv.gz", Body=body)
+    preflight_check("test-bucket", "data.csv.gz", ["email"])
+    with raises(ValueError):
+        preflight_check("test-bucket", "data.csv.gz", ["name"])
+
+
+def test_read_first_record_detects_compression_from_magic_bytes(s3_client):
+    header = ",".join(f"column_{i}" for i in range(100)) + "\n"
+    body = gzip.compress((header + "1,2\n").encode("utf-8"))
+    s3_client.put_object(Bucket="test-bucket", Key="data.csv", Body=body)
+    with patch("gdpr_obfuscator.events.PREFLIGHT_PROBE_SIZE", 16):
+        record = read_first_record("test-bucket", "data.csv")
+    assert record == header.encode("utf-8")
@@ -0,0 +1,78 @@
+from gdpr_obfuscator import Pseudonymiser
+import hashlib
+import hmac
+import pickle
+from pytest import raises
+
+
+def test_pseudonymiser_returns_a_truncated_hmac_sha256_of_the_value():
+    pseudonymiser = Pseudonymiser(b"secret")
+    expected = hmac.new(b"secret", b"fake@email.com", hashlib.sha256).hexdigest()
+    assert pseudonymiser("fake@email.com") == expected[:16]
+
+
+def test_pseudonymiser_is_deterministic_for_a_key():
+    assert Pseudonymiser(b"secret")("value") == Pseudonymiser(b"secret")("value")
+    assert Pseudonymiser(b"secret")("value") != Pseudonymiser(b"other")("value")
+    assert Pseudonymiser(b"secret")("value") != Pseudonymiser(b"secret")("values")
+
+
+def test_pseudonymiser_returns_bytes_tokens_for_bytes_values():
+    pseudonymiser = Pseudonymiser(b"secret")
+    assert pseudonymiser(b"value") == pseudonymiser("value").encode("ascii")
+
+
+def test_pseudonymiser_tokenises_json_values_by_their_compact_text():
+    pseudonymiser = Pseudonymiser(b"secret")
+    assert pseudonymiser(42) == pseudonymiser("42")
+    assert pseudonymiser(None) == pseudonymiser("null")
+    assert pseudonymiser({"b": 1, "a": [2]}) == pseudonymiser('{"a":[2],"b":1}')
+
+
+def test_pseudonymiser_uses_the_given_token_length():
+    assert len(Pseudonymiser(b"secret", length=8)("value")) == 8
+    assert len(Pseudonymiser(b"secret", length=64)("value")) == 64
+
+
+def test_pseudonymiser_raises_error_for_an_invalid_key_or_length():
+    with raises(ValueError) as err:
+        Pseudonymiser(b"")
+    assert str(err.value) == "key must not be empty"
+    with raises(ValueError) as err:
+        Pseudonymiser(b"secret", length=65)
+    assert str(err.value) == "length must be between 1 and 64"
+
+
+def test_pseudonymiser_reports_cache_hits_and_misses():
+    pseudonymiser = Pseudonymiser(b"secret")
+    for value in ["uk", "fr", "uk", "uk", "de", "fr"]:
+        pseudonymiser(value)
+    assert pseudonymiser.cache_info() == {
+        "hits": 3,
+        "misses": 3,
+        "size": 3,
+        "max_size": 64 * 1024,
+        "hit_rate": 0.5,
+    }
+
+
+def test_pseudonymiser_keeps_the_cache_within_its_size():
+    pseudonymiser = Pseudonymiser(b"secret", cache_size=2)
+    for value in ["a", "b", "c", "a"]:
+        pseudonymiser(value)
+    info = pseudonymiser.cache_info()
+    assert info["size"] == 2
+    assert info["hits"] == 0
+
+
+def test_pseudonymiser_reports_a_zero_hit_rate_before_any_lookup():
+    assert Pseudonymiser(b"secret").cache_info()["hit_rate"] == 0.0
+
+
+def test_pseudonymiser_can_be_pickled_for_worker_processes():
+    pseudonymiser = Pseudonymiser(b"secret", length=10, cache_size=5)
+    pseudonymiser("value")
+    copy = pickle.loads(pickle.dumps(pseudonymiser))
+    assert copy("value") == pseudonymiser("value")
+    assert copy.length == 10
+    assert copy.cache_info()["max_size"] == 5
@@ -0,0 +1,63 @@
+from gdpr_obfuscator import S3MultipartWriter, MIN_PART_SIZE
+from pytest import raises, mark
+
+
+pytestmark = mark.usefixtures("test_bucket")
+
+
+def test_s3_multipart_writer_rejects_parts_smaller_than_the_s3_minimum(s3_client):
+    with raises(ValueError) as err:
+        S3MultipartWriter(s3_client, "test-bucket", "key", MIN_PART_SIZE - 1)
+    assert str(err.value) == f"part_size must be at least {MIN_PART_SIZE} bytes"
+
+
+def test_s3_multipart_writer_uses_put_object_for_output_smaller_than_a_part(
+    s3_client,
+):
+    writer = S3MultipartWriter(s3_client, "test-bucket", "key")
+    writer.write(b"small ")
+    writer.write(b"output")
+    response = writer.close()
+
+    assert writer.upload_id is None
+    assert response["Key"] == "key"
+    result = s3_client.get_object(Bucket="test-bucket", Key="key")
+    assert result["Body"].read() == b"small output"
+
+
+def test_s3_multipart_writer_uploads_full_parts_as_they_fill(s3_client):
+    writer = S3MultipartWriter(s3_client, "test-bucket", "key", MIN_PART_SIZE)
+    writer.write(b"a" * (MIN_PART_SIZE - 1))
+    assert writer.parts == []
+
+    writer.write(b"bb")
+    assert [part["PartNumber"] for part in writer.parts] == [1]
+    assert len(writer._buffer) == 1
+
+    writer.write(b"c" * MIN_PART_SIZE)
+    assert [part["PartNumber"] for part in writer.parts] == [1, 2]
+    writer.close()
+
+    result = s3_client.get_object(Bucket="test-bucket", Key="key")
+    expected = b"a" * (MIN_PART_SIZE - 1) + b"bb" + b"c" * MIN_PART_SIZE
+    assert result["Body"].read() == expected
+
+
+def test_s3_multipart_writer_abort_cancels_the_multipart_upload(s3_client):
+    writer = S3MultipartWriter(s3_client, "test-bucket", "key", MIN_PART_SIZE)
+    writer.write(b"a" * (MIN_PART_SIZE + 1))
+    assert writer.upload_id is not None
+
+    writer.abort()
+
+    assert writer.upload_id is None
+    uploads = s3_client.list_multipart_uploads(Bucket="test-bucket")
+    assert "Uploads" not in uploads
+    objects = s3_client.list_objects_v2(Bucket="test-bucket")
+    assert objects["KeyCount"] == 0
+
+
+def test_s3_multipart_writer_is_writable_but_not_seekable(s3_client):
+    writer = S3MultipartWriter(s3_client, "test-bucket", "key")
+    assert writer.writable()
+    assert not writer.seekable()
@@ -0,0 +1,76 @@
+from gdpr_obfuscator import SpoolingBuffer, obfuscate_csv, obfuscate_jsonl
+from io import BytesIO
+import json
+from pytest import mark
+
+
+pytestmark = mark.usefixtures("test_bucket")
+
+
+def test_spooling_buffer_stays_in_memory_up_to_its_threshold():
+    buffer = SpoolingBuffer(10)
+    buffer.write(b"01234")
+    buffer.write(b"56789")
+    assert not buffer.spilled
+    buffer.write(b"a")
+    assert buffer.spilled
+    assert buffer.getvalue() == b"0123456789a"
+
+
+@mark.parametrize("threshold", [0, 5, 9, 10, 11, 1000])
+def test_spooling_buffer_keeps_its_contents_across_the_spill(threshold):
+    buffer = SpoolingBuffer(threshold)
+    for line in (b"first\n", b"second\n", b"", b"third"):
+        buffer.write(line)
+    assert buffer.spilled == (threshold < 18)
+    assert buffer.tell() == 18
+    buffer.seek(0)
+    assert buffer.readline() == b"first\n"
+    assert buffer.read(3) == b"sec"
+    assert list(buffer) == [b"ond\n", b"third"]
+    assert buffer.getvalue() == b"first\nsecond\nthird"
+    assert buffer.tell() == 18
+
+
+def test_spooling_buffer_spills_in_the_middle_of_an_overwrite():
+    buffer = SpoolingBuffer(8)
+    buffer.write(b"abcdef")
+    buffer.seek(2)
+    buffer.write(b"XYZXYZXYZ")
+    assert buffer.spilled
+    buffer.seek(0)
+    assert buffer.read() == b"abXYZXYZXYZ"
+
+
+def test_spooling_buffer_writes_into_the_given_directory(tmp_path):
+    buffer = SpoolingBuffer(1, directory=str(tmp_path))
+    buffer.write(b"abc")
+    assert buffer.spilled
+    buffer.close()
+    assert buffer.closed
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spooling_buffer_can_be_uploaded_with_put_object(s3_client):
+    buffer = SpoolingBuffer(4)
+    buffer.write(b"age,email\n31,***\n")
+    buffer.seek(0)
+    s3_client.put_object(Bucket="test-bucket", Key="output.csv", Body=buffer)
+    response = s3_client.get_object(Bucket="test-bucket", Key="output.csv")
+    assert response["Body"].read() == b"age,email\n31,***\n"
+
+
+def test_obfuscators_write_the_same_output_whether_or_not_they_spill():
+    csv_content = b"age,email\n" + b"31,fake@email.com\n" * 10_000
+    expected = obfuscate_csv(BytesIO(csv_content), ["email"]).read()
+    output = obfuscate_csv(BytesIO(csv_content), ["email"], SpoolingBuffer(1000))
+    assert output.spilled
+    assert output.tell() == 0
+    assert output.read() == expected
+
+    records = [{"email": f"person{i}@email.com", "age": i} for i in range(1000)]
+    jsonl_content = "".join(json.dumps(record) + "\n" for record in records).encode()
+    expected = obfuscate_jsonl(BytesIO(jsonl_content), ["email"]).read()
+    output = obfuscate_jsonl(BytesIO(jsonl_content), ["email"], SpoolingBuffer(1000))
+    assert output.spilled
+    assert output.read() == expected
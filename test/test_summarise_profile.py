@@ -0,0 +1,50 @@
+from gdpr_obfuscator import obfuscate_csv, obfuscate_jsonl, summarise_profile
+from gdpr_obfuscator.profiling import run_profiled
+from io import BytesIO
+
+
+def test_summarise_profile_lists_the_hot_csv_functions():
+    body = BytesIO(b"age,email\n31,a@b.com\n32,c@d.com\n")
+    _, profile = run_profiled(obfuscate_csv, body, ["email"], engine="text")
+    summary = summarise_profile(profile)
+    assert "obfuscate_csv" in summary
+    assert "edit_line" in summary
+    assert "csv_string_to_list" in summary
+
+
+def test_summarise_profile_lists_the_jsonl_loop():
+    body = BytesIO(b'{"email": "a@b.com"}\n{"email": "c@d.com"}\n')
+    _, profile = run_profiled(obfuscate_jsonl, body, ["email"])
+    summary = summarise_profile(profile, pattern="gdpr_obfuscator")
+    assert "obfuscate_jsonl" in summary
+    assert "mask_record" in summary
+
+
+def test_summarise_profile_limits_the_number_of_functions():
+    body = BytesIO(b"age,email\n31,a@b.com\n")
+    _, profile = run_profiled(obfuscate_csv, body, ["email"], engine="text")
+    summary = summarise_profile(profile, limit=2)
+    assert "due to restriction <2>" in summary
+
+
+def test_summarise_profile_sorts_by_the_given_key():
+    body = BytesIO(b"age,email\n31,a@b.com\n")
+    _, profile = run_profiled(obfuscate_csv, body, ["email"], engine="text")
+    assert "Ordered by: internal time" in summarise_profile(profile, sort="tottime")
+    assert "Ordered by: cumulative time" in summarise_profile(profile)
+
+
+def test_run_profiled_returns_the_result_of_the_call():
+    body = BytesIO(b"age,email\n31,a@b.com\n")
+    output, profile = run_profiled(obfuscate_csv, body, ["email"])
+    assert output.getvalue() == b"age,email\n31,***\n"
+    assert isinstance(profile, bytes)
+
+
+def test_summarise_profile_lists_only_functions_matching_the_pattern():
+    body = BytesIO(b"age,email\n31,a@b.com\n")
+    _, profile = run_profiled(obfuscate_csv, body, ["email"], engine="text")
+    summary = summarise_profile(profile, pattern="edit_line")
+    table = summary.split("filename:lineno(function)")[1]
+    assert "edit_line" in table
+    assert "obfuscate_csv" not in table
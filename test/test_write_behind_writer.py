@@ -0,0 +1,75 @@
+from gdpr_obfuscator.pipeline import WriteBehindWriter
+from io import BytesIO
+import threading
+from pytest import raises
+
+
+class FailingWriter:
+    def __init__(self, fail_after: int):
+        self.writes = 0
+        self.fail_after = fail_after
+
+    def write(self, data: bytes) -> int:
+        if self.writes == self.fail_after:
+            raise ConnectionError("upload failed")
+        self.writes += 1
+        return len(data)
+
+
+def test_write_behind_writer_writes_everything_in_order():
+    output = BytesIO()
+    writer = WriteBehindWriter(output, 2, chunk_size=100)
+    data = [bytes([i % 256]) * (i % 37) for i in range(1000)]
+    for piece in data:
+        writer.write(piece)
+    writer.finish()
+    assert output.getvalue() == b"".join(data)
+
+
+def test_write_behind_writer_gathers_small_writes_into_chunks():
+    sizes = []
+
+    class Output:
+        def write(self, data):
+            sizes.append(len(data))
+
+    writer = WriteBehindWriter(Output(), 2, chunk_size=100)
+    for _ in range(50):
+        writer.write(b"x" * 10)
+    writer.finish()
+    assert sizes == [100] * 5
+
+
+def test_write_behind_writer_writes_on_another_thread():
+    threads = set()
+
+    class Output:
+        def write(self, data):
+            threads.add(threading.get_ident())
+
+    writer = WriteBehindWriter(Output(), 2, chunk_size=1)
+    writer.write(b"x")
+    writer.finish()
+    assert threads and threading.get_ident() not in threads
+
+
+def test_write_behind_writer_raises_errors_from_the_stream():
+    writer = WriteBehindWriter(FailingWriter(fail_after=1), 1, chunk_size=10)
+    with raises(ConnectionError):
+        for _ in range(100):
+            writer.write(b"x" * 10)
+        writer.finish()
+
+
+def test_write_behind_writer_raises_errors_from_finish():
+    writer = WriteBehindWriter(FailingWriter(fail_after=0), 4, chunk_size=10)
+    writer.write(b"x" * 5)
+    with raises(ConnectionError):
+        writer.finish()
+
+
+def test_write_behind_writer_close_stops_the_thread():
+    writer = WriteBehindWriter(BytesIO(), 1)
+    writer.write(b"x")
+    writer.close()
+    assert not writer.thread.is_alive()